@@ -13,9 +13,15 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
 from . import serializers
+from files.download_log import log_download
+from files.downloads import DownloadRequest
+from files.pagination import KeysetPagination
 from files.models import File, FileShareLink
+from files.share_link_cache import get_share_link, invalidate as invalidate_share_link
 from authentication.models import EmailVerificationToken
+from config.ratelimit import TokenBucketThrottle
 
 User = get_user_model()
 
@@ -38,6 +44,8 @@ class ClientSignupView(generics.CreateAPIView):
     """View for client user registration"""
     serializer_class = serializers.ClientSignupSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'register'
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -109,6 +117,8 @@ class VerifyEmailView(generics.GenericAPIView):
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Custom token obtain view that includes user details in the response"""
     serializer_class = serializers.CustomTokenObtainPairSerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
 
 class FileViewSet(viewsets.ModelViewSet):
     """ViewSet for managing files"""
@@ -182,16 +192,25 @@ class FileShareLinkViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for managing file share links"""
     serializer_class = serializers.FileShareLinkSerializer
     permission_classes = [IsAuthenticated]
+    lookup_field = 'token'
+    pagination_class = KeysetPagination
+    # Only the public download is limited (see its action)
+    throttle_scope = 'share_download'
     
     def get_queryset(self):
         """Return only share links created by the current user"""
         return FileShareLink.objects.filter(created_by=self.request.user)
     
-    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    @action(
+        detail=True,
+        methods=['get'],
+        permission_classes=[AllowAny],
+        throttle_classes=[TokenBucketThrottle]
+    )
     def download(self, request, token=None):
         """Download a file using a share link"""
         try:
-            share_link = FileShareLink.objects.get(token=token, is_active=True)
+            share_link = get_share_link(token)
             
             # Check if the link has expired
             if share_link.is_expired():
@@ -200,14 +219,6 @@ class FileShareLinkViewSet(viewsets.ReadOnlyModelViewSet):
                     status=status.HTTP_410_GONE
                 )
             
-            # Check download limit
-            if (share_link.max_downloads is not None and 
-                share_link.download_count >= share_link.max_downloads):
-                return Response(
-                    {'error': 'Download limit exceeded'},
-                    status=status.HTTP_410_GONE
-                )
-            
             # For authenticated users, check if they have access
             if request.user.is_authenticated and request.user.user_type != User.UserType.CLIENT:
                 return Response(
@@ -215,17 +226,28 @@ class FileShareLinkViewSet(viewsets.ReadOnlyModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            # Increment download count
-            share_link.download_count += 1
-            share_link.save()
+            download = DownloadRequest(request, share_link.file)
+            not_modified = download.not_modified_response()
+            if not_modified is not None:
+                return not_modified
+            
+            # A range past the end gets no bytes, and picking up an
+            # interrupted download isn't a new download
+            link_key = str(share_link.token)
+            if download.satisfiable and not download.is_resumption(link_key):
+                # Counted only while under the limit, atomically
+                if not share_link.record_download():
+                    invalidate_share_link(share_link.token)
+                    return Response(
+                        {'error': 'Download limit exceeded'},
+                        status=status.HTTP_410_GONE
+                    )
+                
+                download.remember(link_key)
             
-            # Return the file for download
-            file_obj = share_link.file.file
-            response = Response(file_obj, content_type='application/octet-stream')
-            response['Content-Disposition'] = f'attachment; filename="{share_link.file.original_filename}"'
-            return response
+            return log_download(download, download.response(), share_link)
             
-        except FileShareLink.DoesNotExist:
+        except (FileShareLink.DoesNotExist, DjangoValidationError):
             return Response(
                 {'error': 'Invalid or expired share link'},
                 status=status.HTTP_404_NOT_FOUND
@@ -6,3 +6,7 @@ class AuthenticationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "authentication"
     verbose_name = _("Authentication")
+
+    def ready(self):
+        # Register signal handlers
+        from . import signals  # noqa
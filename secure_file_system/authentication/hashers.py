@@ -0,0 +1,116 @@
+"""
+Password hashers with a per-process cap on concurrent hashing.
+
+Logging in, registering and changing or resetting a password all hash a
+password on the request thread, which is meant to be slow. A burst of
+logins would otherwise keep every CPU busy hashing and starve every other
+request. Each hash made through these hashers takes one of
+``PASSWORD_HASH_CONCURRENCY`` slots. A hash that can't get a slot within
+``PASSWORD_HASH_WAIT`` seconds fails fast with a 503 and ``Retry-After``,
+without being computed.
+
+Argon2 is the preferred hasher, with its cost set by ``ARGON2_TIME_COST``,
+``ARGON2_MEMORY_COST`` (KiB) and ``ARGON2_PARALLELISM``. Django rehashes a
+password when its user logs in if it was made with another hasher (the
+PBKDF2 hashes of existing accounts) or with other Argon2 costs, so changing
+the costs takes effect one login at a time.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+# Seconds a client is asked to wait when every slot is taken
+RETRY_AFTER = 1
+
+_lock = threading.Lock()
+_slots: Optional[threading.BoundedSemaphore] = None
+_slot_count = 0
+_held = threading.local()
+
+
+class PasswordHashingBusy(APIException):
+    """Every password hashing slot in this process is in use."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('The server is busy. Please try again shortly.')
+    default_code = 'password_hashing_busy'
+
+    def __init__(self) -> None:
+        super().__init__()
+        # DRF turns this into a Retry-After header
+        self.wait = RETRY_AFTER
+
+
+def _semaphore() -> threading.BoundedSemaphore:
+    global _slots, _slot_count
+    count = settings.PASSWORD_HASH_CONCURRENCY
+    with _lock:
+        if _slots is None or _slot_count != count:
+            _slots, _slot_count = threading.BoundedSemaphore(count), count
+        return _slots
+
+
+@contextmanager
+def hashing_slot() -> Iterator[None]:
+    """
+    Hold one of this process's hashing slots for the duration, or raise
+    ``PasswordHashingBusy``. A thread that already holds one isn't made to
+    wait for a second.
+    """
+    if getattr(_held, 'slot', False):
+        yield
+        return
+    slots = _semaphore()
+    if not slots.acquire(timeout=settings.PASSWORD_HASH_WAIT):
+        logger.warning('All %d password hashing slots busy; refusing a hash',
+                       settings.PASSWORD_HASH_CONCURRENCY)
+        raise PasswordHashingBusy()
+    _held.slot = True
+    try:
+        yield
+    finally:
+        _held.slot = False
+        slots.release()
+
+
+class BoundedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 with costs from settings, hashing in a slot."""
+
+    @property
+    def time_cost(self) -> int:  # type: ignore[override]
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self) -> int:  # type: ignore[override]
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self) -> int:  # type: ignore[override]
+        return settings.ARGON2_PARALLELISM
+
+    def encode(self, password: str, salt: str) -> str:
+        with hashing_slot():
+            return super().encode(password, salt)
+
+    def verify(self, password: str, encoded: str) -> bool:
+        with hashing_slot():
+            return super().verify(password, encoded)
+
+
+class BoundedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher, hashing in a slot; verifying and hardening both go
+    through encode.
+    """
+
+    def encode(self, password: str, salt: str, iterations: Optional[int] = None) -> str:
+        with hashing_slot():
+            return super().encode(password, salt, iterations)
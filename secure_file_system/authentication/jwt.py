@@ -0,0 +1,157 @@
+"""
+JWT authentication that resolves users from a cache.
+
+simplejwt's ``JWTAuthentication`` loads the user row on every authenticated
+request. ``CachedJWTAuthentication`` keeps the user in the ``tokens`` cache
+for ``JWT_USER_CACHE_TIMEOUT`` seconds, keyed by user id and token version,
+so repeat requests authenticate without a query.
+
+Tokens carry the user's ``token_version`` (see ``VersionedRefreshToken``).
+Changing or resetting a password bumps it, which revokes every token issued
+before. Saving or deleting a user drops their cached entries once that
+commits (see authentication.signals), so deactivation and ``user_type``
+changes apply on the next request. Changes made with ``QuerySet.update``
+skip the signal and can take up to ``JWT_USER_CACHE_TIMEOUT`` seconds.
+
+Logging out and rotating a refresh token blacklist it by JTI in the same
+cache, until the token would have expired anyway. Entries expire by
+themselves, so nothing has to trim them; the ``tokens`` cache must be on a
+Redis server that doesn't evict keys. A blacklist check is one EXISTS.
+
+Tokens issued before versions existed have no version claim. Their user is
+looked up on every request until they expire. So is every user while the
+cache is unreachable.
+"""
+import logging
+import time
+from typing import Any, Optional
+
+import redis
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import (  # type: ignore[import-untyped]
+    JWTAuthentication,
+)
+from rest_framework_simplejwt.exceptions import (  # type: ignore[import-untyped]
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.settings import (  # type: ignore[import-untyped]
+    api_settings,
+)
+from rest_framework_simplejwt.tokens import (  # type: ignore[import-untyped]
+    RefreshToken,
+    Token,
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'tokens'
+TOKEN_VERSION_CLAIM = 'ver'
+# Cached for token versions that have been revoked
+REVOKED = 'revoked'
+
+
+class VersionedRefreshToken(RefreshToken):  # type: ignore[misc]
+    """
+    A refresh token, and the access tokens made from it, stamped with the
+    user's token version. It is blacklisted in the token cache rather than in
+    simplejwt's blacklist tables.
+    """
+
+    @classmethod
+    def for_user(cls, user: Any) -> 'VersionedRefreshToken':
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+    def verify(self, *args: Any, **kwargs: Any) -> None:
+        super().verify(*args, **kwargs)
+        if caches[CACHE_ALIAS].has_key(blacklist_key(self[api_settings.JTI_CLAIM])):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self) -> bool:
+        """
+        Blacklist the token until it expires. Returns False if it already was,
+        for instance by a concurrent refresh with the same token.
+        """
+        remaining = self['exp'] - int(time.time())
+        if remaining <= 0:
+            return True
+        key = blacklist_key(self[api_settings.JTI_CLAIM])
+        return caches[CACHE_ALIAS].add(key, 1, remaining)
+
+    def rotate(self) -> 'VersionedRefreshToken':
+        """
+        Replace this token with the next one in place: the same claims under
+        a new JTI and lifetime. The old JTI is blacklisted first if
+        ``BLACKLIST_AFTER_ROTATION`` is set; raises TokenError if another
+        refresh rotated it first.
+        """
+        if api_settings.BLACKLIST_AFTER_ROTATION and not self.blacklist():
+            raise TokenError(_('Token is blacklisted'))
+        self.set_jti()
+        self.set_exp()
+        self.set_iat()
+        return self
+
+
+def blacklist_key(jti: str) -> str:
+    return f'jwt_blacklist:{jti}'
+
+
+def token_is_current(token: Token, user: Any) -> bool:
+    """Whether ``token`` was issued after ``user`` last revoked their tokens."""
+    version = token.get(TOKEN_VERSION_CLAIM)
+    return version is None or version == user.token_version
+
+
+def user_cache_key(user_id: Any, version: int) -> str:
+    return f'jwt_user:{user_id}:{version}'
+
+
+def forget_user(user_id: Any, version: int) -> None:
+    """Drop a user's cached entry for ``version`` and the one before it."""
+    try:
+        caches[CACHE_ALIAS].delete_many([
+            user_cache_key(user_id, version), user_cache_key(user_id, version - 1)
+        ])
+    except redis.RedisError:
+        logger.warning('Token cache unavailable; user %s stays cached until it expires',
+                       user_id, exc_info=True)
+
+
+class CachedJWTAuthentication(JWTAuthentication):  # type: ignore[misc]
+    """``JWTAuthentication`` that serves the token's user from the cache when it can."""
+
+    def get_user(self, validated_token: Token) -> Any:
+        version: Optional[int] = validated_token.get(TOKEN_VERSION_CLAIM)
+        if version is None:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        cache = caches[CACHE_ALIAS]
+        key = user_cache_key(user_id, version)
+        try:
+            user = cache.get(key)
+        except redis.RedisError:
+            logger.warning('Token cache unavailable; loading user %s',
+                           user_id, exc_info=True)
+            user = cache = None
+        if user is None:
+            # Raises for missing and inactive users, which aren't cached
+            user = super().get_user(validated_token)
+            if not token_is_current(validated_token, user):
+                user = REVOKED
+            if cache is not None:
+                cache.set(key, user, settings.JWT_USER_CACHE_TIMEOUT)
+        if user == REVOKED:
+            raise AuthenticationFailed(
+                _('Token has been revoked'), code='token_revoked'
+            )
+        return user
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authentication", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(fields=["-date_joined"], name="user_date_joined_idx"),
+        ),
+    ]
@@ -70,6 +70,12 @@ class User(AbstractBaseUser, PermissionsMixin):
         default=False,
         help_text=_('Designates whether this user has verified their email.'),
     )
+    # Tokens carry the version they were issued under; bumping it revokes them
+    # (see authentication.jwt)
+    token_version: 'models.PositiveIntegerField' = models.PositiveIntegerField(
+        _('token version'),
+        default=0
+    )
     date_joined: 'models.DateTimeField' = models.DateTimeField(_('date joined'), default=timezone.now)
     last_login: 'models.DateTimeField' = models.DateTimeField(_('last login'), auto_now=True)
 
@@ -81,6 +87,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        indexes = [
+            # Newest users first, and users who joined since a date
+            models.Index(fields=['-date_joined'], name='user_date_joined_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.email
@@ -94,6 +104,10 @@ class User(AbstractBaseUser, PermissionsMixin):
         """Return the short name for the user."""
         return self.first_name or ''
     
+    def revoke_tokens(self) -> None:
+        """Revoke every token issued to this user so far, once the user is saved."""
+        self.token_version += 1
+
     def email_user(self, subject: str, message: str, from_email: Optional[str] = None, **kwargs: Any) -> int:
         """Send an email to this user."""
         return send_mail(subject, message, from_email, [self.email], **kwargs)
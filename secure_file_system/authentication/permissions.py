@@ -7,5 +7,4 @@ class IsOperationsUser(permissions.BasePermission):
     def has_permission(self, request, view):
         # Check if the user is authenticated and has the OPERATIONS role
         return bool(request.user and request.user.is_authenticated and 
-                   hasattr(request.user, 'role') and 
-                   request.user.role == 'OPERATIONS')
+                   getattr(request.user, 'user_type', None) == 'OPERATIONS')
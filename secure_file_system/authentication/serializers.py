@@ -3,8 +3,18 @@ from typing import Any, Dict, Optional, Type, TypeVar, cast
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer  # type: ignore[import-untyped]
-from rest_framework_simplejwt.tokens import RefreshToken  # type: ignore[import-untyped]
+from rest_framework_simplejwt.exceptions import (  # type: ignore[import-untyped]
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.serializers import (  # type: ignore[import-untyped]
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer
+)
+from rest_framework_simplejwt.settings import (  # type: ignore[import-untyped]
+    api_settings,
+)
+from .jwt import VersionedRefreshToken
 from .models import EmailVerificationToken, PasswordResetToken, User as UserModel
 
 User = get_user_model()
@@ -58,6 +68,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer[UserModel]):
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):  # type: ignore[misc,valid-type]
     """Custom token serializer to include additional user data in the response"""
+    token_class = VersionedRefreshToken
+
     def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
         data = super().validate(attrs)
         refresh = self.get_token(self.user)
@@ -76,6 +88,27 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):  # type: ignor
         return data
 
 
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):  # type: ignore[misc]
+    """
+    Token refresh that blacklists the rotated refresh token in the token
+    cache. Claiming it is atomic, so of two refreshes racing with the same
+    token only one gets a new pair.
+    """
+    token_class = VersionedRefreshToken
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, str]:
+        refresh = self.token_class(attrs['refresh'])
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            try:
+                data['refresh'] = str(refresh.rotate())
+            except TokenError as e:
+                raise InvalidToken(e.args[0]) from e
+
+        return data
+
+
 class UserSerializer(serializers.ModelSerializer[UserModel]):
     """Serializer for user details"""
     class Meta:
@@ -139,6 +172,7 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
             )
             if not self.reset_token.is_valid():
                 raise serializers.ValidationError({"token": _("Password reset link has expired.")})
+            attrs['reset_token'] = self.reset_token
             return attrs
         except PasswordResetToken.DoesNotExist:
             raise serializers.ValidationError({"token": _("Invalid password reset token.")})
@@ -150,7 +184,7 @@ class RefreshTokenSerializer(serializers.Serializer):
 
     def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            refresh = RefreshToken(attrs['refresh'])
+            refresh = VersionedRefreshToken(attrs['refresh'])
             attrs['refresh'] = refresh
             return attrs
         except Exception as e:
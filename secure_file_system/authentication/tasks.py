@@ -1,6 +1,10 @@
+from datetime import date, timedelta
+
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.mail import mail_admins, send_mail
 from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 @shared_task(bind=True, max_retries=3)
@@ -19,3 +23,40 @@ def send_verification_email_task(self, user_email, verification_url):
     except Exception as e:
         # Retry the task if it fails
         self.retry(exc=e, countdown=60 * 5)  # Retry after 5 minutes
+
+
+@shared_task
+def send_daily_stats(day=None):
+    """
+    Celery beat task that emails ADMINS a day's activity, read from the
+    daily statistics rollup rather than counted from the tables.
+
+    Args:
+        day: ISO date to report on; yesterday if omitted
+    """
+    from files.models import DailyStats
+    from files.stats import get_stats
+
+    day = date.fromisoformat(day) if day else timezone.localdate() - timedelta(days=1)
+    daily = DailyStats.objects.filter(day=day).first() or DailyStats(day=day)
+    storage_bytes = get_stats().storage_bytes
+
+    mail_admins(
+        _('Daily statistics for {}').format(day.isoformat()),
+        _(
+            'Activity on {day}:\n\n'
+            'Uploads: {uploads} ({bytes_uploaded})\n'
+            'Downloads: {downloads}\n'
+            'Bytes served: {bytes_served}\n'
+            'New users: {new_users}\n'
+            'Bytes stored: {bytes_stored}\n'
+        ).format(
+            day=day.isoformat(),
+            uploads=daily.uploads,
+            bytes_uploaded=filesizeformat(daily.bytes_uploaded),
+            downloads=daily.downloads,
+            bytes_served=filesizeformat(daily.bytes_served),
+            new_users=daily.new_users,
+            bytes_stored=filesizeformat(storage_bytes),
+        ),
+    )
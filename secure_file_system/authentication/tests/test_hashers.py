@@ -0,0 +1,81 @@
+import threading
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from authentication.hashers import hashing_slot
+from authentication.models import User
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='client@example.com',
+            password='testpass123',
+            user_type=User.UserType.CLIENT,
+            is_verified=True
+        )
+
+    def login(self):
+        return self.client.post(
+            reverse('token_obtain_pair'),
+            {'email': 'client@example.com', 'password': 'testpass123'},
+            content_type='application/json'
+        )
+
+    def test_new_passwords_use_argon2(self):
+        """Test that passwords are hashed with Argon2 at the configured cost."""
+        self.assertTrue(self.user.password.startswith('argon2$argon2id$'))
+        self.assertIn('m=19456,t=2,p=1', self.user.password)
+
+    def test_pbkdf2_hash_upgraded_on_login(self):
+        """Test that an existing PBKDF2 hash becomes Argon2 when its user logs in."""
+        User.objects.filter(pk=self.user.pk).update(
+            password=make_password('testpass123', hasher='pbkdf2_sha256')
+        )
+
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$'))
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    def test_cost_change_rehashes_on_login(self):
+        """Test that raising the Argon2 cost rehashes passwords as users log in."""
+        with override_settings(ARGON2_TIME_COST=3):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertIn('t=3', self.user.password)
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1, PASSWORD_HASH_WAIT=0)
+    def test_saturated_login_is_refused_early(self):
+        """Test that a login is refused with Retry-After while every slot is taken."""
+        holding, release = threading.Event(), threading.Event()
+
+        def hold_slot():
+            with hashing_slot():
+                holding.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=hold_slot)
+        thread.start()
+        try:
+            holding.wait(5)
+            response = self.login()
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1, PASSWORD_HASH_WAIT=0)
+    def test_pbkdf2_verify_does_not_wait_on_itself(self):
+        """Test that verifying PBKDF2, which hashes through encode, takes one slot."""
+        encoded = make_password('testpass123', hasher='pbkdf2_sha256')
+
+        self.assertTrue(check_password('testpass123', encoded))
@@ -0,0 +1,193 @@
+from unittest.mock import patch
+
+import redis
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.jwt import (
+    CachedJWTAuthentication,
+    VersionedRefreshToken,
+    blacklist_key,
+)
+from authentication.models import PasswordResetToken, User
+from authentication.views import (
+    ChangePasswordView,
+    LogoutView,
+    PasswordResetConfirmView,
+    RefreshTokenView,
+)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(
+            email='client@example.com',
+            password='testpass123',
+            user_type=User.UserType.CLIENT,
+            is_verified=True
+        )
+
+    def authenticate(self, token):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        user, _token = CachedJWTAuthentication().authenticate(request)
+        return user
+
+    def access_token(self, user=None):
+        return VersionedRefreshToken.for_user(user or self.user).access_token
+
+    def test_repeat_requests_do_not_query(self):
+        """Test that a user is loaded once and then served from the cache."""
+        token = self.access_token()
+        self.authenticate(token)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(token), self.user)
+
+    def test_password_change_revokes_tokens(self):
+        """Test that changing a password revokes old tokens and issues a new pair."""
+        token = self.access_token()
+        self.authenticate(token)
+        request = self.factory.post('/', {
+            'old_password': 'testpass123',
+            'new_password': 'newpass12345',
+            'confirm_password': 'newpass12345',
+        }, format='json')
+        force_authenticate(request, user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = ChangePasswordView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+        self.assertEqual(self.authenticate(response.data['access']), self.user)
+
+    def test_password_reset_revokes_tokens(self):
+        """Test that resetting a password revokes earlier tokens."""
+        token = self.access_token()
+        self.authenticate(token)
+        reset_token = PasswordResetToken.objects.create(user=self.user)
+        request = self.factory.post('/', {
+            'token': str(reset_token.token),
+            'new_password': 'newpass12345',
+            'confirm_password': 'newpass12345',
+        }, format='json')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = PasswordResetConfirmView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_deactivation_applies_on_next_request(self):
+        """Test that a deactivated user's cached entry is dropped."""
+        token = self.access_token()
+        self.authenticate(token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_user_type_change_applies_on_next_request(self):
+        """Test that a changed user type is reread rather than served from the cache."""
+        token = self.access_token()
+        self.authenticate(token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_type = User.UserType.OPERATIONS
+            self.user.save()
+
+        self.assertEqual(self.authenticate(token).user_type, User.UserType.OPERATIONS)
+
+    def test_unversioned_tokens_still_work(self):
+        """Test that tokens issued before versions existed are looked up each time."""
+        token = RefreshToken.for_user(self.user).access_token
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate(token), self.user)
+
+    def test_unreachable_cache_falls_back_to_the_database(self):
+        """Test that an unreachable token cache falls back to a query."""
+        with patch.object(caches['tokens'], 'get', side_effect=redis.ConnectionError):
+            self.assertEqual(self.authenticate(self.access_token()), self.user)
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='client@example.com',
+            password='testpass123',
+            user_type=User.UserType.CLIENT,
+            is_verified=True
+        )
+        self.refresh = VersionedRefreshToken.for_user(self.user)
+
+    def refresh_with(self, token):
+        return self.client.post(
+            reverse('token_refresh'),
+            {'refresh': str(token)},
+            content_type='application/json'
+        )
+
+    def test_rotated_token_cannot_be_reused(self):
+        """Test that a refresh token is refused once it has been rotated."""
+        response = self.refresh_with(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh_with(response.data['refresh']).status_code, 200)
+
+        self.assertEqual(self.refresh_with(self.refresh).status_code, 401)
+
+    def test_logout_blacklists_refresh_token(self):
+        """Test that a logged out refresh token can't be refreshed."""
+        request = APIRequestFactory().post(
+            '/', {'refresh': str(self.refresh)}, format='json'
+        )
+        force_authenticate(request, user=self.user)
+
+        response = LogoutView.as_view()(request)
+
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(self.refresh_with(self.refresh).status_code, 401)
+
+    def test_entry_lasts_as_long_as_the_token(self):
+        """Test that the blacklist entry expires when the token would have."""
+        self.refresh.blacklist()
+
+        key = caches['tokens'].make_key(blacklist_key(self.refresh['jti']))
+        ttl = caches['tokens']._cache.get_client().ttl(key)
+        self.assertGreater(ttl, 0)
+        self.assertLessEqual(ttl, self.refresh['exp'] - self.refresh['iat'])
+
+    def test_only_one_concurrent_rotation_wins(self):
+        """Test that blacklisting an already blacklisted token reports it."""
+        self.assertTrue(self.refresh.blacklist())
+        same_token = VersionedRefreshToken(str(self.refresh), verify=False)
+        self.assertFalse(same_token.blacklist())
+
+    def test_refresh_view_rotates_without_queries(self):
+        """Test that RefreshTokenView mints the new pair from the token alone."""
+        def refresh(token):
+            request = APIRequestFactory().post(
+                '/', {'refresh': str(token)}, format='json'
+            )
+            return RefreshTokenView.as_view()(request)
+
+        with self.assertNumQueries(0):
+            response = refresh(self.refresh)
+
+        self.assertEqual(response.status_code, 200)
+        new_refresh = VersionedRefreshToken(response.data['refresh'])
+        self.assertNotEqual(new_refresh['jti'], self.refresh['jti'])
+        self.assertEqual(new_refresh['ver'], self.user.token_version)
+        access = CachedJWTAuthentication().get_validated_token(response.data['access'])
+        self.assertEqual(response.data['access_expires'], access['exp'])
+        self.assertEqual(refresh(self.refresh).status_code, 400)
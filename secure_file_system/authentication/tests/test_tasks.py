@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.core import mail
+from django.test import TestCase, override_settings
+
+from authentication.tasks import send_daily_stats
+from files.models import DailyStats, SiteStats
+from files.stats import STATS_ID
+
+
+@override_settings(ADMINS=[('ops', 'ops@example.com'), ('cto', 'cto@example.com')])
+class SendDailyStatsTests(TestCase):
+    def test_report_reads_the_rollup(self):
+        """Test that the daily report is one email built from two small rows."""
+        DailyStats.objects.create(
+            day=date(2026, 3, 1), uploads=12, bytes_uploaded=3 * 1024 * 1024,
+            downloads=40, bytes_served=5 * 1024 * 1024, new_users=2
+        )
+        SiteStats.objects.update_or_create(
+            pk=STATS_ID, defaults={'storage_bytes': 7 * 1024 ** 3}
+        )
+
+        with self.assertNumQueries(2):
+            send_daily_stats.apply(kwargs={'day': '2026-03-01'})
+
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual(message.to, ['ops@example.com', 'cto@example.com'])
+        self.assertIn('2026-03-01', message.subject)
+        self.assertIn('Uploads: 12 (3.0\xa0MB)', message.body)
+        self.assertIn('Downloads: 40', message.body)
+        self.assertIn('New users: 2', message.body)
+        self.assertIn('Bytes stored: 7.0\xa0GB', message.body)
+
+    def test_quiet_day(self):
+        """Test that a day with no activity still gets a report of zeros."""
+        send_daily_stats.apply(kwargs={'day': '2026-03-02'})
+
+        self.assertIn('Uploads: 0', mail.outbox[0].body)
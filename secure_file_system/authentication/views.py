@@ -1,6 +1,5 @@
 import logging
 from django.conf import settings
-from django.utils import timezone
 from django.core.mail import send_mail
 from django.utils.translation import gettext_lazy as _
 from rest_framework import status, generics, permissions
@@ -9,9 +8,8 @@ from rest_framework.response import Response
 # type: ignore
 from rest_framework_simplejwt.views import TokenObtainPairView
 # type: ignore
-from rest_framework_simplejwt.tokens import RefreshToken
-# type: ignore
 from rest_framework_simplejwt.exceptions import TokenError
+from .jwt import VersionedRefreshToken
 from .models import User, EmailVerificationToken, PasswordResetToken
 from .tasks import send_verification_email_task
 from .serializers import (
@@ -21,6 +19,7 @@ from .serializers import (
     ChangePasswordSerializer, RefreshTokenSerializer
 )
 from rest_framework.exceptions import ValidationError
+from config.ratelimit import TokenBucketThrottle
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +29,8 @@ class ResendVerificationEmailView(APIView):
     API endpoint to resend the verification email.
     """
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'resend_verification'
 
     def post(self, request, *args, **kwargs):
         email = request.data.get('email')
@@ -82,6 +83,8 @@ class UserRegistrationView(generics.CreateAPIView):
     """
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'register'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -111,6 +114,8 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     to include additional user data in the response.
     """
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
 
 
 class EmailVerificationView(APIView):
@@ -148,6 +153,8 @@ class PasswordResetRequestView(APIView):
     API endpoint to request a password reset email.
     """
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'password_reset'
     
     def post(self, request, *args, **kwargs):
         serializer = PasswordResetRequestSerializer(data=request.data)
@@ -204,8 +211,9 @@ class PasswordResetConfirmView(APIView):
         reset_token = serializer.validated_data['reset_token']
         user = reset_token.user
         
-        # Update user's password
+        # Update user's password and sign out everywhere
         user.set_password(serializer.validated_data['new_password'])
+        user.revoke_tokens()
         user.save()
         
         # Mark token as used
@@ -231,12 +239,19 @@ class ChangePasswordView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         
-        # Update user's password
+        # Update user's password and revoke every token issued before,
+        # handing this client a new pair
         request.user.set_password(serializer.validated_data['new_password'])
+        request.user.revoke_tokens()
         request.user.save()
+        refresh = VersionedRefreshToken.for_user(request.user)
         
         return Response(
-            {'message': _('Password updated successfully.')},
+            {
+                'message': _('Password updated successfully.'),
+                'refresh': str(refresh),
+                'access': str(refresh.access_token)
+            },
             status=status.HTTP_200_OK
         )
 
@@ -267,7 +282,7 @@ class LogoutView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            token = RefreshToken(refresh_token)
+            token = VersionedRefreshToken(refresh_token)
             token.blacklist()
             
             return Response(
@@ -288,32 +303,21 @@ class RefreshTokenView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def post(self, request, *args, **kwargs):
+        # Decoded and checked against the blacklist once, here
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
         try:
-            serializer = RefreshTokenSerializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-            
-            refresh_token = serializer.validated_data['refresh']
-            
-            # Create a new access token from the refresh token
-            token = RefreshToken(refresh_token)
-            access = str(token.access_token)
-            
-            # Rotate the refresh token (optional but recommended)
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            user = User.objects.get(id=token['user_id'])
-            refresh = str(RefreshToken.for_user(user))
-            
-            # Blacklist the old refresh token
-            token.blacklist()
-            
-            # Calculate token expiration time
-            access_expires = int((timezone.now() + settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']).timestamp())
+            # The new pair is minted from the validated claims, so no user is
+            # loaded; a revoked token version carries over into both tokens,
+            # which authentication then refuses
+            refresh = serializer.validated_data['refresh'].rotate()
+            access = refresh.access_token
             
             return Response({
-                'access': access,
-                'refresh': refresh,
-                'access_expires': access_expires
+                'access': str(access),
+                'refresh': str(refresh),
+                'access_expires': access['exp']
             })
             
         except TokenError as e:
@@ -321,11 +325,6 @@ class RefreshTokenView(APIView):
                 {'error': _('Invalid or expired refresh token.')},
                 status=status.HTTP_401_UNAUTHORIZED
             )
-        except User.DoesNotExist:
-            return Response(
-                {'error': _('User not found.')},
-                status=status.HTTP_404_NOT_FOUND
-            )
         except Exception as e:
             logger.error(f"Error refreshing token: {str(e)}")
             return Response(
@@ -3,8 +3,6 @@ Custom admin site configuration for the Secure File System.
 """
 from django.contrib import admin
 from django.urls import reverse
-from django.utils import timezone
-from django.db.models import Sum, Count, Q
 from django.utils.translation import gettext_lazy as _
 import logging
 
@@ -15,11 +13,12 @@ except ImportError:
     User = None
     
 try:
-    from files.models import File, SharedFile, DownloadLog
+    from files.models import File, DownloadLog
+    from files.stats import get_stats
 except ImportError:
     File = None
-    SharedFile = None
     DownloadLog = None
+    get_stats = None
 
 logger = logging.getLogger(__name__)
 
@@ -56,15 +55,25 @@ class CustomAdminSite(admin.AdminSite):
         recent_activity = []
         
         try:
-            # User statistics
+            # Totals are kept up to date by files.stats rather than counted here
+            if get_stats is not None:
+                site_stats = get_stats()
+                stats.update({
+                    'user_count': site_stats.user_count,
+                    'new_users_this_week': site_stats.new_users_this_week,
+                    'file_count': site_stats.file_count,
+                    # Convert to MB
+                    'total_file_size_mb': round(
+                        site_stats.storage_bytes / (1024 * 1024), 2
+                    ),
+                    'download_count': site_stats.download_count,
+                    'downloads_this_week': site_stats.downloads_this_week,
+                    'reconciled_at': site_stats.reconciled_at,
+                })
+            
+            # Recent activity only reads the newest few rows of each index
             if User is not None:
-                stats['user_count'] = User.objects.count()
-                stats['new_users_this_week'] = User.objects.filter(
-                    date_joined__gte=timezone.now() - timezone.timedelta(days=7)
-                ).count()
-                
-                # Add recent user registrations to activity
-                recent_users = User.objects.order_by('-date_joined').select_related('profile')[:5]
+                recent_users = User.objects.order_by('-date_joined')[:5]
                 for user in recent_users:
                     recent_activity.append({
                         'message': f'New user registered: {user.email}',
@@ -72,53 +81,28 @@ class CustomAdminSite(admin.AdminSite):
                         'icon': 'fa-user-plus',
                         'url': reverse('admin:authentication_user_change', args=[user.id])
                     })
-            else:
-                stats['user_count'] = 0
-                stats['new_users_this_week'] = 0
             
-            # File statistics
             if File is not None:
-                stats['file_count'] = File.objects.count()
-                
-                # Calculate total storage used
-                total_size = File.objects.aggregate(
-                    total_size=Sum('size')
-                )['total_size'] or 0
-                stats['total_file_size_mb'] = round(total_size / (1024 * 1024), 2)  # Convert to MB
-                
-                # Add recent uploads to activity
-                recent_uploads = File.objects.order_by('-uploaded_at').select_related('uploaded_by')[:5]
+                recent_uploads = File.objects.order_by('-created_at').only(
+                    'id', 'original_filename', 'created_at'
+                )[:5]
                 for file in recent_uploads:
                     recent_activity.append({
                         'message': f'New file uploaded: {file.original_filename}',
-                        'time': file.uploaded_at,
+                        'time': file.created_at,
                         'icon': 'fa-file-upload',
                         'url': reverse('admin:files_file_change', args=[file.id])
                     })
-            else:
-                stats['file_count'] = 0
-                stats['total_file_size_mb'] = 0
             
-            # Download statistics
             if DownloadLog is not None:
-                stats['download_count'] = DownloadLog.objects.count()
-                stats['downloads_this_week'] = DownloadLog.objects.filter(
-                    downloaded_at__gte=timezone.now() - timezone.timedelta(days=7)
-                ).count()
-                
-                # Add recent downloads to activity
-                recent_downloads = DownloadLog.objects.select_related('file', 'user') \
-                                                   .order_by('-downloaded_at')[:5]
+                recent_downloads = DownloadLog.objects.order_by('-downloaded_at')[:5]
                 for dl in recent_downloads:
                     recent_activity.append({
-                        'message': f'File downloaded: {dl.file.original_filename if dl.file else "Unknown file"}',
+                        'message': f'File downloaded: {dl.file_name}',
                         'time': dl.downloaded_at,
                         'icon': 'fa-download',
-                        'url': reverse('admin:files_downloadlog_change', args=[dl.id]) if dl.id else '#'
+                        'url': reverse('admin:files_downloadlog_change', args=[dl.id])
                     })
-            else:
-                stats['download_count'] = 0
-                stats['downloads_this_week'] = 0
                 
         except Exception as e:
             logger.error(f'Error generating admin dashboard: {str(e)}', exc_info=True)
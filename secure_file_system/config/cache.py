@@ -0,0 +1,169 @@
+"""
+Cache building blocks used by ``CACHES`` in settings.
+
+Every Redis cache alias draws its connections from ``SharedConnectionPool``,
+one pool per Redis server per process. Django would otherwise open a
+separate pool for each alias in each thread.
+
+``TieredCache`` puts a small in-process LRU (L1) in front of a shared cache
+(L2) for hot keys. Reads are served from L1 for up to ``L1_TIMEOUT``
+seconds without a network round trip. Misses fall through to L2 and are
+copied into L1. Writes and deletes go to both tiers, but another process
+may keep serving its L1 copy for up to ``L1_TIMEOUT`` seconds. Keep that
+short, and only tier values that can tolerate it.
+"""
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import redis
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class SharedConnectionPool(redis.BlockingConnectionPool):
+    """
+    Connection pool shared by every cache alias and thread that talks to the
+    same Redis server with the same options.
+
+    It blocks for up to ``timeout`` seconds when all ``max_connections`` are
+    in use rather than failing straight away. redis-py resets pools after a
+    fork, so sharing is safe under gunicorn and Celery prefork workers.
+    """
+    _pools: Dict[Tuple, 'SharedConnectionPool'] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> 'SharedConnectionPool':
+        key = (url, tuple(sorted(kwargs.items())))
+        with cls._lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls._pools[key] = super().from_url(url, **kwargs)
+        return pool
+
+
+class TieredCache(BaseCache):
+    """
+    An in-process LRU cache in front of a shared one.
+
+    ``LOCATION`` names the L2 alias and ``OPTIONS['L1']`` the L1 alias (a
+    LocMemCache, which evicts least recently used entries once it holds
+    ``MAX_ENTRIES``). ``OPTIONS['L1_TIMEOUT']`` caps how long L1 holds a
+    value. If L2 is unreachable, reads fall back to L1 alone and writes only
+    reach L1.
+    """
+
+    def __init__(self, location: str, params: Dict[str, Any]) -> None:
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location
+        self._l1_alias = options.get('L1', 'local')
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+
+    @property
+    def l1(self) -> BaseCache:
+        return caches[self._l1_alias]
+
+    @property
+    def l2(self) -> BaseCache:
+        return caches[self._l2_alias]
+
+    def _timeouts(self, timeout: Any) -> Tuple[Optional[float], Optional[float]]:
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return timeout, self.l1_timeout
+        return timeout, min(timeout, self.l1_timeout)
+
+    def get(self, key: str, default: Any = None, version: Optional[int] = None) -> Any:
+        value = self.l1.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        try:
+            value = self.l2.get(key, _MISSING, version=version)
+        except redis.RedisError:
+            logger.warning('L2 cache %s unavailable; treating %s as a miss',
+                           self._l2_alias, key, exc_info=True)
+            return default
+        if value is _MISSING:
+            return default
+        self.l1.set(key, value, self.l1_timeout, version=version)
+        return value
+
+    def get_many(self, keys: Iterable[str],
+                 version: Optional[int] = None) -> Dict[str, Any]:
+        keys = list(keys)
+        found = self.l1.get_many(keys, version=version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            try:
+                from_l2 = self.l2.get_many(missing, version=version)
+            except redis.RedisError:
+                logger.warning('L2 cache %s unavailable; treating keys as misses',
+                               self._l2_alias, exc_info=True)
+                from_l2 = {}
+            if from_l2:
+                self.l1.set_many(from_l2, self.l1_timeout, version=version)
+                found.update(from_l2)
+        return found
+
+    def set(self, key: str, value: Any, timeout: Any = DEFAULT_TIMEOUT,
+            version: Optional[int] = None) -> None:
+        timeout, l1_timeout = self._timeouts(timeout)
+        try:
+            self.l2.set(key, value, timeout, version=version)
+        except redis.RedisError:
+            logger.warning('L2 cache %s unavailable; caching %s in-process only',
+                           self._l2_alias, key, exc_info=True)
+        self.l1.set(key, value, l1_timeout, version=version)
+
+    def set_many(self, data: Dict[str, Any], timeout: Any = DEFAULT_TIMEOUT,
+                 version: Optional[int] = None) -> list:
+        timeout, l1_timeout = self._timeouts(timeout)
+        try:
+            self.l2.set_many(data, timeout, version=version)
+        except redis.RedisError:
+            logger.warning('L2 cache %s unavailable; caching in-process only',
+                           self._l2_alias, exc_info=True)
+        self.l1.set_many(data, l1_timeout, version=version)
+        return []
+
+    def add(self, key: str, value: Any, timeout: Any = DEFAULT_TIMEOUT,
+            version: Optional[int] = None) -> bool:
+        timeout, l1_timeout = self._timeouts(timeout)
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self.l1.set(key, value, l1_timeout, version=version)
+        return added
+
+    def touch(self, key: str, timeout: Any = DEFAULT_TIMEOUT,
+              version: Optional[int] = None) -> bool:
+        timeout, l1_timeout = self._timeouts(timeout)
+        self.l1.touch(key, l1_timeout, version=version)
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key: str, version: Optional[int] = None) -> bool:
+        self.l1.delete(key, version=version)
+        return self.l2.delete(key, version=version)
+
+    def delete_many(self, keys: Iterable[str], version: Optional[int] = None) -> None:
+        keys = list(keys)
+        self.l1.delete_many(keys, version=version)
+        self.l2.delete_many(keys, version=version)
+
+    def has_key(self, key: str, version: Optional[int] = None) -> bool:
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key: str, delta: int = 1, version: Optional[int] = None) -> int:
+        # Counters live in L2 only; a cached copy would go stale at once
+        self.l1.delete(key, version=version)
+        return self.l2.incr(key, delta, version=version)
+
+    def clear(self) -> None:
+        """Empty this process's L1 only; L2 is shared with other aliases."""
+        self.l1.clear()
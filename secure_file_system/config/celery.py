@@ -1,6 +1,7 @@
 import os
 import logging
 from celery import Celery
+from celery.schedules import crontab
 from django.conf import settings
 
 # Set the default Django settings module
@@ -42,9 +43,26 @@ app.conf.beat_schedule = {
         'task': 'files.tasks.cleanup_expired_share_links',
         'schedule': 86400.0,  # Run daily
     },
+    'cleanup-upload-sessions': {
+        'task': 'files.tasks.cleanup_upload_sessions',
+        'schedule': 3600.0,  # Run hourly
+    },
+    'flush-download-log': {
+        'task': 'files.tasks.flush_download_log',
+        'schedule': float(settings.DOWNLOAD_LOG_FLUSH_INTERVAL),
+    },
+    'maintain-download-log-partitions': {
+        'task': 'files.tasks.maintain_download_log_partitions',
+        'schedule': 86400.0,  # Run daily
+    },
+    'reconcile-site-stats': {
+        'task': 'files.tasks.reconcile_site_stats',
+        'schedule': 3600.0,  # Run hourly
+    },
     'send-email-notifications': {
         'task': 'authentication.tasks.send_daily_stats',
-        'schedule': 86400.0,  # Run daily
+        # Daily, reporting on the day just ended
+        'schedule': crontab(hour=0, minute=15),
     },
 }
 
@@ -0,0 +1,172 @@
+"""
+Token bucket rate limiting in Redis.
+
+Logging in, registering, resending verification emails, requesting password
+resets and downloading through public share links are open to anyone, and
+each costs database queries, a password hash or an email. ``RATE_LIMITS``
+in settings gives each of these scopes a rate per key, for instance::
+
+    'login': {'ip': '30/min', 'user': '10/min'}
+
+Every key gets a bucket that holds up to N tokens and refills at N per
+period, so a client can burst N requests and then continue at the average
+rate. A request takes a token from each of its scope's buckets, or from
+none if any is empty, in one Lua script: one round trip per request however
+many keys the scope has. A refused request is answered with 429 and a
+``Retry-After`` of the seconds until its emptiest bucket has a token again.
+
+Requests are keyed by:
+
+``ip``
+    The client address, as DRF finds it behind ``NUM_PROXIES`` proxies.
+``user``
+    The authenticated user, or else the email address submitted in the
+    request body, so one account can't be targeted from many addresses.
+``share_token``
+    The share link token in the URL, or else the ``token`` query parameter.
+
+A key that a request doesn't have (no email submitted, say) is skipped.
+Buckets live in the ``ratelimit`` cache's Redis and expire once they would
+be full again. If Redis is unreachable, requests are let through.
+"""
+import hashlib
+import logging
+import time
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import redis
+from django.conf import settings
+from django.core.cache import caches
+from redis.commands.core import Script
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'ratelimit'
+
+PERIODS = {
+    's': 1, 'sec': 1,
+    'm': 60, 'min': 60,
+    'h': 3600, 'hour': 3600,
+    'd': 86400, 'day': 86400,
+}
+
+# KEYS: bucket keys. ARGV: the time, then capacity and refill per second
+# for each key. Returns the seconds to wait as a string (Lua numbers come
+# back truncated to integers), '0' if a token was taken from every bucket.
+TAKE_TOKEN = Script(None, b"""
+local now = tonumber(ARGV[1])
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'at')
+    local left = tonumber(bucket[1]) or capacity
+    local at = tonumber(bucket[2]) or now
+    left = math.min(capacity, left + math.max(0, now - at) * rate)
+    if left < 1 then
+        wait = math.max(wait, (1 - left) / rate)
+    end
+    tokens[i] = left
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', tokens[i] - 1, 'at', now)
+    redis.call('PEXPIRE', key, math.ceil((capacity - tokens[i] + 1) / rate * 1000))
+end
+return '0'
+""")
+
+Bucket = Tuple[str, int, float]
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """Turn ``'10/min'`` into a capacity of 10 and a refill of 10/60 tokens a second."""
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period]
+
+
+def bucket_key(scope: str, kind: str, ident: str) -> str:
+    return f'{scope}:{kind}:{ident}'
+
+
+def take(buckets: List[Bucket]) -> float:
+    """
+    Take a token from every bucket, given as ``(key, capacity, refill per
+    second)``, or from none. Returns 0 if they were taken, otherwise the
+    seconds until all of them have one.
+    """
+    if not buckets:
+        return 0
+    cache = caches[CACHE_ALIAS]
+    keys = [cache.make_key(key) for key, _capacity, _rate in buckets]
+    args: List[Any] = [time.time()]
+    for _key, capacity, rate in buckets:
+        args += [capacity, rate]
+    try:
+        return float(TAKE_TOKEN(keys, args, client=cache._cache.get_client(write=True)))
+    except redis.RedisError:
+        logger.warning('Rate limit cache unavailable; letting the request through',
+                       exc_info=True)
+        return 0
+
+
+def _hashed(value: str) -> str:
+    # Keeps submitted values out of Redis keys and bounds their length
+    return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+
+def _user(throttle: BaseThrottle, request: Any, view: Any) -> Optional[str]:
+    if request.user and request.user.is_authenticated:
+        return str(request.user.pk)
+    data = request.data
+    email = data.get('email') if isinstance(data, Mapping) else None
+    if not isinstance(email, str) or not email.strip():
+        return None
+    return _hashed(email.strip().lower())
+
+
+def _share_token(throttle: BaseThrottle, request: Any, view: Any) -> Optional[str]:
+    token = view.kwargs.get('token')
+    if token:
+        return str(token)
+    token = request.query_params.get('token')
+    return _hashed(token) if token else None
+
+
+KEYS: Dict[str, Callable[[BaseThrottle, Any, Any], Optional[str]]] = {
+    'ip': lambda throttle, request, view: throttle.get_ident(request),
+    'user': _user,
+    'share_token': _share_token,
+}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Limits a view to the ``RATE_LIMITS`` policy named by its
+    ``throttle_scope``. Views without a scope or policy aren't limited.
+    """
+
+    def __init__(self) -> None:
+        self.wait_seconds = 0.0
+
+    def allow_request(self, request: Any, view: Any) -> bool:
+        scope = getattr(view, 'throttle_scope', None)
+        policy = settings.RATE_LIMITS.get(scope, {}) if scope else {}
+        buckets = []
+        for kind, rate in policy.items():
+            ident = KEYS[kind](self, request, view)
+            if ident is not None:
+                buckets.append((bucket_key(scope, kind, ident), *parse_rate(rate)))
+        self.wait_seconds = take(buckets)
+        return not self.wait_seconds
+
+    def wait(self) -> Optional[float]:
+        return self.wait_seconds or None
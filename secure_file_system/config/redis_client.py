@@ -0,0 +1,18 @@
+"""
+Shared Redis connection for application state that lives outside the database.
+"""
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> redis.Redis:
+    """
+    Return the process-wide Redis client.
+
+    The client owns a connection pool, which redis-py resets after a fork, so
+    it is safe to share between gunicorn and Celery worker processes.
+    """
+    return redis.Redis.from_url(settings.REDIS_URL)
@@ -59,13 +59,15 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@securefileshare.co
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.jwt.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Proxies in front of the app, so rate limits see the client's address
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
@@ -81,6 +83,11 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Rotated refresh tokens are blacklisted in the token cache (see
+    # authentication.jwt)
+    'TOKEN_REFRESH_SERIALIZER': (
+        'authentication.serializers.RotatingTokenRefreshSerializer'
+    ),
 }
 
 # File upload settings
@@ -103,6 +110,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
@@ -194,6 +202,21 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing (see authentication.hashers). Passwords hashed with PBKDF2
+# or with other Argon2 costs are rehashed when their user next logs in.
+PASSWORD_HASHERS = [
+    'authentication.hashers.BoundedArgon2PasswordHasher',
+    'authentication.hashers.BoundedPBKDF2PasswordHasher',
+]
+# Argon2id cost; the defaults are OWASP's minimum (19 MiB, 2 passes, 1 lane)
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', 19456))  # KiB
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', 1))
+# At most this many passwords are hashed at once per worker process; a hash
+# that can't start within PASSWORD_HASH_WAIT seconds is refused with a 503
+PASSWORD_HASH_CONCURRENCY = int(os.getenv('PASSWORD_HASH_CONCURRENCY', 2))
+PASSWORD_HASH_WAIT = float(os.getenv('PASSWORD_HASH_WAIT', 0.5))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -263,13 +286,15 @@ AUTHENTICATION_BACKENDS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.jwt.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Proxies in front of the app, so rate limits see the client's address
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
 }
 
 # JWT Settings
@@ -279,6 +304,11 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': True,
+    # Rotated refresh tokens are blacklisted in the token cache (see
+    # authentication.jwt)
+    'TOKEN_REFRESH_SERIALIZER': (
+        'authentication.serializers.RotatingTokenRefreshSerializer'
+    ),
 }
 
 # Email settings
@@ -290,6 +320,13 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@example.com')
 
+# Comma-separated addresses that get error reports and the daily statistics
+ADMINS = [
+    (email, email)
+    for email in os.getenv('ADMINS', '').replace(' ', '').split(',')
+    if email
+]
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -305,6 +342,72 @@ CORS_ALLOW_ALL_ORIGINS = True  # For development only
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Stream uploads to their final storage location instead of buffering them in
+# memory (or a temporary file) first; see files.upload_handlers
+FILE_UPLOAD_STREAMING = os.getenv('FILE_UPLOAD_STREAMING', 'True') == 'True'
+
+# Let the front proxy stream download bodies (see files.downloads):
+# '' serves files from Django, 'x-accel-redirect' for nginx, 'x-sendfile' for
+# Apache/lighttpd. FILE_DOWNLOAD_ACCEL_PREFIX is the nginx `internal` location
+# aliased to MEDIA_ROOT.
+FILE_DOWNLOAD_OFFLOAD = os.getenv('FILE_DOWNLOAD_OFFLOAD', '')
+FILE_DOWNLOAD_ACCEL_PREFIX = os.getenv(
+    'FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/'
+)
+
+# How long after a counted download the same client may resume it with Range
+# requests without using up another download on the share link
+FILE_DOWNLOAD_RESUME_WINDOW = int(os.getenv('FILE_DOWNLOAD_RESUME_WINDOW', 3600))
+
+# Lifetime in seconds of the signed links handed out by get-download-link
+# (see files.download_tokens)
+FILE_DOWNLOAD_TOKEN_TTL = int(os.getenv('FILE_DOWNLOAD_TOKEN_TTL', 24 * 60 * 60))
+
+# How many of the newest matches a file search ranks (see files.search)
+FILE_SEARCH_MAX_CANDIDATES = int(os.getenv('FILE_SEARCH_MAX_CANDIDATES', 1000))
+
+# Limits on the document text extracted for search (see files.extraction).
+# Extraction stops at whichever is reached first
+FILE_CONTENT_MAX_CHARS = int(os.getenv('FILE_CONTENT_MAX_CHARS', 200_000))
+FILE_CONTENT_MAX_XML_BYTES = int(
+    os.getenv('FILE_CONTENT_MAX_XML_BYTES', 256 * 1024 * 1024)
+)
+
+# Collect upload notifications for this many seconds and send each staff user
+# one digest per window (see files.notifications); 0 notifies of every upload
+FILE_UPLOAD_DIGEST_WINDOW = int(os.getenv('FILE_UPLOAD_DIGEST_WINDOW', 0))
+
+# Expired share links are deactivated, and deleted this many days after they
+# expire, this many rows per statement (see files.share_link_cleanup)
+SHARE_LINK_RETENTION_DAYS = int(os.getenv('SHARE_LINK_RETENTION_DAYS', 30))
+SHARE_LINK_CLEANUP_BATCH_SIZE = int(os.getenv('SHARE_LINK_CLEANUP_BATCH_SIZE', 1000))
+
+# Longest a share link's validation is cached for repeat downloads, in
+# seconds (see files.share_link_cache); never longer than the link lives
+SHARE_LINK_CACHE_TIMEOUT = int(os.getenv('SHARE_LINK_CACHE_TIMEOUT', 300))
+
+# How long an authenticated user is cached for repeat requests with the same
+# token version, in seconds (see authentication.jwt)
+JWT_USER_CACHE_TIMEOUT = int(os.getenv('JWT_USER_CACHE_TIMEOUT', 60))
+
+# Token bucket rate limits for the public endpoints (see config.ratelimit),
+# per scope and key: each key may burst to the count, then continue at the
+# count per period. Client addresses are read behind NUM_PROXIES proxies.
+RATE_LIMITS = {
+    'login': {'ip': '30/min', 'user': '10/min'},
+    'register': {'ip': '20/hour'},
+    'resend_verification': {'ip': '10/hour', 'user': '3/hour'},
+    'password_reset': {'ip': '10/hour', 'user': '3/hour'},
+    'share_download': {'ip': '120/min', 'share_token': '600/min'},
+}
+
+# Download audit log (see files.download_log): entries are buffered in Redis
+# and written this many at a time, at least every DOWNLOAD_LOG_FLUSH_INTERVAL
+# seconds. Monthly partitions older than the retention period are dropped
+DOWNLOAD_LOG_BATCH_SIZE = int(os.getenv('DOWNLOAD_LOG_BATCH_SIZE', 500))
+DOWNLOAD_LOG_FLUSH_INTERVAL = int(os.getenv('DOWNLOAD_LOG_FLUSH_INTERVAL', 10))
+DOWNLOAD_LOG_RETENTION_DAYS = int(os.getenv('DOWNLOAD_LOG_RETENTION_DAYS', 365))
+
 # MinIO settings
 MINIO_ENDPOINT = os.getenv('MINIO_ENDPOINT', 'localhost:9000')
 MINIO_ACCESS_KEY = os.getenv('MINIO_ACCESS_KEY', 'minioadmin')
@@ -327,3 +430,75 @@ CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:63
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+
+# Redis for shared application state (defaults to the Celery broker)
+REDIS_URL = os.getenv('REDIS_URL', CELERY_BROKER_URL)
+
+# Caches (see config.cache). Each Redis alias can point at its own server, and
+# so its own maxmemory-policy: tokens and rate limits must stay until they
+# expire, so they default to REDIS_URL, while general and query caches belong
+# on a server that evicts least recently used keys (allkeys-lru). Connections
+# come from one pool per server per process.
+REDIS_CACHE_URL = os.getenv('REDIS_CACHE_URL', REDIS_URL)
+CACHE_MAX_CONNECTIONS = int(os.getenv('CACHE_MAX_CONNECTIONS', 50))
+CACHE_POOL_OPTIONS = {
+    'pool_class': 'config.cache.SharedConnectionPool',
+    'max_connections': CACHE_MAX_CONNECTIONS,
+    'timeout': 1,  # Seconds to wait for a free connection
+    'socket_connect_timeout': 1,
+    'socket_timeout': 1,
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_CACHE_URL,
+        'KEY_PREFIX': 'default',
+        'TIMEOUT': 300,
+        'OPTIONS': CACHE_POOL_OPTIONS,
+    },
+    # Token state: revocations, verified-token results
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_TOKENS_URL', REDIS_URL),
+        'KEY_PREFIX': 'tokens',
+        'TIMEOUT': 3600,
+        'OPTIONS': CACHE_POOL_OPTIONS,
+    },
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_RATELIMIT_URL', REDIS_URL),
+        'KEY_PREFIX': 'ratelimit',
+        'TIMEOUT': 60,
+        'OPTIONS': CACHE_POOL_OPTIONS,
+    },
+    # Results of expensive queries; safe to lose at any time
+    'queries': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_CACHE_URL,
+        'KEY_PREFIX': 'queries',
+        'TIMEOUT': 60,
+        'OPTIONS': CACHE_POOL_OPTIONS,
+    },
+    # In-process L1, least recently used entries evicted first
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'l1',
+        'TIMEOUT': 5,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_L1_MAX_ENTRIES', 10_000)),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    # Hot keys such as share-link validity: L1 in front of the default cache
+    'hot': {
+        'BACKEND': 'config.cache.TieredCache',
+        'LOCATION': 'default',
+        'TIMEOUT': 300,
+        'OPTIONS': {'L1': 'local', 'L1_TIMEOUT': int(os.getenv('CACHE_L1_TIMEOUT', 5))},
+    },
+}
+
+# Resumable upload sessions (see files.upload_sessions)
+# 5MB
+UPLOAD_SESSION_CHUNK_SIZE = int(os.getenv('UPLOAD_SESSION_CHUNK_SIZE', 5 * 1024 * 1024))
+UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 60 * 60))  # 24 hours
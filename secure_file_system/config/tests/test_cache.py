@@ -0,0 +1,86 @@
+import threading
+from unittest.mock import patch
+
+import redis
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.hot = caches['hot']
+        self.l2 = caches['default']
+        self.addCleanup(self.l2.delete_many, ['link', 'counter', 'a', 'b'])
+        self.addCleanup(self.hot.clear)
+
+    def test_hot_key_served_from_process_memory(self):
+        """Test that a cached value is read without going to Redis."""
+        self.hot.set('link', 'valid')
+
+        with patch.object(self.l2, 'get', side_effect=AssertionError('went to L2')):
+            self.assertEqual(self.hot.get('link'), 'valid')
+
+    def test_miss_falls_through_and_is_kept(self):
+        """Test that a value only in Redis is found, then served from memory."""
+        self.l2.set('link', 'valid')
+
+        self.assertEqual(self.hot.get('link'), 'valid')
+        with patch.object(self.l2, 'get', side_effect=AssertionError('went to L2')):
+            self.assertEqual(self.hot.get('link'), 'valid')
+
+    def test_other_processes_see_changes_once_l1_expires(self):
+        """Test that a change made elsewhere shows up when the local copy expires."""
+        self.hot.set('link', 'valid')
+        # Another process revokes it
+        self.l2.set('link', 'revoked')
+
+        self.assertEqual(self.hot.get('link'), 'valid')
+        caches['local'].delete('link')
+        self.assertEqual(self.hot.get('link'), 'revoked')
+
+    def test_local_copy_never_outlives_a_shorter_timeout(self):
+        """Test that a value cached briefly isn't held in memory for longer."""
+        with patch.object(caches['local'], 'set') as mock_set:
+            self.hot.set('link', 'valid', timeout=2)
+
+        self.assertEqual(mock_set.call_args.args[2], 2)
+
+    def test_get_many(self):
+        """Test that a batch read combines both tiers."""
+        self.hot.set('a', 1)
+        self.l2.set('b', 2)
+
+        self.assertEqual(self.hot.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+
+    def test_counters_are_not_tiered(self):
+        """Test that incr always reaches the shared counter."""
+        self.hot.set('counter', 1)
+
+        self.assertEqual(self.hot.incr('counter'), 2)
+        self.assertEqual(self.hot.get('counter'), 2)
+
+    def test_unreachable_redis_is_a_miss(self):
+        """Test that losing Redis degrades to the in-process cache, not a failure."""
+        with patch.object(self.l2, 'get', side_effect=redis.ConnectionError), \
+                patch.object(self.l2, 'set', side_effect=redis.ConnectionError):
+            self.assertIsNone(self.hot.get('link'))
+            self.hot.set('link', 'valid')
+            self.assertEqual(self.hot.get('link'), 'valid')
+
+
+class SharedConnectionPoolTests(SimpleTestCase):
+    def pool(self, alias):
+        return caches[alias]._cache.get_client(write=True).connection_pool
+
+    def test_aliases_on_one_server_share_a_pool(self):
+        """Test that cache aliases pointing at the same server share connections."""
+        self.assertIs(self.pool('default'), self.pool('queries'))
+
+    def test_threads_share_a_pool(self):
+        """Test that each thread's cache objects reuse the process's pool."""
+        pools = []
+        thread = threading.Thread(target=lambda: pools.append(self.pool('default')))
+        thread.start()
+        thread.join()
+
+        self.assertIs(pools[0], self.pool('default'))
@@ -0,0 +1,124 @@
+import uuid
+from unittest.mock import patch
+
+import redis
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from authentication.models import User
+
+LIMITS = {
+    'login': {'ip': '3/min', 'user': '2/min'},
+    'share_download': {'ip': '100/min', 'share_token': '2/min'},
+}
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        self.cache = caches['ratelimit']
+        self.redis = self.cache._cache.get_client(write=True)
+        self.addCleanup(self.forget_buckets)
+        User.objects.create_user(
+            email='client@example.com', password='testpass123', is_verified=True
+        )
+
+    def forget_buckets(self):
+        for key in self.redis.scan_iter(match=self.cache.make_key('*')):
+            self.redis.delete(key)
+
+    def login(self, email='client@example.com', ip='10.0.0.1'):
+        return self.client.post(
+            reverse('token_obtain_pair'),
+            {'email': email, 'password': 'wrong-password'},
+            content_type='application/json',
+            REMOTE_ADDR=ip
+        )
+
+    def test_login_refused_once_the_account_bucket_is_empty(self):
+        """Test that an account is limited across addresses, with Retry-After."""
+        self.assertEqual(self.login(ip='10.0.0.1').status_code, 401)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, 401)
+
+        response = self.login(ip='10.0.0.3')
+
+        self.assertEqual(response.status_code, 429)
+        # 2/min refills a token every 30 seconds
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_address_limited_across_accounts(self):
+        """Test that one address can't spread attempts over many accounts."""
+        for n in range(3):
+            self.assertEqual(self.login(email=f'user{n}@example.com').status_code, 401)
+
+        self.assertEqual(self.login(email='user3@example.com').status_code, 429)
+
+    def test_bucket_refills(self):
+        """Test that a drained bucket lets requests through again as it refills."""
+        with patch('config.ratelimit.time.time', return_value=1000.0):
+            self.login()
+            self.login()
+            self.assertEqual(self.login().status_code, 429)
+
+        with patch('config.ratelimit.time.time', return_value=1030.0):
+            self.assertEqual(self.login().status_code, 401)
+            self.assertEqual(self.login().status_code, 429)
+
+    def test_refused_request_takes_no_tokens(self):
+        """Test that a request refused by one bucket leaves the others untouched."""
+        self.login()
+        self.login()
+        self.assertEqual(self.login().status_code, 429)
+
+        # The address bucket still has the token the refused login didn't take
+        self.assertEqual(self.login(email='other@example.com').status_code, 401)
+        self.assertEqual(self.login(email='other@example.com').status_code, 429)
+
+    def test_share_downloads_limited_per_token(self):
+        """Test that public downloads are limited per share token."""
+        token, other = uuid.uuid4(), uuid.uuid4()
+
+        def download(token):
+            return self.client.get(reverse('share-link-download', args=[token]))
+
+        self.assertEqual(download(token).status_code, 404)
+        self.assertEqual(download(token).status_code, 404)
+        self.assertEqual(download(token).status_code, 429)
+        self.assertEqual(download(other).status_code, 404)
+
+    def test_file_downloads_limited_per_query_token(self):
+        """Test that downloads with a token in the query string are limited too."""
+        url = reverse('files:secure_file_download', args=[uuid.uuid4()])
+        token, other = str(uuid.uuid4()), str(uuid.uuid4())
+
+        self.assertEqual(self.client.get(url, {'token': token}).status_code, 403)
+        self.assertEqual(self.client.get(url, {'token': token}).status_code, 403)
+        self.assertEqual(self.client.get(url, {'token': token}).status_code, 429)
+        self.assertEqual(self.client.get(url, {'token': other}).status_code, 403)
+
+    def test_public_share_route_limited(self):
+        """Test that the public share link route is limited per token."""
+        url = reverse('files:public_file_download', args=[uuid.uuid4()])
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url).status_code, 429)
+
+    def test_one_round_trip_per_request(self):
+        """Test that every bucket of a request is checked in a single command."""
+        # The first request after Redis starts also loads the script
+        self.login(email='other@example.com')
+
+        with patch.object(redis.Redis, 'execute_command', autospec=True,
+                          side_effect=redis.Redis.execute_command) as execute:
+            self.login()
+
+        commands = [call.args[1] for call in execute.call_args_list]
+        self.assertEqual(commands, ['EVALSHA'])
+
+    def test_unreachable_cache_lets_requests_through(self):
+        """Test that losing the rate limit cache doesn't take the endpoints down."""
+        with patch('config.ratelimit.TAKE_TOKEN', side_effect=redis.ConnectionError):
+            for _ in range(4):
+                self.assertEqual(self.login().status_code, 401)
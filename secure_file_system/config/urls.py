@@ -78,6 +78,9 @@ urlpatterns = [
     # API Version 1
     path('api/v1/', include(api_urls)),
     
+    # File endpoints
+    path('api/files/', include('files.urls')),
+    
     # Health check endpoint
     path('health/', include('health_check.urls')),
 ]
@@ -4,7 +4,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
-from .models import File, FileShareLink
+from .models import Blob, DownloadLog, File, FileShareLink
 
 
 def format_file_size(size):
@@ -101,3 +101,45 @@ class FileShareLinkAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         # Only allow adding share links through the API
         return False
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    """Admin interface for the content-addressed Blob model."""
+    list_display = ('sha256', 'size_formatted', 'ref_count', 'created_at')
+    search_fields = ('sha256',)
+    readonly_fields = ('sha256', 'file', 'size', 'ref_count', 'created_at')
+    
+    def size_formatted(self, obj):
+        return format_file_size(obj.size)
+    size_formatted.short_description = 'Size'
+    size_formatted.admin_order_field = 'size'
+    
+    def has_add_permission(self, request):
+        # Blobs are only created by uploads
+        return False
+
+
+@admin.register(DownloadLog)
+class DownloadLogAdmin(admin.ModelAdmin):
+    """Read-only admin interface for the download audit log."""
+    list_display = (
+        'downloaded_at', 'file_name', 'user_id', 'ip_address', 'status_code',
+        'size_formatted', 'duration_ms'
+    )
+    list_filter = ('status_code', 'downloaded_at')
+    search_fields = ('file_name', 'ip_address')
+    date_hierarchy = 'downloaded_at'
+    
+    def size_formatted(self, obj):
+        return format_file_size(obj.bytes_sent)
+    size_formatted.short_description = 'Bytes Sent'
+    size_formatted.admin_order_field = 'bytes_sent'
+    
+    def has_add_permission(self, request):
+        # Entries are only written by downloads
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        # The log is append-only
+        return False
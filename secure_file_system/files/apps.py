@@ -6,3 +6,7 @@ class FilesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "files"
     verbose_name = _("Files")
+
+    def ready(self):
+        # Register signal handlers
+        from . import signals  # noqa
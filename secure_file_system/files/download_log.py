@@ -0,0 +1,283 @@
+"""
+Buffered download audit log.
+
+Serving a download never waits on an INSERT. Once the response has been
+sent, its log entry is appended to a Redis list. The
+``files.tasks.flush_download_log`` task moves entries into ``DownloadLog`` in
+batches of ``DOWNLOAD_LOG_BATCH_SIZE`` with ``bulk_create``. It's queued
+whenever a batch fills up, and celery beat runs it every
+``DOWNLOAD_LOG_FLUSH_INTERVAL`` seconds for the rest. If Redis is unreachable
+the entry is written directly instead, so nothing goes unlogged.
+
+Each batch written is added to the dashboard and daily statistics
+(files.stats).
+
+The table is range-partitioned by month on ``downloaded_at``.
+``maintain_partitions`` creates partitions a few months ahead and drops whole
+months once they're older than ``DOWNLOAD_LOG_RETENTION_DAYS``, which costs
+nothing compared with deleting rows.
+"""
+import ipaddress
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import redis
+from redis.exceptions import LockError
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.settings import api_settings
+
+from config.redis_client import get_redis
+
+from .models import DownloadLog
+from .stats import bump, bump_daily
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = 'download_log:buffer'
+# Holds the batch being written until its rows are in
+PROCESSING_KEY = 'download_log:processing'
+FLUSH_LOCK_KEY = 'download_log:flush_lock'
+FLUSH_LOCK_TIMEOUT = 5 * 60
+
+# Partitions exist for the current month and this many after it
+PARTITIONS_AHEAD = 2
+PARTITION_NAME_RE = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def client_ip(request) -> Optional[str]:
+    """
+    The client's address as the nearest of the ``NUM_PROXIES`` proxies in
+    front of the app saw it, or the peer's address without proxies. Earlier
+    X-Forwarded-For hops come from the client and aren't trusted.
+    """
+    address = request.META.get('REMOTE_ADDR', '')
+    num_proxies = api_settings.NUM_PROXIES
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and forwarded:
+        hops = forwarded.split(',')
+        address = hops[-min(num_proxies, len(hops))].strip()
+    try:
+        return str(ipaddress.ip_address(address))
+    except ValueError:
+        return None
+
+
+def log_download(download, response, share_link=None, user_id=None):
+    """
+    Arrange for ``download`` to be logged once ``response`` has been sent,
+    and return the response.
+
+    The entry is written when the server closes the response, which it does
+    after the last byte or when the client goes away, so an aborted transfer
+    logs the bytes that were actually sent (see
+    ``DownloadRequest.bytes_sent``). The body itself is left alone, so a
+    ``FileResponse`` still goes out through ``wsgi.file_wrapper``.
+    """
+    request = download.request
+    user = getattr(request, 'user', None)
+    if user_id is None and user is not None and user.is_authenticated:
+        user_id = user.pk
+    entry = {
+        'downloaded_at': timezone.now().isoformat(),
+        'share_link_id': str(share_link.pk) if share_link is not None else None,
+        'file_id': str(download.file_obj.pk),
+        'file_name': download.file_obj.original_filename,
+        'user_id': str(user_id) if user_id is not None else None,
+        'ip_address': client_ip(request),
+        'status_code': response.status_code,
+    }
+
+    def log_sent() -> None:
+        entry['bytes_sent'] = download.bytes_sent(response)
+        entry['duration_ms'] = _elapsed_ms(download.started)
+        buffer_entry(entry)
+
+    # Ahead of the response's own closers, while a streamed file can still
+    # tell how far it got
+    response._resource_closers.insert(0, log_sent)
+    return response
+
+
+def _elapsed_ms(started: float) -> int:
+    return int((time.monotonic() - started) * 1000)
+
+
+def buffer_entry(entry: Dict[str, Any]) -> None:
+    """Queue a log entry for the next batch, or write it now without Redis."""
+    try:
+        length = get_redis().rpush(BUFFER_KEY, json.dumps(entry))
+    except redis.RedisError:
+        logger.warning(
+            'Download log buffer unavailable; writing entry directly', exc_info=True
+        )
+        _count([DownloadLog.objects.create(**_fields(entry))])
+        return
+
+    if length == settings.DOWNLOAD_LOG_BATCH_SIZE:
+        from .tasks import flush_download_log
+
+        flush_download_log.delay()
+
+
+def _fields(entry: Dict[str, Any]) -> Dict[str, Any]:
+    fields = dict(entry)
+    fields['downloaded_at'] = parse_datetime(entry['downloaded_at'])
+    return fields
+
+
+def flush(batch_size: Optional[int] = None, max_batches: int = 100) -> Optional[int]:
+    """
+    Move buffered entries into the database, ``batch_size`` rows per INSERT,
+    and return how many were written, or None if another flush is running.
+
+    Each batch is moved to a processing list in one MULTI/EXEC and removed
+    from it only once its rows are inserted. A batch left there by a flush
+    that died or lost Redis midway is written first by the next one, so
+    entries are written at least once; if the flush died between the INSERT
+    and the removal, they are written twice.
+    """
+    batch_size = batch_size or settings.DOWNLOAD_LOG_BATCH_SIZE
+    client = get_redis()
+    lock = client.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT, blocking=False)
+    if not lock.acquire():
+        logger.info('Download log flush is already running elsewhere; skipping')
+        return None
+
+    try:
+        written = _write(client, client.lrange(PROCESSING_KEY, 0, -1))
+        for _ in range(max_batches):
+            raw = _claim(client, batch_size)
+            if not raw:
+                break
+            written += _write(client, raw)
+            if len(raw) < batch_size:
+                break
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning('Download log flush outlived its lock')
+    return written
+
+
+def _claim(client: redis.Redis, batch_size: int) -> List[bytes]:
+    """Move up to ``batch_size`` entries from the buffer to the processing list."""
+    with client.pipeline(transaction=True) as pipe:
+        for _ in range(batch_size):
+            pipe.lmove(BUFFER_KEY, PROCESSING_KEY, 'LEFT', 'RIGHT')
+        return [item for item in pipe.execute() if item is not None]
+
+
+def _write(client: redis.Redis, raw: List[bytes]) -> int:
+    if not raw:
+        return 0
+    logs = [DownloadLog(**_fields(json.loads(item))) for item in raw]
+    DownloadLog.objects.bulk_create(logs)
+    _count(logs)
+    client.delete(PROCESSING_KEY)
+    return len(logs)
+
+
+def _count(logs: List[DownloadLog]) -> None:
+    """Add written log entries to the dashboard and daily statistics."""
+    bump(download_count=len(logs), downloads_this_week=len(logs))
+    days: Dict[date, List[int]] = defaultdict(lambda: [0, 0])
+    for log in logs:
+        totals = days[timezone.localdate(log.downloaded_at)]
+        totals[0] += 1
+        totals[1] += log.bytes_sent
+    for day, (downloads, bytes_served) in days.items():
+        bump_daily(day, downloads=downloads, bytes_served=bytes_served)
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f'{DownloadLog._meta.db_table}_p{month:%Y%m}'
+
+
+def partitions() -> List[str]:
+    """Names of the log table's partitions."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+            """,
+            [DownloadLog._meta.db_table]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def maintain_partitions(now: Optional[datetime] = None,
+                        retention_days: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Create the monthly partitions that will be needed soon and drop the ones
+    whose rows are all past retention. Returns the partitions created and
+    dropped.
+
+    Rows that landed in the default partition because their month had no
+    partition yet are moved into the new one.
+    """
+    now = now or timezone.now()
+    if retention_days is None:
+        retention_days = settings.DOWNLOAD_LOG_RETENTION_DAYS
+    quote = connection.ops.quote_name
+    table = quote(DownloadLog._meta.db_table)
+    default = quote(f'{DownloadLog._meta.db_table}_default')
+    existing = set(partitions())
+    created, dropped = [], []
+
+    month = _month_start(now.date())
+    with transaction.atomic(), connection.cursor() as cursor:
+        for _ in range(PARTITIONS_AHEAD + 1):
+            name = partition_name(month)
+            if name not in existing:
+                bounds = [month.isoformat(), _next_month(month).isoformat()]
+                cursor.execute(
+                    f'CREATE TABLE {quote(name)} '
+                    f'(LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+                )
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM {default} '
+                    f'WHERE downloaded_at >= %s AND downloaded_at < %s RETURNING *) '
+                    f'INSERT INTO {quote(name)} SELECT * FROM moved',
+                    bounds
+                )
+                cursor.execute(
+                    f'ALTER TABLE {table} ATTACH PARTITION {quote(name)} '
+                    f'FOR VALUES FROM (%s) TO (%s)',
+                    bounds
+                )
+                created.append(name)
+            month = _next_month(month)
+
+        cutoff = (now - timedelta(days=retention_days)).date()
+        for name in existing:
+            match = PARTITION_NAME_RE.search(name)
+            if not match:
+                continue
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if _next_month(month) <= cutoff:
+                cursor.execute(f'DROP TABLE {quote(name)}')
+                dropped.append(name)
+
+    return {'created': created, 'dropped': sorted(dropped)}
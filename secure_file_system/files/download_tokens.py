@@ -0,0 +1,78 @@
+"""
+Stateless, signed download tokens.
+
+A token carries the file id, the id of the user it was issued to, an expiry
+time and a random nonce, signed with the project's SECRET_KEY. Checking one is
+an HMAC comparison, so issuing a download link costs no database write and
+verifying it no lookup. ``FileShareLink`` rows are still used for links that
+need to be counted against ``max_downloads`` or deactivated by hand.
+
+Individual signed tokens can't be revoked before they expire; keep
+``FILE_DOWNLOAD_TOKEN_TTL`` short. Rotating SECRET_KEY invalidates all of them.
+"""
+import secrets
+import time
+import uuid
+from typing import Any, NamedTuple, Optional
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils.http import urlencode
+
+SALT = 'files.download_token'
+
+
+class InvalidDownloadToken(Exception):
+    """The token is malformed, tampered with, expired or for another file."""
+
+
+class DownloadToken(NamedTuple):
+    file_id: str
+    user_id: str
+    expires_at: int
+    nonce: str
+
+
+def is_signed_token(token: str) -> bool:
+    """Tell signed tokens apart from ``FileShareLink`` UUID tokens."""
+    return ':' in token
+
+
+def make_download_token(file_obj: Any, user: Any, ttl: Optional[int] = None) -> str:
+    """Issue a token that lets its bearer download ``file_obj`` until it expires."""
+    ttl = settings.FILE_DOWNLOAD_TOKEN_TTL if ttl is None else ttl
+    payload = {
+        'f': uuid.UUID(str(file_obj.id)).hex,
+        'u': uuid.UUID(str(user.id)).hex,
+        'e': int(time.time()) + ttl,
+        'n': secrets.token_urlsafe(6),
+    }
+    return signing.Signer(salt=SALT).sign_object(payload)
+
+
+def verify_download_token(token: str, file_id: Any) -> DownloadToken:
+    """Return the token's contents if it is valid for ``file_id`` right now."""
+    try:
+        payload = signing.Signer(salt=SALT).unsign_object(token)
+        download_token = DownloadToken(
+            file_id=str(uuid.UUID(payload['f'])),
+            user_id=str(uuid.UUID(payload['u'])),
+            expires_at=int(payload['e']),
+            nonce=payload['n'],
+        )
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidDownloadToken()
+
+    if download_token.file_id != str(file_id):
+        raise InvalidDownloadToken()
+    if download_token.expires_at <= time.time():
+        raise InvalidDownloadToken()
+    return download_token
+
+
+def signed_download_url(file_obj: Any, user: Any, request: Any = None) -> str:
+    """Build the download URL for ``file_obj``, absolute when a request is given."""
+    path = reverse('files:secure_file_download', kwargs={'id': file_obj.id})
+    url = f"{path}?{urlencode({'token': make_download_token(file_obj, user)})}"
+    return request.build_absolute_uri(url) if request is not None else url
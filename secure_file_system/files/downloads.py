@@ -0,0 +1,324 @@
+"""
+Download responses for stored files.
+
+Views validate the download token, wrap the request in a ``DownloadRequest``
+and ask it three things in turn: whether the client's cached copy is still
+good (``not_modified_response``), whether this request continues a download
+that has already been counted (``is_resumption``), and finally for the
+response itself.
+
+Responses carry a strong ETag derived from the file's SHA-256, so clients and
+caches can revalidate with ``If-None-Match`` and get a bodiless 304 instead of
+the whole file. ``Range`` requests are served as 206 Partial Content, single
+ranges directly and multiple ranges as ``multipart/byteranges``, and
+``If-Range`` falls back to the full body when the file has changed.
+
+With ``FILE_DOWNLOAD_OFFLOAD`` set, the response carries no body: the front
+proxy sees the ``X-Accel-Redirect`` (nginx) or ``X-Sendfile`` (Apache,
+lighttpd) header and streams the file itself with sendfile, including any
+requested byte ranges, so a slow client no longer ties up a sync gunicorn
+worker for the whole transfer.
+"""
+import logging
+import os
+import re
+import time
+import uuid
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import (
+    content_disposition_header,
+    http_date,
+    parse_etags,
+    parse_http_date_safe,
+)
+from django.utils.translation import gettext_lazy as _
+
+from .download_log import client_ip
+
+logger = logging.getLogger(__name__)
+
+OFFLOAD_ACCEL_REDIRECT = 'x-accel-redirect'
+OFFLOAD_SENDFILE = 'x-sendfile'
+
+OOXML_TYPE = 'application/vnd.openxmlformats-officedocument'
+CONTENT_TYPES = {
+    '.docx': f'{OOXML_TYPE}.wordprocessingml.document',
+    '.xlsx': f'{OOXML_TYPE}.spreadsheetml.sheet',
+    '.pptx': f'{OOXML_TYPE}.presentationml.presentation',
+}
+
+RANGE_SPEC_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+# More ranges than this is almost certainly abuse; the full body is sent instead
+MAX_RANGES = 16
+READ_SIZE = 64 * 1024
+
+ByteRange = Tuple[int, int]
+
+
+def content_type_for(filename):
+    """Return the MIME type to serve a file with, based on its extension."""
+    extension = os.path.splitext(filename)[1].lower()
+    return CONTENT_TYPES.get(extension, 'application/octet-stream')
+
+
+def parse_range_header(header: str, size: int) -> Optional[List[ByteRange]]:
+    """
+    Parse a ``Range`` header into inclusive ``(start, end)`` byte offsets.
+
+    Returns None when the header should be ignored (not a byte range, malformed
+    or too many ranges) and an empty list when no range can be satisfied.
+    """
+    unit, _sep, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs:
+        return None
+
+    ranges = []
+    for spec in specs.split(','):
+        match = RANGE_SPEC_RE.match(spec)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix == 0 or size == 0:
+                continue
+            start, end = max(size - suffix, 0), size - 1
+        ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+def read_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    """Yield bytes ``start`` to ``end`` inclusive of the file at ``path``."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = f.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+class DownloadRequest:
+    """A request to download ``file_obj``, with its validators and ranges."""
+
+    def __init__(self, request, file_obj) -> None:
+        self.request = request
+        self.file_obj = file_obj
+        self.size = file_obj.file_size
+        self.started = time.monotonic()
+        # Only content-hashed files get an ETag; a strong validator has to
+        # change whenever the bytes do, and the hash is exactly that
+        self.etag = f'"{file_obj.content_hash}"' if file_obj.content_hash else None
+        # Stored content never changes after upload, so the creation time is
+        # its modification time
+        self.last_modified = int(file_obj.created_at.timestamp())
+        self.ranges = self._requested_ranges()
+        # The file a full response is served from, and the file bytes
+        # handed to the server by a range response
+        self.body_file: Optional[BinaryIO] = None
+        self.bytes_streamed = 0
+
+    @property
+    def satisfiable(self) -> bool:
+        """False when no requested range overlaps the file, which gets a 416."""
+        return self.ranges != []
+
+    def requested_bytes(self) -> int:
+        """How many bytes of the file the response is meant to carry."""
+        if self.ranges is None:
+            return self.size
+        return sum(end - start + 1 for start, end in self.ranges)
+
+    def bytes_sent(self, response: HttpResponse) -> int:
+        """
+        How many bytes of the file ``response`` has sent so far: the read
+        position of a ``FileResponse``'s file (which sendfile moves too), what
+        a range response has streamed, or what was asked of the proxy.
+        """
+        if self.body_file is not None and not self.body_file.closed:
+            return self.body_file.tell()
+        if response.streaming:
+            return self.bytes_streamed
+        return self.requested_bytes()
+
+    def _requested_ranges(self) -> Optional[List[ByteRange]]:
+        header = self.request.META.get('HTTP_RANGE')
+        if not header or self.request.method not in ('GET', 'HEAD'):
+            return None
+        if_range = self.request.META.get('HTTP_IF_RANGE')
+        if if_range and not self._if_range_matches(if_range):
+            return None
+        return parse_range_header(header, self.size)
+
+    def _if_range_matches(self, if_range: str) -> bool:
+        if if_range.strip().startswith(('"', 'W/')):
+            # If-Range requires a strong comparison
+            return self.etag is not None and parse_etags(if_range) == [self.etag]
+        return parse_http_date_safe(if_range) == self.last_modified
+
+    def not_modified_response(self) -> Optional[HttpResponse]:
+        """Return a 304 or 412 response if the request's preconditions call for one."""
+        response = get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified
+        )
+        if response is not None:
+            self._add_validators(response)
+        return response
+
+    def _resume_key(self, link_key: str) -> str:
+        ip = client_ip(self.request)
+        return f'download_resume:{link_key}:{self.file_obj.pk}:{ip}'
+
+    def is_resumption(self, link_key: str) -> bool:
+        """
+        True when this request picks up a download the same client started
+        through the same link within ``FILE_DOWNLOAD_RESUME_WINDOW`` seconds,
+        from a later offset than the request it picks up from started at.
+        Resumptions don't count against the link's download limit, and each
+        one is remembered in turn, so a download interrupted several times
+        is still counted once while every resumption has to move forward.
+        """
+        if not self.ranges or self.ranges[0][0] == 0:
+            return False
+        key = self._resume_key(link_key)
+        started_at = cache.get(key)
+        if started_at is None or self.ranges[0][0] <= started_at:
+            return False
+        # Claimed by deleting it, so concurrent resumptions can't share it
+        if not cache.delete(key):
+            return False
+        self.remember(link_key)
+        return True
+
+    def remember(self, link_key: str) -> None:
+        """Record a counted download so the client can resume it for free."""
+        started_at = self.ranges[0][0] if self.ranges else 0
+        cache.set(
+            self._resume_key(link_key), started_at, settings.FILE_DOWNLOAD_RESUME_WINDOW
+        )
+
+    def response(self) -> HttpResponse:
+        """Build the response that delivers the file as an attachment."""
+        offload = getattr(settings, 'FILE_DOWNLOAD_OFFLOAD', '')
+        content_type = content_type_for(self.file_obj.original_filename)
+
+        if offload == OFFLOAD_ACCEL_REDIRECT:
+            # nginx serves the file from an `internal` location aliased to
+            # MEDIA_ROOT, and applies the Range header itself
+            response = HttpResponse(content_type=content_type)
+            prefix = settings.FILE_DOWNLOAD_ACCEL_PREFIX.rstrip('/')
+            response['X-Accel-Redirect'] = f"{prefix}/{quote(self.file_obj.file.name)}"
+        elif offload == OFFLOAD_SENDFILE:
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = self.file_obj.file.path
+        elif not offload:
+            response = self._local_response(content_type)
+        else:
+            raise ImproperlyConfigured(
+                f"FILE_DOWNLOAD_OFFLOAD must be '', '{OFFLOAD_ACCEL_REDIRECT}' or "
+                f"'{OFFLOAD_SENDFILE}', not {offload!r}"
+            )
+
+        response['Accept-Ranges'] = 'bytes'
+        response['Content-Disposition'] = content_disposition_header(
+            True, self.file_obj.original_filename
+        )
+        self._add_validators(response)
+        return response
+
+    def _local_response(self, content_type: str) -> HttpResponse:
+        file_path = self.file_obj.file.path
+        if not os.path.exists(file_path):
+            logger.error(f"File not found at path: {file_path}")
+            raise Http404(_('File not found'))
+
+        if self.ranges == []:
+            response = HttpResponse(status=416, content_type=content_type)
+            response['Content-Range'] = f'bytes */{self.size}'
+            return response
+
+        if self.ranges and len(self.ranges) == 1:
+            start, end = self.ranges[0]
+            response = StreamingHttpResponse(
+                self._read_range(file_path, start, end),
+                status=206,
+                content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{self.size}'
+            response['Content-Length'] = end - start + 1
+            return response
+
+        if self.ranges:
+            return self._multipart_response(file_path, content_type)
+
+        try:
+            self.body_file = open(file_path, 'rb')
+            response = FileResponse(self.body_file, content_type=content_type)
+        except OSError as e:
+            logger.error(f"Error serving file {file_path}: {str(e)}")
+            raise Http404(_('Error serving file'))
+        response['Content-Length'] = self.size
+        return response
+
+    def _multipart_response(self, file_path: str, content_type: str) -> HttpResponse:
+        boundary = uuid.uuid4().hex
+        headers = [
+            (
+                f'--{boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: bytes {start}-{end}/{self.size}\r\n\r\n'
+            ).encode()
+            for start, end in self.ranges
+        ]
+        closing = f'\r\n--{boundary}--\r\n'.encode()
+
+        def parts() -> Iterator[bytes]:
+            for index, (start, end) in enumerate(self.ranges):
+                yield (b'\r\n' if index else b'') + headers[index]
+                yield from self._read_range(file_path, start, end)
+            yield closing
+
+        length = (
+            sum(len(header) for header in headers)
+            + 2 * (len(headers) - 1)
+            + sum(end - start + 1 for start, end in self.ranges)
+            + len(closing)
+        )
+        response = StreamingHttpResponse(
+            parts(),
+            status=206,
+            content_type=f'multipart/byteranges; boundary={boundary}'
+        )
+        response['Content-Length'] = length
+        return response
+
+    def _read_range(self, path: str, start: int, end: int) -> Iterator[bytes]:
+        for data in read_range(path, start, end):
+            self.bytes_streamed += len(data)
+            yield data
+
+    def _add_validators(self, response: HttpResponse) -> None:
+        if self.etag:
+            response['ETag'] = self.etag
+        response['Last-Modified'] = http_date(self.last_modified)
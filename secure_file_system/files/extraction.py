@@ -0,0 +1,247 @@
+"""
+Text extraction from uploaded Office Open XML documents, for search.
+
+.docx, .xlsx and .pptx files are zip archives of XML parts. Each text-bearing
+part is read straight out of the archive and fed through a SAX parser, so
+memory stays flat however large the document is: no part is ever loaded
+whole and no element tree is built. Extraction stops once
+``FILE_CONTENT_MAX_CHARS`` characters have been collected or
+``FILE_CONTENT_MAX_XML_BYTES`` of XML has been decompressed, whichever comes
+first, which also defuses zip bombs.
+
+Spreadsheets are read from the shared strings table plus inline strings, in
+the order Excel stores them; cell references and numbers are ignored since
+they're of no use to a text search.
+"""
+import logging
+import re
+import xml.sax
+import zipfile
+from typing import IO, Iterable, List, NamedTuple, Optional, Tuple
+from xml.sax.handler import (
+    ContentHandler,
+    feature_external_ges,
+    feature_external_pes,
+    feature_namespaces,
+)
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import transaction
+
+from .models import File, FileContent
+from .search import SEARCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+WORDPROCESSING_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+DRAWING_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+
+# Bytes handed to the parser per read
+READ_SIZE = 64 * 1024
+
+
+class PartFormat(NamedTuple):
+    """Where the text lives in one kind of XML part"""
+    text: Tuple[str, str]
+    breaks: Tuple[Tuple[str, str], ...]
+    skip: Tuple[Tuple[str, str], ...] = ()
+
+
+WORD_FORMAT = PartFormat(
+    text=(WORDPROCESSING_NS, 't'),
+    breaks=(
+        (WORDPROCESSING_NS, 'p'),
+        (WORDPROCESSING_NS, 'tab'),
+        (WORDPROCESSING_NS, 'br'),
+    ),
+)
+# Phonetic runs (rPh) repeat the cell text as a reading guide
+SPREADSHEET_FORMAT = PartFormat(
+    text=(SPREADSHEET_NS, 't'),
+    breaks=((SPREADSHEET_NS, 'si'), (SPREADSHEET_NS, 'is')),
+    skip=((SPREADSHEET_NS, 'rPh'),),
+)
+DRAWING_FORMAT = PartFormat(
+    text=(DRAWING_NS, 't'),
+    breaks=((DRAWING_NS, 'p'),),
+)
+
+# Parts to read for each file type, in reading order
+PARTS = {
+    File.FileType.DOCX: [
+        (re.compile(r'word/document\.xml'), WORD_FORMAT),
+        (re.compile(r'word/(header|footer)\d*\.xml'), WORD_FORMAT),
+        (re.compile(r'word/(footnotes|endnotes)\.xml'), WORD_FORMAT),
+    ],
+    File.FileType.XLSX: [
+        (re.compile(r'xl/sharedStrings\.xml'), SPREADSHEET_FORMAT),
+        (re.compile(r'xl/worksheets/sheet\d+\.xml'), SPREADSHEET_FORMAT),
+    ],
+    File.FileType.PPTX: [
+        (re.compile(r'ppt/slides/slide\d+\.xml'), DRAWING_FORMAT),
+        (re.compile(r'ppt/notesSlides/notesSlide\d+\.xml'), DRAWING_FORMAT),
+    ],
+}
+
+
+class ExtractionError(Exception):
+    """The file isn't a readable OOXML document"""
+
+
+class _LimitReached(Exception):
+    pass
+
+
+class ExtractedText(NamedTuple):
+    text: str
+    truncated: bool
+
+
+class _TextCollector(ContentHandler):
+    """Collects character data from the text elements of one part"""
+
+    def __init__(self, part_format: PartFormat, chunks: List[str], budget: int) -> None:
+        super().__init__()
+        self.format = part_format
+        self.chunks = chunks
+        self.budget = budget
+        self.in_text = 0
+        self.skipping = 0
+
+    def startElementNS(self, name, qname, attrs):
+        if name in self.format.skip:
+            self.skipping += 1
+        elif name == self.format.text:
+            self.in_text += 1
+
+    def endElementNS(self, name, qname):
+        if name in self.format.skip:
+            self.skipping -= 1
+        elif name == self.format.text:
+            self.in_text -= 1
+        elif name in self.format.breaks:
+            self.add('\n')
+
+    def characters(self, content):
+        if self.in_text and not self.skipping:
+            self.add(content)
+
+    def add(self, text: str) -> None:
+        if self.budget <= 0:
+            raise _LimitReached
+        text = text[:self.budget]
+        self.chunks.append(text)
+        self.budget -= len(text)
+
+
+def _make_parser(handler: ContentHandler) -> xml.sax.xmlreader.XMLReader:
+    parser = xml.sax.make_parser()
+    parser.setFeature(feature_namespaces, True)
+    # Never fetch DTDs or entities from outside the archive
+    parser.setFeature(feature_external_ges, False)
+    parser.setFeature(feature_external_pes, False)
+    parser.setContentHandler(handler)
+    return parser
+
+
+def _part_names(archive: zipfile.ZipFile,
+                file_type: str) -> Iterable[Tuple[str, PartFormat]]:
+    names = archive.namelist()
+    for pattern, part_format in PARTS.get(file_type, []):
+        matching = [name for name in names if pattern.fullmatch(name)]
+        # slide10.xml comes after slide9.xml
+        matching.sort(key=lambda name: [
+            int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)
+        ])
+        for name in matching:
+            yield name, part_format
+
+
+def extract_text(stream: IO[bytes], file_type: str, max_chars: Optional[int] = None,
+                 max_xml_bytes: Optional[int] = None) -> ExtractedText:
+    """
+    Pull the paragraph, cell and slide text out of an OOXML document.
+
+    ``stream`` must be seekable, as zip archives are read from the end.
+    Raises ExtractionError if it isn't a zip archive or its XML is malformed.
+    """
+    if max_chars is None:
+        max_chars = settings.FILE_CONTENT_MAX_CHARS
+    if max_xml_bytes is None:
+        max_xml_bytes = settings.FILE_CONTENT_MAX_XML_BYTES
+
+    chunks: List[str] = []
+    budget = max_chars
+    xml_bytes = 0
+    truncated = False
+    try:
+        with zipfile.ZipFile(stream) as archive:
+            for name, part_format in _part_names(archive, file_type):
+                collector = _TextCollector(part_format, chunks, budget)
+                parser = _make_parser(collector)
+                try:
+                    with archive.open(name) as part:
+                        while True:
+                            data = part.read(READ_SIZE)
+                            if not data:
+                                break
+                            xml_bytes += len(data)
+                            if xml_bytes > max_xml_bytes:
+                                raise _LimitReached
+                            parser.feed(data)
+                    parser.close()
+                finally:
+                    budget = collector.budget
+                if chunks and chunks[-1] != '\n':
+                    chunks.append('\n')
+    except _LimitReached:
+        truncated = True
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, xml.sax.SAXException,
+            EOFError, NotImplementedError) as e:
+        # NotImplementedError is zipfile's answer to unsupported compression
+        raise ExtractionError(str(e)) from e
+
+    return ExtractedText(''.join(chunks).strip(), truncated)
+
+
+def index_file_content(file_obj: File) -> FileContent:
+    """
+    Extract ``file_obj``'s document text, store it, and fold it into the
+    file's search vector.
+
+    Files sharing a blob have the same content, so text already extracted
+    for another of them is copied rather than parsed again.
+    """
+    existing = None
+    if file_obj.blob_id:
+        existing = (
+            FileContent.objects.filter(file__blob_id=file_obj.blob_id)
+            .exclude(file_id=file_obj.pk)
+            .only('text', 'truncated')
+            .first()
+        )
+
+    if existing is not None:
+        extracted = ExtractedText(existing.text, existing.truncated)
+    else:
+        try:
+            with file_obj.file.open('rb') as stream:
+                extracted = extract_text(stream, file_obj.file_type)
+        except ExtractionError as e:
+            # Stored empty so the file isn't retried on every backfill
+            logger.warning('Could not extract text from file %s: %s', file_obj.pk, e)
+            extracted = ExtractedText('', False)
+
+    with transaction.atomic():
+        content, _ = FileContent.objects.update_or_create(
+            file=file_obj,
+            defaults={'text': extracted.text, 'truncated': extracted.truncated},
+        )
+        FileContent.objects.filter(pk=content.pk).update(
+            search_vector=SearchVector('text', config=SEARCH_CONFIG, weight='C')
+        )
+        # Any update makes the trigger rebuild the file's search vector
+        File.objects.filter(pk=file_obj.pk).update(search_vector=None)
+    return content
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from files.models import File
+from files.tasks import extract_file_content
+
+
+class Command(BaseCommand):
+    help = 'Queue text extraction for files whose document text is not yet searchable'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-extract every file, not just new ones'
+        )
+
+    def handle(self, *args, **options):
+        files = File.objects.order_by()
+        if not options['all']:
+            files = files.filter(content__isnull=True)
+
+        count = 0
+        for file_id in files.values_list('id', flat=True).iterator(chunk_size=2000):
+            extract_file_content.delay(str(file_id))
+            count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Queued text extraction for {count} files')
+        )
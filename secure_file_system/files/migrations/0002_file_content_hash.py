@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("files", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="file",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                help_text="Hex SHA-256 digest of the file content",
+                max_length=64,
+                verbose_name="content hash",
+            ),
+        ),
+    ]
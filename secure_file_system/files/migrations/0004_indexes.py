@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("files", "0003_blob"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="file",
+            index=models.Index(
+                fields=["uploaded_by", "-created_at"], name="file_uploader_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="file",
+            index=models.Index(
+                fields=["file_type", "-created_at"], name="file_type_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="file",
+            index=models.Index(fields=["-created_at"], name="file_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="filesharelink",
+            index=models.Index(
+                fields=["created_by", "-created_at"],
+                name="sharelink_creator_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="filesharelink",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["expires_at"],
+                name="sharelink_active_expiry_idx",
+            ),
+        ),
+        # Drop the single-column FK indexes only once the composites
+        # that lead with the same column exist
+        migrations.AlterField(
+            model_name="file",
+            name="uploaded_by",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="uploaded_files",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="uploaded by",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="filesharelink",
+            name="created_by",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="created_share_links",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="created by",
+            ),
+        ),
+    ]
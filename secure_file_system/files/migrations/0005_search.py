@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+from django.db import migrations
+import django.db.models.functions.text
+
+# Filename punctuation is turned into spaces first so that
+# "Q3_report-final.xlsx" yields the words q3, report, final and xlsx.
+# The configuration must match files.search.SEARCH_CONFIG.
+CREATE_TRIGGER = """
+CREATE FUNCTION files_file_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', regexp_replace(coalesce(NEW.original_filename, ''), '[._-]+', ' ', 'g')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER files_file_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON files_file
+    FOR EACH ROW EXECUTE FUNCTION files_file_search_vector_update();
+
+UPDATE files_file SET search_vector = NULL;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS files_file_search_vector_trigger ON files_file;
+DROP FUNCTION IF EXISTS files_file_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("files", "0004_indexes"),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.AddField(
+            model_name="file",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                help_text="Maintained by a database trigger from the filename and description",
+                null=True,
+                verbose_name="search vector",
+            ),
+        ),
+        # The trigger also fills in existing rows, before the indexes are built
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.AddIndex(
+            model_name="file",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="file_search_vector_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="file",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("original_filename"),
+                    name="gin_trgm_ops",
+                ),
+                name="file_filename_trgm_idx",
+            ),
+        ),
+    ]
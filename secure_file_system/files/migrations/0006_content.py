@@ -0,0 +1,92 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:47
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Document text is turned into a vector once, when it's extracted, and the
+# file trigger just appends it; files without extracted text get none
+UPDATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION files_file_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', regexp_replace(coalesce(NEW.original_filename, ''), '[._-]+', ' ', 'g')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B') ||
+        coalesce((SELECT search_vector FROM files_filecontent WHERE file_id = NEW.id), ''::tsvector);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+RESTORE_FUNCTION = """
+CREATE OR REPLACE FUNCTION files_file_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', regexp_replace(coalesce(NEW.original_filename, ''), '[._-]+', ' ', 'g')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("files", "0005_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FileContent",
+            fields=[
+                (
+                    "file",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="content",
+                        serialize=False,
+                        to="files.file",
+                        verbose_name="file",
+                    ),
+                ),
+                ("text", models.TextField(blank=True, verbose_name="text")),
+                (
+                    "truncated",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Only the start of the document was extracted",
+                        verbose_name="truncated",
+                    ),
+                ),
+                (
+                    "search_vector",
+                    django.contrib.postgres.search.SearchVectorField(
+                        editable=False,
+                        help_text="Folded into the file's search vector by its trigger",
+                        null=True,
+                        verbose_name="search vector",
+                    ),
+                ),
+                (
+                    "extracted_at",
+                    models.DateTimeField(auto_now=True, verbose_name="extracted at"),
+                ),
+            ],
+            options={
+                "verbose_name": "file content",
+                "verbose_name_plural": "file contents",
+            },
+        ),
+        migrations.AlterField(
+            model_name="file",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                help_text="Maintained by a database trigger from the filename, description and document text",
+                null=True,
+                verbose_name="search vector",
+            ),
+        ),
+        migrations.RunSQL(UPDATE_FUNCTION, RESTORE_FUNCTION),
+    ]
@@ -0,0 +1,134 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# Range-partitioned by month, so the primary key has to include
+# downloaded_at; Django only needs id to be unique, which the sequence
+# ensures. Rows outside every monthly partition go to the default one until
+# files.download_log.maintain_partitions creates their month.
+CREATE_TABLE = """
+CREATE SEQUENCE files_downloadlog_id_seq;
+CREATE TABLE files_downloadlog (
+    id bigint NOT NULL DEFAULT nextval('files_downloadlog_id_seq'),
+    downloaded_at timestamp with time zone NOT NULL,
+    file_name varchar(255) NOT NULL,
+    ip_address inet NULL,
+    status_code smallint NOT NULL CHECK (status_code >= 0),
+    bytes_sent bigint NOT NULL CHECK (bytes_sent >= 0),
+    duration_ms integer NOT NULL CHECK (duration_ms >= 0),
+    file_id uuid NULL,
+    share_link_id uuid NULL,
+    user_id uuid NULL,
+    PRIMARY KEY (id, downloaded_at)
+) PARTITION BY RANGE (downloaded_at);
+ALTER SEQUENCE files_downloadlog_id_seq OWNED BY files_downloadlog.id;
+CREATE TABLE files_downloadlog_default PARTITION OF files_downloadlog DEFAULT;
+CREATE INDEX files_downloadlog_file_id_b56225fe ON files_downloadlog (file_id);
+CREATE INDEX files_downloadlog_share_link_id_4ed10278 ON files_downloadlog (share_link_id);
+CREATE INDEX downloadlog_downloaded_idx ON files_downloadlog (downloaded_at DESC);
+"""
+
+DROP_TABLE = "DROP TABLE files_downloadlog;"
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("files", "0006_content"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_TABLE, DROP_TABLE),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name="DownloadLog",
+                    fields=[
+                        ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                        (
+                            "downloaded_at",
+                            models.DateTimeField(
+                                default=django.utils.timezone.now, verbose_name="downloaded at"
+                            ),
+                        ),
+                        (
+                            "file_name",
+                            models.CharField(max_length=255, verbose_name="file name"),
+                        ),
+                        (
+                            "ip_address",
+                            models.GenericIPAddressField(
+                                blank=True, null=True, verbose_name="IP address"
+                            ),
+                        ),
+                        (
+                            "status_code",
+                            models.PositiveSmallIntegerField(verbose_name="status code"),
+                        ),
+                        (
+                            "bytes_sent",
+                            models.PositiveBigIntegerField(verbose_name="bytes sent"),
+                        ),
+                        (
+                            "duration_ms",
+                            models.PositiveIntegerField(
+                                verbose_name="duration in milliseconds"
+                            ),
+                        ),
+                        (
+                            "file",
+                            models.ForeignKey(
+                                blank=True,
+                                db_constraint=False,
+                                null=True,
+                                on_delete=django.db.models.deletion.DO_NOTHING,
+                                related_name="download_logs",
+                                to="files.file",
+                                verbose_name="file",
+                            ),
+                        ),
+                        (
+                            "share_link",
+                            models.ForeignKey(
+                                blank=True,
+                                db_constraint=False,
+                                null=True,
+                                on_delete=django.db.models.deletion.DO_NOTHING,
+                                related_name="download_logs",
+                                to="files.filesharelink",
+                                verbose_name="share link",
+                            ),
+                        ),
+                        (
+                            "user",
+                            models.ForeignKey(
+                                blank=True,
+                                db_constraint=False,
+                                db_index=False,
+                                null=True,
+                                on_delete=django.db.models.deletion.DO_NOTHING,
+                                related_name="download_logs",
+                                to=settings.AUTH_USER_MODEL,
+                                verbose_name="user",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "verbose_name": "download log entry",
+                        "verbose_name_plural": "download log",
+                        "ordering": ["-downloaded_at"],
+                        "indexes": [
+                            models.Index(
+                                fields=["-downloaded_at"], name="downloadlog_downloaded_idx"
+                            )
+                        ],
+                    },
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("files", "0007_download_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SiteStats",
+            fields=[
+                (
+                    "id",
+                    models.PositiveSmallIntegerField(
+                        default=1, primary_key=True, serialize=False
+                    ),
+                ),
+                ("user_count", models.BigIntegerField(default=0, verbose_name="users")),
+                (
+                    "new_users_this_week",
+                    models.BigIntegerField(
+                        default=0, verbose_name="new users this week"
+                    ),
+                ),
+                ("file_count", models.BigIntegerField(default=0, verbose_name="files")),
+                (
+                    "storage_bytes",
+                    models.BigIntegerField(
+                        default=0, verbose_name="storage used in bytes"
+                    ),
+                ),
+                (
+                    "download_count",
+                    models.BigIntegerField(default=0, verbose_name="downloads"),
+                ),
+                (
+                    "downloads_this_week",
+                    models.BigIntegerField(
+                        default=0, verbose_name="downloads this week"
+                    ),
+                ),
+                (
+                    "reconciled_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="reconciled at"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "site statistics",
+                "verbose_name_plural": "site statistics",
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("files", "0008_site_stats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="filesharelink",
+            index=models.Index(
+                condition=models.Q(
+                    ("is_active", True), ("max_downloads__isnull", False)
+                ),
+                fields=["id"],
+                name="sharelink_active_capped_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="filesharelink",
+            index=models.Index(
+                condition=models.Q(("is_active", False)),
+                fields=["expires_at"],
+                name="sharelink_inactive_expiry_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("files", "0009_share_link_cleanup_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyStats",
+            fields=[
+                (
+                    "day",
+                    models.DateField(
+                        primary_key=True, serialize=False, verbose_name="day"
+                    ),
+                ),
+                ("uploads", models.BigIntegerField(default=0, verbose_name="uploads")),
+                (
+                    "bytes_uploaded",
+                    models.BigIntegerField(default=0, verbose_name="bytes uploaded"),
+                ),
+                (
+                    "downloads",
+                    models.BigIntegerField(default=0, verbose_name="downloads"),
+                ),
+                (
+                    "bytes_served",
+                    models.BigIntegerField(default=0, verbose_name="bytes served"),
+                ),
+                (
+                    "new_users",
+                    models.BigIntegerField(default=0, verbose_name="new users"),
+                ),
+            ],
+            options={
+                "verbose_name": "daily statistics",
+                "verbose_name_plural": "daily statistics",
+                "ordering": ["-day"],
+            },
+        ),
+    ]
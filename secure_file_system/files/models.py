@@ -1,11 +1,17 @@
 import os
+import shutil
 import uuid
 from typing import Optional, Type, TypeVar, Any, Dict, Tuple, Union, List
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import FileExtensionValidator
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import UploadedFile
 from django.contrib.auth import get_user_model
 
@@ -17,6 +23,129 @@ def user_directory_path(instance: 'File', filename: str) -> str:
     return f'user_{instance.uploaded_by.id}/{uuid.uuid4().hex}_{filename}'
 
 
+def blob_path(sha256: str) -> str:
+    """Blobs are stored at MEDIA_ROOT/blobs/<ab>/<cd>/<sha256>"""
+    return f'blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+def _link_into_place(source: str, target: str) -> None:
+    """Give ``source`` a second name at ``target``, replacing whatever is there."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temporary = f'{target}.{uuid.uuid4().hex}.tmp'
+    try:
+        os.link(source, temporary)
+    except OSError:
+        # No hard links across these paths, so pay for a copy
+        shutil.copyfile(source, temporary)
+    os.replace(temporary, target)
+
+
+class BlobManager(models.Manager['Blob']):
+    """Reference-counted access to content-addressed blobs"""
+
+    def acquire(self, sha256: str, size: int, name: Optional[str] = None,
+                content: Optional[UploadedFile] = None) -> 'Blob':
+        """
+        Take a reference to the blob for ``sha256``, creating it if needed.
+
+        The body comes either from the file already stored at ``name`` (linked
+        into place if the blob doesn't exist yet, and deleted once the
+        transaction commits, so it is still there for a retry after a
+        rollback) or from ``content`` (only written if the blob doesn't exist
+        yet). Must run inside a transaction.
+        """
+        blob = self.reference(sha256)
+        if blob is None:
+            storage_name = blob_path(sha256)
+            if name is not None:
+                _link_into_place(
+                    default_storage.path(name), default_storage.path(storage_name)
+                )
+            else:
+                if default_storage.exists(storage_name):
+                    # Left behind by an upload that didn't commit
+                    default_storage.delete(storage_name)
+                storage_name = default_storage.save(storage_name, content)
+            try:
+                with transaction.atomic():
+                    return self.create(
+                        sha256=sha256, file=storage_name, size=size, ref_count=1
+                    )
+            except IntegrityError:
+                # Someone else stored the same content first
+                if storage_name != blob_path(sha256):
+                    default_storage.delete(storage_name)
+                blob = self.reference(sha256)
+
+        if name is not None:
+            transaction.on_commit(lambda: default_storage.delete(name))
+        return blob
+
+    def reference(self, sha256: str) -> Optional['Blob']:
+        """Take another reference to an existing blob, or return None."""
+        if self.filter(sha256=sha256).update(ref_count=F('ref_count') + 1):
+            return self.get(sha256=sha256)
+        return None
+
+    def release(self, sha256: str) -> None:
+        """
+        Drop a reference. When the last one goes, the blob and its body are
+        deleted once the transaction commits, so a rollback leaves both.
+        """
+        with transaction.atomic():
+            blob = self.select_for_update().filter(sha256=sha256).first()
+            if blob is None or blob.ref_count == 0:
+                return
+            self.filter(sha256=sha256).update(ref_count=F('ref_count') - 1)
+            if blob.ref_count == 1:
+                transaction.on_commit(lambda: self.delete_unreferenced(sha256))
+
+    def delete_unreferenced(self, sha256: str) -> None:
+        """Delete the blob and its body if nothing has taken a reference to it since."""
+        with transaction.atomic():
+            blob = self.select_for_update().filter(sha256=sha256, ref_count=0).first()
+            if blob is None:
+                # Brought back by acquire, or already deleted
+                return
+            # Delete the body while holding the row lock so a concurrent
+            # acquire can't re-create the blob underneath us
+            blob.file.delete(save=False)
+            blob.delete()
+
+
+class Blob(models.Model):
+    """Content-addressed file body shared by every File with the same content"""
+    sha256: 'models.CharField' = models.CharField(
+        _('SHA-256'),
+        max_length=64,
+        primary_key=True
+    )
+    file: 'models.FileField[Union[UploadedFile, str]]' = models.FileField(
+        _('file'),
+        max_length=255
+    )
+    size: 'models.PositiveBigIntegerField' = models.PositiveBigIntegerField(
+        _('size in bytes')
+    )
+    ref_count: 'models.PositiveIntegerField' = models.PositiveIntegerField(
+        _('reference count'),
+        default=0
+    )
+    created_at: 'models.DateTimeField' = models.DateTimeField(
+        _('created at'),
+        auto_now_add=True
+    )
+
+    objects = BlobManager()
+
+    class Meta:
+        verbose_name = _('blob')
+        verbose_name_plural = _('blobs')
+
+    def __str__(self) -> str:
+        return f"{self.sha256} ({self.ref_count} references)"
+
+
 class File(models.Model):
     """Model to store file information"""
     class FileType(models.TextChoices):
@@ -42,21 +171,69 @@ class File(models.Model):
         choices=FileType.choices
     )
     file_size: 'models.PositiveBigIntegerField' = models.PositiveBigIntegerField(_('file size in bytes'))
+    content_hash: 'models.CharField' = models.CharField(
+        _('content hash'),
+        max_length=64,
+        blank=True,
+        help_text=_('Hex SHA-256 digest of the file content')
+    )
+    blob: 'models.ForeignKey[Blob, models.Model]' = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='files',
+        verbose_name=_('blob'),
+        help_text=_(
+            'Shared content-addressed body; '
+            'empty for files stored before deduplication'
+        )
+    )
     uploaded_by: 'models.ForeignKey[User, models.Model]' = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='uploaded_files',
-        verbose_name=_('uploaded by')
+        verbose_name=_('uploaded by'),
+        db_index=False  # Covered by file_uploader_created_idx
     )
     created_at: 'models.DateTimeField' = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at: 'models.DateTimeField' = models.DateTimeField(_('updated at'), auto_now=True)
     description: 'models.TextField' = models.TextField(_('description'), blank=True)
     is_public: 'models.BooleanField' = models.BooleanField(_('is public'), default=False)
+    search_vector: 'SearchVectorField' = SearchVectorField(
+        _('search vector'),
+        null=True,
+        editable=False,
+        help_text=_(
+            'Maintained by a database trigger from the filename, description '
+            'and document text'
+        )
+    )
     
     class Meta:
         verbose_name = _('file')
         verbose_name_plural = _('files')
         ordering = ['-created_at']
+        indexes = [
+            # A user's own files, newest first (FileListView, FileSearchView)
+            models.Index(
+                fields=['uploaded_by', '-created_at'],
+                name='file_uploader_created_idx'
+            ),
+            models.Index(
+                fields=['file_type', '-created_at'],
+                name='file_type_created_idx'
+            ),
+            # Operations users list every file, newest first
+            models.Index(fields=['-created_at'], name='file_created_idx'),
+            # Full-text search, and substring matches on the filename for
+            # original_filename__icontains, which compares UPPER(...) values
+            GinIndex(fields=['search_vector'], name='file_search_vector_idx'),
+            GinIndex(
+                OpClass(Upper('original_filename'), name='gin_trgm_ops'),
+                name='file_filename_trgm_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.original_filename} ({self.get_file_type_display()}) - {self.uploaded_by.email}"
@@ -82,22 +259,50 @@ class File(models.Model):
         
         super().save(*args, **kwargs)
     
-    def get_download_url(self) -> str:
-        """Generate a secure download URL for the file"""
-        from django.urls import reverse
-        from django.utils.http import urlencode
-        from django.utils.crypto import get_random_string
-        
-        # Create a one-time token for this download
-        token = get_random_string(length=32)
-        
-        # Store the token in the cache with a short expiration
-        from django.core.cache import cache
-        cache_key = f'file_download_{self.id}_{token}'
-        cache.set(cache_key, True, timeout=3600)  # 1 hour expiration
+    def can_download(self, user: Any) -> bool:
+        """Only the uploader and staff may download a file without a share link"""
+        return bool(user.is_staff or self.uploaded_by_id == user.pk)
+
+    def get_download_url(self, user: Any, request: Any = None) -> str:
+        """Generate a signed, expiring download URL for the file"""
+        from .download_tokens import signed_download_url
         
-        # Generate the download URL
-        return f"{settings.FRONTEND_URL}/api/files/{self.id}/download/?token={token}"
+        # Signing is local; no token is stored anywhere
+        return signed_download_url(self, user, request)
+
+
+class FileContent(models.Model):
+    """Text extracted from a file's document body, for search"""
+    file: 'models.OneToOneField[File, models.Model]' = models.OneToOneField(
+        File,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='content',
+        verbose_name=_('file')
+    )
+    text: 'models.TextField' = models.TextField(_('text'), blank=True)
+    truncated: 'models.BooleanField' = models.BooleanField(
+        _('truncated'),
+        default=False,
+        help_text=_('Only the start of the document was extracted')
+    )
+    search_vector: 'SearchVectorField' = SearchVectorField(
+        _('search vector'),
+        null=True,
+        editable=False,
+        help_text=_("Folded into the file's search vector by its trigger")
+    )
+    extracted_at: 'models.DateTimeField' = models.DateTimeField(
+        _('extracted at'),
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = _('file content')
+        verbose_name_plural = _('file contents')
+
+    def __str__(self) -> str:
+        return f"Content of {self.file_id}"
 
 
 class FileShareLink(models.Model):
@@ -114,7 +319,8 @@ class FileShareLink(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='created_share_links',
-        verbose_name=_('created by')
+        verbose_name=_('created by'),
+        db_index=False  # Covered by sharelink_creator_created_idx
     )
     created_at: 'models.DateTimeField' = models.DateTimeField(_('created at'), auto_now_add=True)
     expires_at: 'models.DateTimeField' = models.DateTimeField(_('expires at'), null=True, blank=True)
@@ -131,6 +337,31 @@ class FileShareLink(models.Model):
         verbose_name = _('file share link')
         verbose_name_plural = _('file share links')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['created_by', '-created_at'],
+                name='sharelink_creator_created_idx'
+            ),
+            # Only active links are looked up by expiry, and they are a small
+            # fraction of the table once links start expiring
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(is_active=True),
+                name='sharelink_active_expiry_idx'
+            ),
+            # For the cleanup (see files.share_link_cleanup): active links
+            # with a download limit, and inactive links by expiry
+            models.Index(
+                fields=['id'],
+                condition=models.Q(is_active=True, max_downloads__isnull=False),
+                name='sharelink_active_capped_idx'
+            ),
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(is_active=False),
+                name='sharelink_inactive_expiry_idx'
+            ),
+        ]
     
     def __str__(self) -> str:
         return f"Share link for {self.file.original_filename} by {self.created_by.email}"
@@ -142,9 +373,172 @@ class FileShareLink(models.Model):
         if self.max_downloads and self.download_count >= self.max_downloads:
             return True
         return not self.is_active
-    
+
+    def record_download(self) -> bool:
+        """
+        Count a download against the link, unless it has reached
+        ``max_downloads``. Returns whether the download may go ahead.
+
+        Checking and counting happen in a single conditional UPDATE, so
+        concurrent downloads can't overshoot the limit or lose increments,
+        and no other column is written. A link that has been deactivated or
+        deleted meanwhile refuses the download too.
+        """
+        allowed = FileShareLink.objects.filter(pk=self.pk, is_active=True).filter(
+            models.Q(max_downloads__isnull=True)
+            | models.Q(download_count__lt=F('max_downloads'))
+        ).update(download_count=F('download_count') + 1)
+        if allowed:
+            # Only a lower bound once other downloads are counted too
+            self.download_count += 1
+        return bool(allowed)
+
     def get_absolute_url(self) -> str:
         """Get the full shareable URL"""
         from django.urls import reverse
         path = reverse('files:shared-file-download', kwargs={'token': self.token})
         return f"{settings.FRONTEND_URL}{path}"
+
+
+class DownloadLog(models.Model):
+    """
+    Append-only record of a file download.
+
+    Rows are buffered in Redis and written in batches (see files.download_log).
+    The table is partitioned by month of ``downloaded_at`` so old months can
+    be dropped whole; its primary key is really ``(id, downloaded_at)``.
+    References aren't constrained, so the log outlives the files, links and
+    users it mentions.
+    """
+    id: 'models.BigAutoField' = models.BigAutoField(primary_key=True)
+    downloaded_at: 'models.DateTimeField' = models.DateTimeField(
+        _('downloaded at'),
+        default=timezone.now
+    )
+    share_link: 'models.ForeignKey[FileShareLink, models.Model]' = models.ForeignKey(
+        FileShareLink,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='download_logs',
+        verbose_name=_('share link')
+    )
+    file: 'models.ForeignKey[File, models.Model]' = models.ForeignKey(
+        File,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='download_logs',
+        verbose_name=_('file')
+    )
+    file_name: 'models.CharField' = models.CharField(_('file name'), max_length=255)
+    user: 'models.ForeignKey[User, models.Model]' = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name='download_logs',
+        verbose_name=_('user')
+    )
+    ip_address: 'models.GenericIPAddressField' = models.GenericIPAddressField(
+        _('IP address'),
+        null=True,
+        blank=True
+    )
+    status_code: 'models.PositiveSmallIntegerField' = models.PositiveSmallIntegerField(
+        _('status code')
+    )
+    bytes_sent: 'models.PositiveBigIntegerField' = models.PositiveBigIntegerField(
+        _('bytes sent')
+    )
+    duration_ms: 'models.PositiveIntegerField' = models.PositiveIntegerField(
+        _('duration in milliseconds')
+    )
+
+    class Meta:
+        verbose_name = _('download log entry')
+        verbose_name_plural = _('download log')
+        ordering = ['-downloaded_at']
+        indexes = [
+            models.Index(fields=['-downloaded_at'], name='downloadlog_downloaded_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.file_name} downloaded at {self.downloaded_at}"
+
+
+class SiteStats(models.Model):
+    """
+    Running totals for the admin dashboard, kept in a single row.
+
+    Counters move as users, files and downloads come and go, and a periodic
+    reconciliation recounts them from scratch (see files.stats).
+    """
+    id: 'models.PositiveSmallIntegerField' = models.PositiveSmallIntegerField(
+        primary_key=True,
+        default=1
+    )
+    user_count: 'models.BigIntegerField' = models.BigIntegerField(_('users'), default=0)
+    new_users_this_week: 'models.BigIntegerField' = models.BigIntegerField(
+        _('new users this week'),
+        default=0
+    )
+    file_count: 'models.BigIntegerField' = models.BigIntegerField(_('files'), default=0)
+    storage_bytes: 'models.BigIntegerField' = models.BigIntegerField(
+        _('storage used in bytes'),
+        default=0
+    )
+    download_count: 'models.BigIntegerField' = models.BigIntegerField(
+        _('downloads'),
+        default=0
+    )
+    downloads_this_week: 'models.BigIntegerField' = models.BigIntegerField(
+        _('downloads this week'),
+        default=0
+    )
+    reconciled_at: 'models.DateTimeField' = models.DateTimeField(
+        _('reconciled at'),
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = _('site statistics')
+        verbose_name_plural = _('site statistics')
+
+    def __str__(self) -> str:
+        return f"Site statistics as of {self.reconciled_at}"
+
+
+class DailyStats(models.Model):
+    """Activity totals for one day, kept up as it happens (see files.stats)"""
+    day: 'models.DateField' = models.DateField(_('day'), primary_key=True)
+    uploads: 'models.BigIntegerField' = models.BigIntegerField(_('uploads'), default=0)
+    bytes_uploaded: 'models.BigIntegerField' = models.BigIntegerField(
+        _('bytes uploaded'),
+        default=0
+    )
+    downloads: 'models.BigIntegerField' = models.BigIntegerField(
+        _('downloads'),
+        default=0
+    )
+    bytes_served: 'models.BigIntegerField' = models.BigIntegerField(
+        _('bytes served'),
+        default=0
+    )
+    new_users: 'models.BigIntegerField' = models.BigIntegerField(
+        _('new users'),
+        default=0
+    )
+
+    class Meta:
+        verbose_name = _('daily statistics')
+        verbose_name_plural = _('daily statistics')
+        ordering = ['-day']
+
+    def __str__(self) -> str:
+        return f"Statistics for {self.day}"
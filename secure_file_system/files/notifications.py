@@ -0,0 +1,173 @@
+"""
+Upload notification emails.
+
+Each recipient gets a message of their own, but they all go out over one
+SMTP connection instead of a connection per message. Delivery is tracked per
+message, so the caller can retry just the recipients that failed.
+
+With ``FILE_UPLOAD_DIGEST_WINDOW`` set, uploads aren't announced one by one.
+Each upload's file ID is appended to a Redis list, and the first upload of a
+window schedules ``files.tasks.send_upload_digest`` to run when the window
+closes. That task sends every staff user one email listing all the files, so
+a bulk import of hundreds of files costs one task and one email per
+recipient.
+"""
+import logging
+import smtplib
+from typing import List, Sequence
+
+import redis
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils.translation import gettext as _
+
+from config.redis_client import get_redis
+
+from .models import File
+
+logger = logging.getLogger(__name__)
+
+
+def upload_notification(file_obj: File, recipient: str) -> EmailMessage:
+    """The email telling ``recipient`` that ``file_obj`` was uploaded."""
+    uploader = file_obj.uploaded_by
+    uploader_name = (
+        f"{uploader.first_name} {uploader.last_name}".strip() or uploader.email
+    )
+    subject = _('New File Uploaded: {}').format(file_obj.original_filename)
+    body = _(
+        'A new file has been uploaded by {uploader}.\n\n'
+        'File Details:\n'
+        'Name: {filename}\n'
+        'Type: {file_type}\n'
+        'Size: {size} bytes\n'
+        'Uploaded at: {upload_time}\n\n'
+        'You can access the file through the secure file sharing system.'
+    ).format(
+        uploader=uploader_name,
+        filename=file_obj.original_filename,
+        file_type=file_obj.get_file_type_display(),
+        size=file_obj.file_size,
+        upload_time=file_obj.created_at.strftime('%Y-%m-%d %H:%M:%S')
+    )
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [recipient])
+
+
+def upload_digest(files: Sequence[File], recipient: str) -> EmailMessage:
+    """The email telling ``recipient`` about all of ``files`` at once."""
+    if len(files) == 1:
+        return upload_notification(files[0], recipient)
+
+    subject = _('{count} New Files Uploaded').format(count=len(files))
+    lines = [
+        _(
+            '- {filename} ({file_type}, {size} bytes) '
+            'uploaded by {uploader} at {upload_time}'
+        ).format(
+            filename=file_obj.original_filename,
+            file_type=file_obj.get_file_type_display(),
+            size=file_obj.file_size,
+            uploader=file_obj.uploaded_by.email,
+            upload_time=file_obj.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        )
+        for file_obj in files
+    ]
+    body = _(
+        'The following files have been uploaded:\n\n'
+        '{files}\n\n'
+        'You can access them through the secure file sharing system.'
+    ).format(files='\n'.join(lines))
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [recipient])
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Whether the server rejected the message for good (a 5xx reply)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _message in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def send_each(messages: Sequence[EmailMessage]) -> List[EmailMessage]:
+    """
+    Send ``messages`` one at a time over a single connection and return the
+    ones worth trying again.
+
+    A message the server refuses for good is logged and not returned. If the
+    connection drops it's reopened once for the remaining messages.
+    """
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except (smtplib.SMTPException, OSError):
+        logger.warning('Could not connect to the mail server', exc_info=True)
+        return list(messages)
+
+    retry: List[EmailMessage] = []
+    try:
+        for index, message in enumerate(messages):
+            try:
+                connection.send_messages([message])
+            except (smtplib.SMTPException, OSError) as e:
+                recipients = ', '.join(message.to)
+                if _is_permanent(e):
+                    logger.error('Mail server rejected %r for %s: %s',
+                                 message.subject, recipients, e)
+                    continue
+                logger.warning('Could not send %r to %s: %s',
+                               message.subject, recipients, e)
+                retry.append(message)
+                if isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                    connection.close()
+                    try:
+                        connection.open()
+                    except (smtplib.SMTPException, OSError):
+                        retry.extend(messages[index + 1:])
+                        break
+    finally:
+        connection.close()
+    return retry
+
+
+DIGEST_KEY = 'upload_digest:files'
+# Set while a digest is scheduled for the current window
+DIGEST_SCHEDULED_KEY = 'upload_digest:scheduled'
+
+
+def add_to_digest(file_id) -> bool:
+    """
+    Add an uploaded file to the current window's digest, scheduling the
+    digest if this is the window's first upload. Returns False if Redis is
+    unavailable, in which case the caller should notify right away.
+    """
+    window = settings.FILE_UPLOAD_DIGEST_WINDOW
+    try:
+        with get_redis().pipeline() as pipe:
+            pipe.rpush(DIGEST_KEY, str(file_id))
+            # Expires on its own in case the scheduled task is lost, so a
+            # later upload schedules another
+            pipe.set(DIGEST_SCHEDULED_KEY, 1, nx=True, ex=window * 2)
+            _length, first = pipe.execute()
+    except redis.RedisError:
+        logger.warning('Upload digest unavailable; notifying of file %s now',
+                       file_id, exc_info=True)
+        return False
+
+    if first:
+        from .tasks import send_upload_digest
+
+        send_upload_digest.apply_async(countdown=window)
+    return True
+
+
+def take_digest() -> List[str]:
+    """
+    Remove and return the IDs of the files uploaded in the current window.
+
+    The list is emptied together with the scheduled flag, so the next upload
+    starts a new window rather than joining one that's already been sent.
+    """
+    with get_redis().pipeline() as pipe:
+        pipe.lrange(DIGEST_KEY, 0, -1)
+        pipe.delete(DIGEST_KEY, DIGEST_SCHEDULED_KEY)
+        file_ids, _deleted = pipe.execute()
+    return [file_id.decode() for file_id in file_ids]
@@ -0,0 +1,164 @@
+"""
+Pagination for file and share link listings.
+
+``StandardResultsSetPagination`` pages by page number, which costs a
+``COUNT(*)`` per page and an ``OFFSET`` scan that grows with the page number.
+It stays the default for existing clients. Sending a ``cursor`` query
+parameter (empty for the first page) switches to keyset pagination instead:
+results are ordered newest first by ``(created_at, id)`` and each page starts
+after the last row of the previous one, so deep pages cost the same as the
+first and rows uploaded meanwhile never shift a page. In cursor mode the total
+is only computed on request, with ``count=exact`` or the planner's
+``count=estimate``.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db import connections
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+
+
+def estimated_count(queryset):
+    """
+    Return the planner's row estimate for ``queryset`` on PostgreSQL, which
+    reads table statistics instead of scanning. Other databases count exactly.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """Custom pagination class for consistent pagination across API endpoints."""
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(StandardResultsSetPagination):
+    """
+    Page-number pagination, or keyset pagination on ``(created_at, id)`` when
+    the request has a ``cursor`` parameter. Keyset pages are always newest
+    first, whatever ``ordering`` was asked for.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        self.count = self.get_count(queryset, request)
+
+        if reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+
+        if position is not None:
+            created_at, pk = position
+            # Spelled so the range on created_at can drive an index scan
+            if reverse:
+                queryset = queryset.filter(created_at__gte=created_at).exclude(
+                    created_at=created_at, id__lte=pk
+                )
+            else:
+                queryset = queryset.filter(created_at__lte=created_at).exclude(
+                    created_at=created_at, id__gte=pk
+                )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.results = results
+        return results
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if not mode:
+            return None
+        if mode == COUNT_EXACT:
+            return queryset.count()
+        if mode == COUNT_ESTIMATE:
+            return estimated_count(queryset)
+        raise ValidationError({
+            self.count_query_param: _('Must be "exact" or "estimate".')
+        })
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            position = (datetime.fromisoformat(data['t']), data['i'])
+            return position, bool(data.get('r'))
+        except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        data = {'t': instance.created_at.isoformat(), 'i': str(instance.pk)}
+        if reverse:
+            data['r'] = 1
+        payload = json.dumps(data, separators=(',', ':')).encode()
+        encoded = base64.urlsafe_b64encode(payload).decode('ascii')
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, encoded.rstrip('='))
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not (self.has_next and self.results):
+            return None
+        return self.encode_cursor(self.results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not (self.has_previous and self.results):
+            return None
+        return self.encode_cursor(self.results[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+
+        fields = [
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ]
+        if self.count is not None:
+            fields.insert(0, ('count', self.count))
+        fields.append(('results', data))
+        return Response(OrderedDict(fields))
@@ -0,0 +1,104 @@
+"""
+Full-text and trigram search over files.
+
+Every file row carries a ``search_vector`` that a database trigger keeps up
+to date (see migrations 0005 and 0006): filename words weighted A,
+description words weighted B, and document text extracted by a worker (see
+``files.extraction``) weighted C. A query matches files whose vector matches
+the parsed query, or whose filename contains the query text, which the
+trigram index on ``UPPER(original_filename)`` serves for queries of three or
+more characters.
+Up to ``FILE_SEARCH_MAX_CANDIDATES`` matches, the newest when there are more,
+are ranked by ``ts_rank`` plus trigram similarity of the filename, and come
+with a highlighted snippet of the description.
+"""
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connections, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Upper
+from django.utils.html import escape
+
+# Must match the configuration the search_vector trigger uses
+SEARCH_CONFIG = 'english'
+
+# Shortest query the trigram index can serve a substring match for
+MIN_TRIGRAM_QUERY_LENGTH = 3
+
+# ts_headline marks matches with these; they're swapped for <mark> tags once
+# the rest of the snippet has been HTML-escaped
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+
+
+def search_files(queryset, query):
+    """
+    Filter ``queryset`` to files matching ``query``, annotated with ``rank``
+    and ``headline`` and ordered best match first.
+    """
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+
+    matches = Q(search_vector=search_query)
+    if len(query) >= MIN_TRIGRAM_QUERY_LENGTH:
+        matches |= Q(original_filename__icontains=query)
+
+    # Ranking every match of a common word would mean scoring hundreds of
+    # thousands of rows per query, so at most FILE_SEARCH_MAX_CANDIDATES are
+    # ranked: all of them for a selective query, the newest for a common one
+    limit = settings.FILE_SEARCH_MAX_CANDIDATES
+    candidates = _first_matches(queryset.filter(matches), limit + 1)
+    if len(candidates) > limit:
+        newest = queryset.filter(matches).order_by('-created_at')
+        candidates = newest.values('pk')[:limit]
+
+    return queryset.model.objects.filter(pk__in=candidates).annotate(
+        rank=(
+            SearchRank(F('search_vector'), search_query)
+            + TrigramSimilarity(Upper('original_filename'), query.upper())
+        ),
+        headline=SearchHeadline(
+            Coalesce('description', Value('')),
+            search_query,
+            config=SEARCH_CONFIG,
+            start_sel=HIGHLIGHT_START,
+            stop_sel=HIGHLIGHT_STOP,
+            max_words=30,
+            min_words=10,
+        ),
+    ).order_by('-rank', '-created_at', '-id')
+
+
+def _first_matches(queryset, limit):
+    """
+    Return the primary keys of up to ``limit`` rows of ``queryset``, in no
+    particular order, read through the search indexes.
+
+    The planner can't estimate full-text matches well, least of all for words
+    that rarely or never occur together, and on a bad guess it scans the
+    whole table hoping to stop early. Bitmap scans of the GIN indexes cost
+    the same whatever the query turns out to match, so sequential scans are
+    ruled out while this runs.
+    """
+    connection = connections[queryset.db]
+    with transaction.atomic(using=queryset.db), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        try:
+            return list(queryset.values_list('pk', flat=True)[:limit])
+        finally:
+            # SET LOCAL outlives the savepoint when this runs nested in an
+            # outer transaction
+            cursor.execute('RESET enable_seqscan')
+
+
+def highlight_html(headline):
+    """Render a headline as HTML, with matched words wrapped in ``<mark>``."""
+    return (
+        escape(headline)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_STOP, '</mark>')
+    )
@@ -9,6 +9,8 @@ from django.core.files.uploadedfile import UploadedFile
 from django.http import HttpRequest
 
 from .models import File, FileShareLink
+from .search import highlight_html
+from .upload_handlers import max_upload_size
 from authentication.models import User as UserModel
 
 # Type variable for generic serializers
@@ -17,11 +19,13 @@ T = TypeVar('T', bound=Model)
 
 class FileSerializer(serializers.ModelSerializer[File]):
     """Serializer for file upload and details"""
+    # Stored bodies are named by their SHA-256, so the storage path is
+    # accepted on upload but never shown; download_url is the way in
     file: 'serializers.FileField' = serializers.FileField(
         required=True,
         max_length=255,
         allow_empty_file=False,
-        use_url=True
+        write_only=True
     )
     file_type: 'serializers.CharField' = serializers.CharField(read_only=True)
     file_size: 'serializers.IntegerField' = serializers.IntegerField(read_only=True)
@@ -43,12 +47,13 @@ class FileSerializer(serializers.ModelSerializer[File]):
 
     def get_download_url(self, obj: File) -> Optional[str]:
         """
-        Generate a secure download URL for the file
-        This will be a one-time use URL that expires
+        Generate a signed download URL for the file that expires, or None
+        if the user may not download it. Signing is done in-process, so a
+        page of files costs no cache or database round trips.
         """
         request = self.context.get('request')
-        if request:
-            return obj.get_download_url()
+        if request and request.user.is_authenticated and obj.can_download(request.user):
+            return obj.get_download_url(request.user, request)
         return None
     
     def get_file_name(self, obj: File) -> str:
@@ -86,6 +91,19 @@ class FileSerializer(serializers.ModelSerializer[File]):
         return super().create(validated_data)
 
 
+class FileSearchResultSerializer(FileSerializer):
+    """Serializer for search results, with relevance and a highlighted snippet"""
+    rank: 'serializers.FloatField' = serializers.FloatField(read_only=True)
+    headline: 'serializers.SerializerMethodField' = serializers.SerializerMethodField()
+
+    class Meta(FileSerializer.Meta):
+        fields = FileSerializer.Meta.fields + ['rank', 'headline']
+
+    def get_headline(self, obj: File) -> str:
+        """Description snippet as HTML, with matched words in <mark> tags"""
+        return highlight_html(obj.headline)
+
+
 class FileShareLinkSerializer(serializers.ModelSerializer[FileShareLink]):
     """Serializer for file share links"""
     file: 'serializers.PrimaryKeyRelatedField' = serializers.PrimaryKeyRelatedField(
@@ -220,3 +238,43 @@ class FileShareLinkCreateSerializer(serializers.ModelSerializer[FileShareLink]):
         )
         
         return share_link
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """Serializer for opening a resumable upload session"""
+    file_name: 'serializers.CharField' = serializers.CharField(max_length=255)
+    file_size: 'serializers.IntegerField' = serializers.IntegerField(min_value=1)
+    description: 'serializers.CharField' = serializers.CharField(
+        required=False, allow_blank=True, default=''
+    )
+
+    def validate_file_name(self, value: str) -> str:
+        """Only OOXML documents can be uploaded"""
+        valid_extensions = ('.docx', '.xlsx', '.pptx')
+        if not value.lower().endswith(valid_extensions):
+            raise serializers.ValidationError(_(
+                'File type is not supported. '
+                'Only .docx, .xlsx, and .pptx files are allowed.'
+            ))
+        return value
+
+    def validate_file_size(self, value: int) -> int:
+        """Check the declared size against the limit single-shot uploads have"""
+        max_size = max_upload_size()
+        if value > max_size:
+            raise serializers.ValidationError(
+                _('File size cannot exceed %(max_size)sMB')
+                % {'max_size': max_size // (1024 * 1024)}
+            )
+        return value
+
+
+class UploadSessionCommitSerializer(serializers.Serializer):
+    """Serializer for committing a resumable upload session"""
+    sha256: 'serializers.RegexField' = serializers.RegexField(
+        r'^[0-9a-fA-F]{64}$',
+        required=False,
+        help_text=_(
+            'Optional SHA-256 of the whole file, checked before the file is created'
+        )
+    )
@@ -0,0 +1,105 @@
+"""
+Cached share link validation for the public download endpoints.
+
+Popular share links are downloaded over and over, and each download used to
+look up the link and its file before serving a byte. ``get_share_link``
+keeps what a download needs per token in the ``hot`` cache: the file's
+stored path, name (which gives the content type), size and validators, and
+the link's expiry and download limit. A repeat download builds the link and
+file from that entry without a SELECT, leaving only the atomic counter
+update in ``FileShareLink.record_download``.
+
+Entries are dropped when a link is saved (deactivated, extended, edited) or
+deleted, and by the download views when ``record_download`` refuses a
+download because the link is exhausted. They never
+outlive the link's expiry or ``SHARE_LINK_CACHE_TIMEOUT``. Another process
+may serve its in-process copy for a few seconds after that (see
+config.cache), but ``record_download`` only counts downloads against active
+links, so a stale entry can't be used to download through a deactivated,
+deleted or exhausted link; only resumptions, which aren't counted, can.
+"""
+import uuid
+from typing import Any, Dict, Optional, Union
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, models
+from django.utils import timezone
+
+from .models import File, FileShareLink
+
+CACHE_ALIAS = 'hot'
+
+# Everything DownloadRequest and the views read; other fields stay deferred
+LINK_FIELDS = (
+    'id', 'token', 'file_id', 'expires_at', 'is_active', 'max_downloads',
+    'download_count'
+)
+FILE_FIELDS = (
+    'id', 'file', 'original_filename', 'file_size', 'content_hash', 'created_at'
+)
+
+
+def cache_key(token: Union[str, uuid.UUID]) -> str:
+    return f'share_link:{uuid.UUID(str(token)).hex}'
+
+
+def get_share_link(token: str) -> FileShareLink:
+    """
+    Return the active share link for ``token`` with its file attached,
+    from the cache when possible.
+
+    Raises ``FileShareLink.DoesNotExist`` for malformed tokens and for
+    tokens of missing or inactive links. Callers still check expiry and the
+    download limit.
+    """
+    try:
+        token = uuid.UUID(str(token))
+    except ValueError:
+        raise FileShareLink.DoesNotExist
+    key = cache_key(token)
+    cache = caches[CACHE_ALIAS]
+
+    entry = cache.get(key)
+    if entry is not None:
+        share_link = _instance(FileShareLink, entry['link'])
+        share_link.file = _instance(File, entry['file'])
+        return share_link
+
+    share_link = FileShareLink.objects.select_related('file').only(
+        *LINK_FIELDS, *(f'file__{name}' for name in FILE_FIELDS)
+    ).get(token=token, is_active=True)
+    timeout = _timeout(share_link)
+    if timeout:
+        cache.set(key, {
+            'link': _fields(share_link, LINK_FIELDS),
+            'file': _fields(share_link.file, FILE_FIELDS),
+        }, timeout)
+    return share_link
+
+
+def invalidate(token: Union[str, uuid.UUID]) -> None:
+    """Drop the cached entry for ``token`` so the next download rereads the link."""
+    caches[CACHE_ALIAS].delete(cache_key(token))
+
+
+def _timeout(share_link: FileShareLink) -> Optional[int]:
+    timeout = settings.SHARE_LINK_CACHE_TIMEOUT
+    if share_link.expires_at is not None:
+        remaining = share_link.expires_at - timezone.now()
+        timeout = min(timeout, int(remaining.total_seconds()))
+    return timeout if timeout > 0 else None
+
+
+def _fields(instance: models.Model, names: tuple) -> Dict[str, Any]:
+    # FileField values are cached as the stored name
+    return {
+        name: value.name if isinstance(value, models.fields.files.FieldFile) else value
+        for name, value in ((name, getattr(instance, name)) for name in names)
+    }
+
+
+def _instance(model: type, fields: Dict[str, Any]) -> models.Model:
+    # As if loaded with .only(), in the order from_db expects
+    names = [f.attname for f in model._meta.concrete_fields if f.attname in fields]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [fields[name] for name in names])
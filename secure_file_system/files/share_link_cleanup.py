@@ -0,0 +1,136 @@
+"""
+Cleanup of share links that can no longer be used.
+
+``cleanup_share_links`` works in two passes:
+
+1. Active links that are past their expiry or have used up their downloads
+   are deactivated.
+2. Inactive links that expired more than ``SHARE_LINK_RETENTION_DAYS`` ago
+   are deleted.
+
+Each pass walks a partial index in key order, ``SHARE_LINK_CLEANUP_BATCH_SIZE``
+rows at a time, starting each batch after the last row of the one before
+(keyset pagination). Every UPDATE or DELETE is its own short transaction
+that locks only the rows in its batch, so uploads and downloads never wait
+on the cleanup. A Redis lock keeps two beat schedulers from running it at
+the same time.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+from redis.exceptions import LockError
+
+from config.redis_client import get_redis
+
+from .models import FileShareLink
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'share_link_cleanup:lock'
+# Well beyond any run; the lock is released as soon as the run ends
+LOCK_TIMEOUT = 60 * 60
+
+
+def _after(fields: Sequence[str], values: Sequence) -> Q:
+    """Rows that sort after ``values`` when ordered by ``fields``."""
+    condition = Q(**{f'{fields[0]}__gt': values[0]})
+    for index in range(1, len(fields)):
+        equal = dict(zip(fields[:index], values[:index]))
+        condition |= Q(**equal, **{f'{fields[index]}__gt': values[index]})
+    return condition
+
+
+def _keyset_batches(queryset: QuerySet, fields: Sequence[str],
+                    batch_size: int) -> Iterator[List[Tuple]]:
+    """
+    Yield the ``fields`` values of the rows of ``queryset`` in that order,
+    ``batch_size`` rows at a time.
+    """
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(_after(fields, last))
+        rows = list(page.order_by(*fields).values_list(*fields)[:batch_size])
+        if rows:
+            yield rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+
+
+def _deactivate_expired(now: datetime, batch_size: int) -> int:
+    # Walks sharelink_active_expiry_idx
+    expired = FileShareLink.objects.filter(is_active=True, expires_at__lte=now)
+    deactivated = 0
+    for rows in _keyset_batches(expired, ('expires_at', 'pk'), batch_size):
+        deactivated += FileShareLink.objects.filter(
+            pk__in=[pk for _expires_at, pk in rows],
+            is_active=True
+        ).update(is_active=False)
+    return deactivated
+
+
+def _deactivate_exhausted(batch_size: int) -> int:
+    # Walks sharelink_active_capped_idx. Whether a link is used up can't be
+    # indexed, so every capped link is visited, a batch per UPDATE
+    capped = FileShareLink.objects.filter(is_active=True, max_downloads__isnull=False)
+    deactivated = 0
+    for rows in _keyset_batches(capped, ('pk',), batch_size):
+        deactivated += FileShareLink.objects.filter(
+            pk__in=[pk for pk, in rows],
+            is_active=True,
+            download_count__gte=F('max_downloads')
+        ).update(is_active=False)
+    return deactivated
+
+
+def _delete_stale(cutoff: datetime, batch_size: int) -> int:
+    # Walks sharelink_inactive_expiry_idx
+    stale = FileShareLink.objects.filter(is_active=False, expires_at__lt=cutoff)
+    deleted = 0
+    for rows in _keyset_batches(stale, ('expires_at', 'pk'), batch_size):
+        _total, per_model = FileShareLink.objects.filter(
+            pk__in=[pk for _expires_at, pk in rows],
+            is_active=False
+        ).delete()
+        deleted += per_model.get(FileShareLink._meta.label, 0)
+    return deleted
+
+
+def cleanup_share_links(now: Optional[datetime] = None,
+                        batch_size: Optional[int] = None) -> Optional[Dict[str, float]]:
+    """
+    Deactivate share links that can no longer be used and delete the ones
+    past retention.
+
+    Returns how many links were deactivated and deleted and how many seconds
+    it took, or None if another run holds the lock.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.SHARE_LINK_CLEANUP_BATCH_SIZE
+    lock = get_redis().lock(LOCK_KEY, timeout=LOCK_TIMEOUT, blocking=False)
+    if not lock.acquire():
+        logger.info('Share link cleanup is already running elsewhere; skipping')
+        return None
+
+    started = time.monotonic()
+    try:
+        deactivated = (
+            _deactivate_expired(now, batch_size) + _deactivate_exhausted(batch_size)
+        )
+        retained_since = now - timedelta(days=settings.SHARE_LINK_RETENTION_DAYS)
+        deleted = _delete_stale(retained_since, batch_size)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning('Share link cleanup outlived its lock')
+    seconds = round(time.monotonic() - started, 3)
+
+    logger.info('Share link cleanup deactivated %d and deleted %d links in %.3fs',
+                deactivated, deleted, seconds)
+    return {'deactivated': deactivated, 'deleted': deleted, 'seconds': seconds}
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Blob, File, FileShareLink
+from .share_link_cache import invalidate as invalidate_share_link
+from .stats import WEEK, bump, bump_daily
+
+
+@receiver(post_delete, sender=File)
+def release_file_blob(sender, instance, **kwargs):
+    """Drop the deleted file's reference to its shared blob."""
+    if instance.blob_id:
+        Blob.objects.release(instance.blob_id)
+
+
+@receiver(post_save, sender=File)
+def count_new_file(sender, instance, created, **kwargs):
+    """Add a new file to the dashboard statistics."""
+    if created:
+        bump(file_count=1, storage_bytes=instance.file_size)
+        bump_daily(uploads=1, bytes_uploaded=instance.file_size)
+
+
+@receiver(post_delete, sender=File)
+def count_deleted_file(sender, instance, **kwargs):
+    """Take a deleted file out of the dashboard statistics."""
+    bump(file_count=-1, storage_bytes=-instance.file_size)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def count_new_user(sender, instance, created, **kwargs):
+    """Add a new user to the dashboard statistics."""
+    if created:
+        bump(user_count=1, new_users_this_week=1)
+        bump_daily(new_users=1)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def count_deleted_user(sender, instance, **kwargs):
+    """Take a deleted user out of the dashboard statistics."""
+    if instance.date_joined >= timezone.now() - WEEK:
+        bump(user_count=-1, new_users_this_week=-1)
+    else:
+        bump(user_count=-1)
+
+
+@receiver(post_save, sender=FileShareLink)
+@receiver(post_delete, sender=FileShareLink)
+def forget_share_link(sender, instance, **kwargs):
+    """Drop a changed or deleted share link from the download cache on commit."""
+    token = instance.token
+    transaction.on_commit(lambda: invalidate_share_link(token))
+
+
+@receiver(post_save, sender=File)
+def queue_content_extraction(sender, instance, created, **kwargs):
+    """Have a worker extract a new file's text for search once it's committed."""
+    if created:
+        from .tasks import extract_file_content
+
+        file_id = str(instance.pk)
+        transaction.on_commit(lambda: extract_file_content.delay(file_id))
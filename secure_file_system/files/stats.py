@@ -0,0 +1,109 @@
+"""
+Precomputed statistics for the admin dashboard.
+
+Counting users, files and downloads live means scanning the biggest tables
+on every admin page load. Instead ``SiteStats`` keeps the totals in one row.
+Signals move them as users and files are created and deleted, and each
+flushed batch of the download log adds its size. Celery beat runs
+``reconcile`` hourly to recount users and files from their tables, which
+corrects any drift and lets the weekly figures shed what has aged out of the
+week. Downloads are summed from ``DailyStats`` instead, a row per day, since
+counting the partitioned download log would scan every partition each hour.
+
+``DailyStats`` rows hold each day's activity the same way, one row per day,
+so a daily report reads a single row rather than counting the day's uploads,
+downloads and sign-ups.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import DailyStats, File, SiteStats
+
+STATS_ID = 1
+WEEK = timedelta(days=7)
+
+
+def bump(**deltas: int) -> None:
+    """
+    Add ``deltas`` to the named counters once the current transaction
+    commits, so a rolled back change isn't counted and the row is locked
+    only for the single UPDATE.
+    """
+    def apply() -> None:
+        # Until the first reconcile there's no row to update, and nothing lost
+        SiteStats.objects.filter(pk=STATS_ID).update(**_increments(deltas))
+
+    transaction.on_commit(apply)
+
+
+def bump_daily(day: Optional[date] = None, **deltas: int) -> None:
+    """
+    Add ``deltas`` to the named totals for ``day`` (today if omitted) once
+    the current transaction commits.
+    """
+    day = day or timezone.localdate()
+
+    def apply() -> None:
+        if DailyStats.objects.filter(day=day).update(**_increments(deltas)):
+            return
+        try:
+            with transaction.atomic():
+                DailyStats.objects.create(day=day, **deltas)
+        except IntegrityError:
+            # The day's first activity was recorded elsewhere meanwhile
+            DailyStats.objects.filter(day=day).update(**_increments(deltas))
+
+    transaction.on_commit(apply)
+
+
+def _increments(deltas: Dict[str, int]) -> Dict[str, F]:
+    return {field: F(field) + delta for field, delta in deltas.items()}
+
+
+def reconcile(now: Optional[datetime] = None) -> SiteStats:
+    """
+    Recount every statistic and store the result.
+
+    Downloads this week are those of the last seven days, today included. A
+    change committed while this runs may be counted twice or not at all
+    until the next run.
+    """
+    now = now or timezone.now()
+    week_ago = now - WEEK
+    users = get_user_model().objects
+    files = File.objects.aggregate(count=Count('pk'), size=Sum('file_size'))
+    downloads = DailyStats.objects.aggregate(
+        total=Sum('downloads'),
+        week=Sum('downloads', filter=Q(day__gt=timezone.localdate(week_ago))),
+    )
+
+    stats, _ = SiteStats.objects.update_or_create(pk=STATS_ID, defaults={
+        'user_count': users.count(),
+        'new_users_this_week': users.filter(date_joined__gte=week_ago).count(),
+        'file_count': files['count'],
+        'storage_bytes': files['size'] or 0,
+        'download_count': downloads['total'] or 0,
+        'downloads_this_week': downloads['week'] or 0,
+        'reconciled_at': now,
+    })
+    return stats
+
+
+def get_stats() -> SiteStats:
+    """
+    The current statistics. If they have never been counted, the count is
+    queued rather than run in the caller's request, and zeros are returned
+    until it lands.
+    """
+    stats = SiteStats.objects.filter(pk=STATS_ID).first()
+    if stats is None:
+        from .tasks import reconcile_site_stats
+
+        transaction.on_commit(reconcile_site_stats.delay)
+        stats = SiteStats(pk=STATS_ID)
+    return stats
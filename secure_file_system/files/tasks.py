@@ -1,57 +1,151 @@
+import logging
+
 from celery import shared_task
-from django.core.mail import send_mail
-from django.conf import settings
-from django.utils.translation import gettext_lazy as _
+
+logger = logging.getLogger(__name__)
 
 @shared_task(bind=True, max_retries=3)
 def send_file_upload_notification(self, file_id, recipient_emails):
     """
     Celery task to send email notifications when a file is uploaded.
+
+    Every recipient's email goes out over one SMTP connection, and a retry
+    only resends to the recipients whose delivery failed.
     
     Args:
         file_id: ID of the uploaded file
         recipient_emails: List of email addresses to notify
     """
     from .models import File
-    from django.contrib.auth import get_user_model
+    from .notifications import send_each, upload_notification
     
+    try:
+        file_obj = File.objects.select_related('uploaded_by').get(id=file_id)
+    except File.DoesNotExist:
+        # Deleted before the worker got to it
+        return
+
+    failed = send_each([
+        upload_notification(file_obj, email) for email in recipient_emails
+    ])
+    if failed:
+        _retry_failed(self, failed, file_id)
+
+
+@shared_task(bind=True, max_retries=3)
+def send_upload_digest(self, file_ids=None, recipient_emails=None):
+    """
+    Celery task that sends each staff user one email listing the files
+    uploaded during the last ``FILE_UPLOAD_DIGEST_WINDOW`` seconds.
+
+    Args:
+        file_ids: Files to list; taken from the current digest if omitted
+        recipient_emails: Addresses to notify; every staff user if omitted
+    """
+    from django.contrib.auth import get_user_model
+    from .models import File
+    from .notifications import send_each, take_digest, upload_digest
+
+    if file_ids is None:
+        file_ids = take_digest()
+    files = File.objects.filter(id__in=file_ids).select_related('uploaded_by')
+    files = list(files.order_by('created_at'))
+    if not files:
+        return
+
+    if recipient_emails is None:
+        staff = get_user_model().objects.filter(is_staff=True)
+        recipient_emails = list(staff.values_list('email', flat=True))
+    failed = send_each([upload_digest(files, email) for email in recipient_emails])
+    if failed:
+        _retry_failed(self, failed, [str(file_obj.pk) for file_obj in files])
+
+
+def _retry_failed(task, failed, *args):
+    """Retry ``task`` for just the recipients of the ``failed`` messages."""
+    failed_emails = [email for message in failed for email in message.to]
+    if task.request.retries >= task.max_retries:
+        logger.error('Giving up on %s to %s', task.name, ', '.join(failed_emails))
+        return
+    # Retry after 5 minutes
+    task.retry(args=(*args, failed_emails), countdown=60 * 5)
+
+
+@shared_task
+def cleanup_expired_share_links():
+    """
+    Celery beat task that deactivates expired and used-up share links and
+    deletes the ones past retention, in small batches.
+    """
+    from .share_link_cleanup import cleanup_share_links
+
+    return cleanup_share_links()
+
+
+@shared_task
+def cleanup_upload_sessions():
+    """
+    Celery beat task that removes abandoned resumable upload sessions
+    together with their staged chunks.
+    """
+    from .upload_sessions import cleanup_expired_sessions
+
+    return cleanup_expired_sessions()
+
+
+@shared_task(bind=True, max_retries=3)
+def extract_file_content(self, file_id):
+    """
+    Celery task that extracts an uploaded document's text and adds it to
+    the file's search vector.
+
+    Args:
+        file_id: ID of the uploaded file
+    """
+    from .extraction import index_file_content
+    from .models import File
+
     try:
         file_obj = File.objects.get(id=file_id)
-        user_model = get_user_model()
-        
-        # Get the uploader's name
-        uploader_name = f"{file_obj.uploaded_by.first_name} {file_obj.uploaded_by.last_name}".strip()
-        if not uploader_name:
-            uploader_name = file_obj.uploaded_by.email
-            
-        # Prepare email content
-        subject = _('New File Uploaded: {}').format(file_obj.original_filename)
-        message = _(
-            'A new file has been uploaded by {uploader}.\n\n'
-            'File Details:\n'
-            'Name: {filename}\n'
-            'Type: {file_type}\n'
-            'Size: {size} bytes\n'
-            'Uploaded at: {upload_time}\n\n'
-            'You can access the file through the secure file sharing system.'
-        ).format(
-            uploader=uploader_name,
-            filename=file_obj.original_filename,
-            file_type=file_obj.get_file_type_display(),
-            size=file_obj.file_size,
-            upload_time=file_obj.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        )
-        
-        # Send email to each recipient
-        for email in recipient_emails:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-                fail_silently=False,
-            )
-            
-    except Exception as e:
-        # Retry the task if it fails
-        self.retry(exc=e, countdown=60 * 5)  # Retry after 5 minutes
+    except File.DoesNotExist:
+        # Deleted before the worker got to it
+        return
+
+    try:
+        index_file_content(file_obj)
+    except OSError as e:
+        # Storage hiccup; malformed documents are handled by index_file_content
+        self.retry(exc=e, countdown=60)
+
+
+@shared_task
+def flush_download_log():
+    """
+    Celery task that writes buffered download log entries in batches. Queued
+    when a batch fills up, and run by celery beat for the remainder.
+    """
+    from .download_log import flush
+
+    return flush()
+
+
+@shared_task
+def maintain_download_log_partitions():
+    """
+    Celery beat task that creates upcoming monthly download log partitions
+    and drops the ones past retention.
+    """
+    from .download_log import maintain_partitions
+
+    return maintain_partitions()
+
+
+@shared_task
+def reconcile_site_stats():
+    """
+    Celery beat task that recounts the admin dashboard statistics from the
+    tables, correcting any drift in the running totals.
+    """
+    from .stats import reconcile
+
+    reconcile()
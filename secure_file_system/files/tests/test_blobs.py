@@ -0,0 +1,109 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
+
+from authentication.models import User
+from files.models import Blob, File
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BlobTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        patcher = patch('files.tasks.extract_file_content.delay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        self.content = b'Quarterly template content'
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+
+    def create_file(self, **source):
+        blob = Blob.objects.acquire(self.sha256, len(self.content), **source)
+        return File.objects.create(
+            file=blob.file.name,
+            blob=blob,
+            original_filename='template.docx',
+            file_type='DOCX',
+            file_size=len(self.content),
+            content_hash=self.sha256,
+            uploaded_by=self.user
+        )
+
+    def test_duplicate_uploads_share_one_blob(self):
+        """Test that identical content is stored once and reference counted."""
+        first = self.create_file(content=ContentFile(self.content))
+
+        # A streamed duplicate is dropped in favour of the existing blob
+        streamed = default_storage.save(
+            'user_1/duplicate.docx', ContentFile(self.content)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.create_file(name=streamed)
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertFalse(default_storage.exists(streamed))
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+
+    def test_blob_is_unlinked_with_last_reference(self):
+        """Test that deleting files only removes the blob when none are left."""
+        first = self.create_file(content=ContentFile(self.content))
+        second = self.create_file(content=ContentFile(self.content))
+        path = first.file.path
+
+        first.delete()
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_rolled_back_delete_keeps_the_body(self):
+        """Test that the body survives when deleting its last file is rolled back."""
+        file_obj = self.create_file(content=ContentFile(self.content))
+        path = file_obj.file.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    file_obj.delete()
+                    raise DatabaseError('rolled back')
+            except DatabaseError:
+                pass
+
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+    def test_blob_reacquired_before_commit_is_kept(self):
+        """Test that content stored again before the delete runs isn't lost."""
+        file_obj = self.create_file(content=ContentFile(self.content))
+        path = file_obj.file.path
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            file_obj.delete()
+        self.create_file(content=ContentFile(self.content))
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(path))
@@ -0,0 +1,212 @@
+import json
+from datetime import datetime, timezone as dt_timezone
+from unittest.mock import patch
+
+import fakeredis
+import redis
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, close_old_connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+
+from files.download_log import (
+    BUFFER_KEY,
+    FLUSH_LOCK_KEY,
+    PROCESSING_KEY,
+    buffer_entry,
+    flush,
+    log_download,
+    maintain_partitions,
+    partition_name,
+    partitions,
+)
+from files.downloads import DownloadRequest
+from files.models import DownloadLog
+from files.tests.test_downloads import MEDIA_ROOT, DownloadTestCase
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+def log_entry(**fields):
+    entry = {
+        'downloaded_at': timezone.now().isoformat(),
+        'share_link_id': None,
+        'file_id': None,
+        'file_name': 'report.docx',
+        'user_id': None,
+        'ip_address': '127.0.0.1',
+        'status_code': 200,
+        'bytes_sent': 1,
+        'duration_ms': 1,
+    }
+    entry.update(fields)
+    return entry
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DownloadLogTests(DownloadTestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = fakeredis.FakeRedis()
+        patcher = patch('files.download_log.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_download_is_buffered_then_flushed(self):
+        """Test that a download is logged through the buffer, not by the request."""
+        # Behind one proxy only the last hop is trusted; the first came from the client
+        behind_one_proxy = {**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}
+        with override_settings(REST_FRAMEWORK=behind_one_proxy):
+            response = self.download(HTTP_X_FORWARDED_FOR='198.51.100.1, 203.0.113.7')
+        b''.join(response.streaming_content)
+
+        self.assertEqual(DownloadLog.objects.count(), 0)
+        self.assertEqual(self.redis.llen(BUFFER_KEY), 1)
+
+        self.assertEqual(flush(), 1)
+        log = DownloadLog.objects.get()
+        self.assertEqual(log.share_link_id, self.share_link.pk)
+        self.assertEqual(log.file_id, self.file_obj.pk)
+        self.assertEqual(log.file_name, 'report.docx')
+        self.assertEqual(log.ip_address, '203.0.113.7')
+        self.assertEqual(log.status_code, status.HTTP_200_OK)
+        self.assertEqual(log.bytes_sent, len(self.content))
+        self.assertEqual(self.redis.llen(BUFFER_KEY), 0)
+
+    def close(self, response):
+        # As the test client does, keep close() from dropping the test's connection
+        request_finished.disconnect(close_old_connections)
+        try:
+            response.close()
+        finally:
+            request_finished.connect(close_old_connections)
+
+    def test_aborted_transfer_logs_bytes_actually_sent(self):
+        """Test that a range response closed part way logs the file bytes sent."""
+        request = RequestFactory().get('/', HTTP_RANGE='bytes=0-4,10-14')
+        download = DownloadRequest(request, self.file_obj)
+        response = log_download(download, download.response(), self.share_link)
+
+        body = iter(response.streaming_content)
+        next(body)  # The first part's headers
+        next(body)  # and its five bytes
+        self.close(response)
+
+        flush()
+        self.assertEqual(DownloadLog.objects.get().bytes_sent, 5)
+
+    def test_full_download_keeps_its_file_body(self):
+        """Test that logging keeps wsgi.file_wrapper and counts what was sent."""
+        download = DownloadRequest(RequestFactory().get('/'), self.file_obj)
+        response = log_download(download, download.response(), self.share_link)
+
+        self.assertIs(response.file_to_stream, download.body_file)
+        response.block_size = 8
+        next(iter(response.streaming_content))
+        self.close(response)
+
+        flush()
+        self.assertEqual(DownloadLog.objects.get().bytes_sent, 8)
+
+    def test_range_logs_range_length(self):
+        """Test that a partial download logs only the bytes in the range."""
+        response = self.download(HTTP_RANGE='bytes=0-9')
+        b''.join(response.streaming_content)
+
+        flush()
+        log = DownloadLog.objects.get()
+        self.assertEqual(log.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(log.bytes_sent, 10)
+
+    @override_settings(FILE_DOWNLOAD_OFFLOAD='x-sendfile')
+    def test_offloaded_download_logs_requested_bytes(self):
+        """Test that a download sent by the proxy logs the size it was asked to send."""
+        self.download()
+
+        flush()
+        self.assertEqual(DownloadLog.objects.get().bytes_sent, len(self.content))
+
+    @override_settings(DOWNLOAD_LOG_BATCH_SIZE=10)
+    @patch('files.tasks.flush_download_log.delay')
+    def test_flush_writes_in_batches(self, mock_flush):
+        """Test that buffered entries are written one batch per INSERT."""
+        for _ in range(25):
+            buffer_entry(log_entry())
+
+        mock_flush.assert_called_once_with()
+        with self.assertNumQueries(3):
+            self.assertEqual(flush(), 25)
+        self.assertEqual(DownloadLog.objects.count(), 25)
+
+    def test_failed_batch_is_written_by_the_next_flush(self):
+        """Test that a batch whose insert fails stays claimed and is written later."""
+        for _ in range(3):
+            buffer_entry(log_entry())
+
+        lost = DatabaseError('connection lost')
+        with patch.object(DownloadLog.objects, 'bulk_create', side_effect=lost):
+            with self.assertRaises(DatabaseError):
+                flush()
+        self.assertEqual(self.redis.llen(BUFFER_KEY), 0)
+        self.assertEqual(self.redis.llen(PROCESSING_KEY), 3)
+
+        self.assertEqual(flush(), 3)
+        self.assertEqual(DownloadLog.objects.count(), 3)
+        self.assertEqual(self.redis.llen(PROCESSING_KEY), 0)
+
+    def test_batch_claimed_by_a_dead_flush_is_recovered(self):
+        """Test that entries left in the processing list are written before new ones."""
+        self.redis.rpush(PROCESSING_KEY, json.dumps(log_entry()))
+        buffer_entry(log_entry())
+
+        self.assertEqual(flush(), 2)
+        self.assertEqual(DownloadLog.objects.count(), 2)
+
+    def test_concurrent_flush_skips(self):
+        """Test that a flush doesn't claim batches while another one is running."""
+        buffer_entry(log_entry())
+
+        with self.redis.lock(FLUSH_LOCK_KEY):
+            self.assertIsNone(flush())
+        self.assertEqual(self.redis.llen(BUFFER_KEY), 1)
+
+    def test_unreachable_buffer_writes_directly(self):
+        """Test that entries are still recorded when Redis is down."""
+        with patch.object(self.redis, 'rpush', side_effect=redis.ConnectionError):
+            buffer_entry(log_entry())
+
+        self.assertEqual(DownloadLog.objects.count(), 1)
+
+
+class DownloadLogPartitionTests(TestCase):
+    def test_creates_upcoming_months_and_adopts_stray_rows(self):
+        """Test that months get partitions ahead of time, adopting stray rows."""
+        DownloadLog.objects.create(**log_entry(downloaded_at=utc(2025, 1, 15)))
+
+        result = maintain_partitions(now=utc(2025, 1, 20))
+
+        self.assertEqual(result['created'], [
+            partition_name(utc(2025, 1, 1).date()),
+            partition_name(utc(2025, 2, 1).date()),
+            partition_name(utc(2025, 3, 1).date()),
+        ])
+        self.assertEqual(maintain_partitions(now=utc(2025, 1, 21))['created'], [])
+        stray = DownloadLog.objects.filter(downloaded_at=utc(2025, 1, 15))
+        self.assertEqual(stray.count(), 1)
+
+    def test_drops_months_past_retention(self):
+        """Test that a month is dropped whole once all of it is past retention."""
+        maintain_partitions(now=utc(2025, 1, 20))
+        DownloadLog.objects.create(**log_entry(downloaded_at=utc(2025, 1, 15)))
+        DownloadLog.objects.create(**log_entry(downloaded_at=utc(2025, 2, 15)))
+
+        result = maintain_partitions(now=utc(2026, 2, 15), retention_days=365)
+
+        self.assertEqual(result['dropped'], [partition_name(utc(2025, 1, 1).date())])
+        self.assertNotIn(partition_name(utc(2025, 1, 1).date()), partitions())
+        remaining = DownloadLog.objects.values_list('downloaded_at', flat=True)
+        self.assertEqual(list(remaining), [utc(2025, 2, 15)])
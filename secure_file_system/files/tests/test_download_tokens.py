@@ -0,0 +1,168 @@
+import hashlib
+import shutil
+import tempfile
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import User
+from files.download_tokens import make_download_token
+from files.models import File, FileShareLink
+from files.serializers import FileSerializer
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SignedDownloadTokenTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.ops_user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        self.content = b'This is a test file content'
+        self.file_obj = File.objects.create(
+            file=SimpleUploadedFile('report.docx', self.content),
+            original_filename='report.docx',
+            file_type='DOCX',
+            file_size=len(self.content),
+            content_hash=hashlib.sha256(self.content).hexdigest(),
+            uploaded_by=self.ops_user
+        )
+        self.url = reverse(
+            'files:secure_file_download', kwargs={'id': str(self.file_obj.id)}
+        )
+
+    def test_download_link_is_signed_and_stores_nothing(self):
+        """Test that getting a download link writes no share link and the link works."""
+        access = RefreshToken.for_user(self.ops_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = self.client.get(reverse(
+            'files:get_download_link', kwargs={'id': str(self.file_obj.id)}
+        ))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(FileShareLink.objects.count(), 0)
+
+        link = urlparse(response.data['download-link'])
+        self.assertEqual(link.path, self.url)
+        self.client.credentials()
+        # The token itself is checked without a query; only the file is fetched
+        with self.assertNumQueries(1):
+            response = self.client.get(link.path, parse_qs(link.query))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_tampered_token_is_rejected(self):
+        """Test that a token whose payload or signature was altered is refused."""
+        token = make_download_token(self.file_obj, self.ops_user)
+        payload, signature = token.rsplit(':', 1)
+        tampered = f"{payload}:{signature[::-1]}"
+
+        response = self.client.get(self.url, {'token': tampered})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_expired_token_is_rejected(self):
+        """Test that a token past its expiry no longer downloads."""
+        token = make_download_token(self.file_obj, self.ops_user, ttl=-1)
+
+        response = self.client.get(self.url, {'token': token})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_token_is_bound_to_its_file(self):
+        """Test that a token issued for one file can't download another."""
+        other = File.objects.create(
+            file=SimpleUploadedFile('other.docx', b'other'),
+            original_filename='other.docx',
+            file_type='DOCX',
+            file_size=5,
+            uploaded_by=self.ops_user
+        )
+        token = make_download_token(other, self.ops_user)
+
+        response = self.client.get(self.url, {'token': token})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_serializing_a_page_makes_no_round_trips(self):
+        """Test that a page of download URLs needs no queries or cache writes."""
+        File.objects.bulk_create([
+            File(
+                file=self.file_obj.file.name,
+                original_filename=f'report-{index}.docx',
+                file_type='DOCX',
+                file_size=len(self.content),
+                uploaded_by=self.ops_user
+            )
+            for index in range(99)
+        ])
+        files = list(File.objects.all())
+        request = RequestFactory().get('/api/files/')
+        request.user = self.ops_user
+
+        serializer = FileSerializer(files, many=True, context={'request': request})
+        with patch('django.core.cache.cache.set') as cache_set:
+            with self.assertNumQueries(0):
+                data = serializer.data
+
+        cache_set.assert_not_called()
+        self.assertEqual(len(data), 100)
+        self.assertEqual(len({item['download_url'] for item in data}), 100)
+        self.assertIn('token=', data[0]['download_url'])
+
+    def test_listing_omits_urls_for_other_users_files(self):
+        """Test that operations users only get URLs for files they may download."""
+        other_ops = User.objects.create_user(
+            email='other-ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        staff = User.objects.create_user(
+            email='staff@example.com', password='testpass123', is_staff=True
+        )
+        request = RequestFactory().get('/api/files/')
+
+        def download_url(user):
+            request.user = user
+            serializer = FileSerializer(self.file_obj, context={'request': request})
+            return serializer.data['download_url']
+
+        self.assertIsNone(download_url(other_ops))
+        self.assertIn('token=', download_url(staff))
+
+    def test_token_for_a_user_without_access_is_rejected(self):
+        """Test that a signed token only downloads for the uploader or staff."""
+        other_ops = User.objects.create_user(
+            email='other-ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        staff = User.objects.create_user(
+            email='staff@example.com', password='testpass123', is_staff=True
+        )
+
+        token = make_download_token(self.file_obj, other_ops)
+        response = self.client.get(self.url, {'token': token})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        token = make_download_token(self.file_obj, staff)
+        response = self.client.get(self.url, {'token': token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
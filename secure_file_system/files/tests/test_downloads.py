@@ -0,0 +1,286 @@
+import hashlib
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import User
+from files.downloads import parse_range_header
+from files.models import File, FileShareLink
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class DownloadTestCase(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.ops_user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        self.content = b'This is a test file content'
+        self.file_obj = File.objects.create(
+            file=SimpleUploadedFile('report.docx', self.content),
+            original_filename='report.docx',
+            file_type='DOCX',
+            file_size=len(self.content),
+            content_hash=hashlib.sha256(self.content).hexdigest(),
+            uploaded_by=self.ops_user
+        )
+        self.share_link = FileShareLink.objects.create(
+            file=self.file_obj,
+            created_by=self.ops_user,
+            expires_at=timezone.now() + timedelta(days=1)
+        )
+        self.url = reverse(
+            'files:secure_file_download', kwargs={'id': str(self.file_obj.id)}
+        )
+
+    def download(self, **headers):
+        return self.client.get(
+            self.url, {'token': str(self.share_link.token)}, **headers
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DownloadOffloadTests(DownloadTestCase):
+    def test_serves_file_without_offload(self):
+        """Test that Django streams the file when no offload is configured."""
+        response = self.download()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(
+            response['Content-Disposition'], 'attachment; filename="report.docx"'
+        )
+
+    @override_settings(
+        FILE_DOWNLOAD_OFFLOAD='x-accel-redirect',
+        FILE_DOWNLOAD_ACCEL_PREFIX='/protected-media/'
+    )
+    def test_accel_redirect_offload(self):
+        """Test that nginx offload returns headers pointing at the internal location."""
+        response = self.download()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response['X-Accel-Redirect'], f'/protected-media/{self.file_obj.file.name}'
+        )
+        self.assertEqual(
+            response['Content-Type'],
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+        )
+        self.assertEqual(response.content, b'')
+
+    @override_settings(FILE_DOWNLOAD_OFFLOAD='x-sendfile')
+    def test_sendfile_offload(self):
+        """Test that X-Sendfile offload points the proxy at the file on disk."""
+        response = self.download()
+
+        self.assertEqual(response['X-Sendfile'], self.file_obj.file.path)
+        self.assertEqual(response.content, b'')
+
+    def test_invalid_token_is_forbidden(self):
+        """Test that a malformed token is rejected rather than erroring."""
+        response = self.client.get(self.url, {'token': 'invalid-token'})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RangeAndConditionalDownloadTests(DownloadTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.etag = f'"{self.file_obj.content_hash}"'
+
+    def test_matching_etag_returns_not_modified(self):
+        """Test that revalidating with the current ETag gets a 304 and isn't counted."""
+        response = self.download()
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.download(HTTP_IF_NONE_MATCH=self.etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.share_link.refresh_from_db()
+        self.assertEqual(self.share_link.download_count, 1)
+
+    def test_single_range(self):
+        """Test that a single byte range is served as 206 Partial Content."""
+        response = self.download(HTTP_RANGE='bytes=5-8')
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), self.content[5:9])
+        self.assertEqual(response['Content-Range'], f'bytes 5-8/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '4')
+
+    def test_multiple_ranges(self):
+        """Test that several ranges are served as multipart/byteranges."""
+        response = self.download(HTTP_RANGE='bytes=0-3,-4')
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertTrue(
+            response['Content-Type'].startswith('multipart/byteranges; boundary=')
+        )
+        body = b''.join(response.streaming_content)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        first_part = b'Content-Range: bytes 0-3/%d\r\n\r\n%s' % (
+            len(self.content), self.content[:4]
+        )
+        self.assertIn(first_part, body)
+        self.assertIn(self.content[-4:], body)
+
+    def test_unsatisfiable_range(self):
+        """Test that a range past the end of the file gets a 416."""
+        response = self.download(HTTP_RANGE=f'bytes={len(self.content)}-')
+
+        self.assertEqual(
+            response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+        self.share_link.refresh_from_db()
+        self.assertEqual(self.share_link.download_count, 0)
+
+    def test_stale_if_range_sends_whole_file(self):
+        """Test that If-Range with an old ETag ignores the Range header."""
+        response = self.download(HTTP_RANGE='bytes=5-', HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_resumed_download_is_not_counted(self):
+        """Test that resuming a counted download doesn't use up the download limit."""
+        self.share_link.max_downloads = 1
+        self.share_link.save()
+
+        response = self.download(HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        response = self.download(HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=self.etag)
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:])
+        self.share_link.refresh_from_db()
+        self.assertEqual(self.share_link.download_count, 1)
+
+        # Starting over is a new download
+        self.assertEqual(self.download().status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_download_interrupted_twice_is_counted_once(self):
+        """Test that each resumption can be resumed in turn, but only going forward."""
+        self.download(HTTP_RANGE='bytes=0-9')
+        self.download(HTTP_RANGE='bytes=10-19')
+        response = self.download(HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.share_link.refresh_from_db()
+        self.assertEqual(self.share_link.download_count, 1)
+
+        # Going back to an earlier offset is a new download
+        self.download(HTTP_RANGE='bytes=15-')
+        self.share_link.refresh_from_db()
+        self.assertEqual(self.share_link.download_count, 2)
+
+    def test_resumption_has_to_move_forward(self):
+        """Test that a range starting before the counted one is a new download."""
+        self.download(HTTP_RANGE='bytes=10-')
+        self.download(HTTP_RANGE='bytes=5-')
+
+        self.share_link.refresh_from_db()
+        self.assertEqual(self.share_link.download_count, 2)
+
+    def test_range_without_earlier_download_is_counted(self):
+        """Test that a mid-file range is counted when nothing was downloaded before."""
+        self.download(HTTP_RANGE='bytes=10-')
+
+        self.share_link.refresh_from_db()
+        self.assertEqual(self.share_link.download_count, 1)
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql',
+    'Needs a database that takes concurrent connections'
+)
+class ConcurrentDownloadCountTests(TransactionTestCase):
+    THREADS = 16
+    ROUNDS = 10
+
+    def setUp(self):
+        user = User.objects.create_user(email='ops@example.com', password='testpass123')
+        file_obj = File.objects.bulk_create([File(
+            file='files/report.docx',
+            original_filename='report.docx',
+            file_type='DOCX',
+            file_size=1,
+            uploaded_by=user
+        )])[0]
+        self.share_link = FileShareLink.objects.create(file=file_obj, created_by=user)
+
+    def hammer(self):
+        """Record downloads of the link in rounds of THREADS simultaneous attempts."""
+        start = threading.Barrier(self.THREADS)
+
+        def download(_):
+            try:
+                link = FileShareLink.objects.get(pk=self.share_link.pk)
+                start.wait()
+                return link.record_download()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.THREADS) as pool:
+            # Every attempt in a round has read the link before any of them counts
+            results = list(pool.map(download, range(self.THREADS * self.ROUNDS)))
+        self.share_link.refresh_from_db()
+        return results
+
+    def test_limit_is_never_overshot(self):
+        """Test that concurrent downloads of a limited link stop at max_downloads."""
+        self.share_link.max_downloads = 25
+        self.share_link.save()
+
+        results = self.hammer()
+
+        self.assertEqual(results.count(True), 25)
+        self.assertEqual(self.share_link.download_count, 25)
+
+    def test_no_increments_are_lost(self):
+        """Test that every concurrent download of an unlimited link is counted."""
+        results = self.hammer()
+
+        self.assertTrue(all(results))
+        self.assertEqual(self.share_link.download_count, self.THREADS * self.ROUNDS)
+
+
+class ParseRangeHeaderTests(TestCase):
+    def test_parses_and_clamps_ranges(self):
+        """Test that open, suffix and overlong ranges are resolved against the size."""
+        self.assertEqual(
+            parse_range_header('bytes=0-99,50-,-10', 100),
+            [(0, 99), (50, 99), (90, 99)]
+        )
+        self.assertEqual(parse_range_header('bytes=90-200', 100), [(90, 99)])
+        self.assertEqual(parse_range_header('bytes=200-', 100), [])
+
+    def test_ignores_invalid_headers(self):
+        """Test that malformed, non-byte and excessive ranges are ignored."""
+        self.assertIsNone(parse_range_header('items=0-1', 100))
+        self.assertIsNone(parse_range_header('bytes=5-1', 100))
+        self.assertIsNone(parse_range_header('bytes=abc', 100))
+        self.assertIsNone(parse_range_header('bytes=' + ','.join(['0-0'] * 17), 100))
@@ -0,0 +1,238 @@
+import io
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+import zipfile
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from authentication.models import User
+from files.extraction import ExtractionError, extract_text, index_file_content
+from files.models import Blob, File, FileContent
+from files.search import search_files
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+S = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+A = (
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"'
+)
+
+
+def make_archive(parts):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+    buffer.seek(0)
+    return buffer
+
+
+def make_docx(*paragraphs):
+    body = ''.join(f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>' for text in paragraphs)
+    return make_archive({
+        'word/document.xml': f'<w:document {W}><w:body>{body}</w:body></w:document>'
+    })
+
+
+def slide(text):
+    return (
+        f'<p:sld {A}><p:cSld><p:spTree><p:sp><p:txBody>'
+        f'<a:p><a:r><a:t>{text}</a:t></a:r></a:p>'
+        '</p:txBody></p:sp></p:spTree></p:cSld></p:sld>'
+    )
+
+
+class ExtractTextTests(TestCase):
+    def test_docx_paragraphs(self):
+        """Test that each Word paragraph comes out on its own line, runs joined."""
+        archive = make_archive({'word/document.xml': (
+            f'<w:document {W}><w:body>'
+            '<w:p><w:r><w:t>Quarterly </w:t></w:r><w:r><w:t>budget</w:t></w:r></w:p>'
+            '<w:p><w:r><w:t>Approved</w:t></w:r></w:p>'
+            '</w:body></w:document>'
+        )})
+
+        extracted = extract_text(archive, File.FileType.DOCX)
+
+        self.assertEqual(extracted.text, 'Quarterly budget\nApproved')
+
+    def test_xlsx_strings(self):
+        """Test that shared and inline strings are extracted, not numbers."""
+        archive = make_archive({
+            'xl/sharedStrings.xml': (
+                f'<sst {S}><si><t>Revenue</t></si>'
+                '<si><r><t>Net </t></r><r><t>margin</t></r>'
+                '<rPh><t>ignored</t></rPh></si></sst>'
+            ),
+            'xl/worksheets/sheet1.xml': (
+                f'<worksheet {S}><sheetData><row r="1">'
+                '<c r="A1" t="s"><v>0</v></c><c r="B1"><v>42</v></c>'
+                '<c r="C1" t="inlineStr"><is><t>Forecast</t></is></c>'
+                '</row></sheetData></worksheet>'
+            ),
+        })
+
+        extracted = extract_text(archive, File.FileType.XLSX)
+
+        self.assertEqual(
+            extracted.text.split('\n'), ['Revenue', 'Net margin', 'Forecast']
+        )
+
+    def test_pptx_slides_in_order(self):
+        """Test that slides are read in slide order, not archive order."""
+        archive = make_archive({
+            'ppt/slides/slide10.xml': slide('Ten'),
+            'ppt/slides/slide2.xml': slide('Two'),
+            'ppt/slides/slide1.xml': slide('One'),
+        })
+
+        extracted = extract_text(archive, File.FileType.PPTX)
+
+        self.assertEqual(extracted.text.split(), ['One', 'Two', 'Ten'])
+
+    def test_stops_at_character_limit(self):
+        """Test that extraction stops once enough text has been collected."""
+        archive = make_docx('a' * 50, 'b' * 50, 'c' * 50)
+
+        extracted = extract_text(archive, File.FileType.DOCX, max_chars=60)
+
+        self.assertTrue(extracted.truncated)
+        self.assertEqual(len(extracted.text), 60)
+        self.assertNotIn('c', extracted.text)
+
+    def test_stops_at_xml_limit(self):
+        """Test that a part inflating to more XML than allowed isn't read to the end."""
+        archive = make_docx('start', *['x' * 1000] * 1000, 'end')
+
+        extracted = extract_text(archive, File.FileType.DOCX, max_xml_bytes=100_000)
+
+        self.assertTrue(extracted.truncated)
+        self.assertTrue(extracted.text.startswith('start'))
+        self.assertNotIn('end', extracted.text)
+
+    def test_not_a_zip(self):
+        """Test that something other than a zip archive is reported as unreadable."""
+        with self.assertRaises(ExtractionError):
+            extract_text(io.BytesIO(b'not a document'), File.FileType.DOCX)
+
+    def test_malformed_xml(self):
+        """Test that a broken part is reported as unreadable."""
+        with self.assertRaises(ExtractionError):
+            broken = make_archive({'word/document.xml': '<w:document'})
+            extract_text(broken, File.FileType.DOCX)
+
+    def test_large_sheet_in_bounded_memory(self):
+        """Test that a sheet with a hundred thousand cells is streamed, not loaded."""
+        with tempfile.TemporaryFile() as stream:
+            with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+                with archive.open('xl/worksheets/sheet1.xml', 'w') as part:
+                    part.write(f'<worksheet {S}><sheetData>'.encode())
+                    for row in range(1, 50_001):
+                        part.write(
+                            f'<row r="{row}">'
+                            f'<c r="A{row}"><v>{row}</v></c>'
+                            f'<c r="B{row}"><v>{row * 2}</v></c>'
+                            '</row>'.encode()
+                        )
+                    part.write(
+                        b'<row r="50001"><c r="A50001" t="inlineStr">'
+                        b'<is><t>Total</t></is></c></row>'
+                    )
+                    part.write(b'</sheetData></worksheet>')
+            stream.seek(0)
+
+            tracemalloc.start()
+            try:
+                extracted = extract_text(stream, File.FileType.XLSX)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        self.assertEqual(extracted.text, 'Total')
+        # Several megabytes of XML go through the parser
+        self.assertLess(peak, 1024 * 1024)
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql', 'Search uses PostgreSQL full-text matching'
+)
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class IndexFileContentTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+
+    def make_file(self, content, blob=None):
+        file_obj = File(
+            original_filename='notes.docx',
+            file_type=File.FileType.DOCX,
+            uploaded_by=self.user,
+            blob=blob
+        )
+        file_obj.file.save('notes.docx', ContentFile(content.getvalue()), save=False)
+        file_obj.save()
+        return file_obj
+
+    def test_document_text_is_searchable(self):
+        """Test that words from inside the document find the file."""
+        file_obj = self.make_file(make_docx('Settlement with the landlord'))
+        self.assertFalse(search_files(File.objects.all(), 'landlord').exists())
+
+        index_file_content(file_obj)
+
+        self.assertEqual(list(search_files(File.objects.all(), 'landlord')), [file_obj])
+        self.assertEqual(
+            FileContent.objects.get(file=file_obj).text, 'Settlement with the landlord'
+        )
+
+    def test_filename_outranks_document_text(self):
+        """Test that document text weighs less than the filename."""
+        in_text = self.make_file(make_docx('Invoice attached'))
+        index_file_content(in_text)
+        in_name = File.objects.bulk_create([File(
+            file='files/invoice.docx',
+            original_filename='invoice.docx',
+            file_type=File.FileType.DOCX,
+            file_size=1,
+            uploaded_by=self.user
+        )])[0]
+
+        results = search_files(File.objects.all(), 'invoice')
+        self.assertEqual(list(results), [in_name, in_text])
+
+    def test_unreadable_file_is_recorded_empty(self):
+        """Test that a file that isn't a document gets empty content, not an error."""
+        file_obj = self.make_file(io.BytesIO(b'not a document'))
+
+        self.assertEqual(index_file_content(file_obj).text, '')
+
+    def test_shared_blob_is_not_parsed_again(self):
+        """Test that a second file with the same content copies the first one's text."""
+        blob = Blob.objects.create(sha256='a' * 64, file='blobs/a', size=1, ref_count=2)
+        first = self.make_file(make_docx('Merger timeline'), blob=blob)
+        index_file_content(first)
+        second = self.make_file(make_docx('Merger timeline'), blob=blob)
+
+        with patch('files.extraction.extract_text') as mock_extract:
+            index_file_content(second)
+
+        mock_extract.assert_not_called()
+        self.assertEqual(FileContent.objects.get(file=second).text, 'Merger timeline')
+        self.assertIn(second, search_files(File.objects.all(), 'merger'))
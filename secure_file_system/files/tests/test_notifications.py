@@ -0,0 +1,225 @@
+import shutil
+import smtplib
+import tempfile
+from unittest.mock import patch
+
+import fakeredis
+import redis
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+
+from authentication.models import User
+from files.models import File
+from files.notifications import (
+    DIGEST_KEY,
+    add_to_digest,
+    send_each,
+    upload_notification,
+)
+from files.tasks import send_file_upload_notification, send_upload_digest
+from files.views import notify_admins_of_upload
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class RecordingBackend(EmailBackend):
+    """locmem backend that counts connections and refuses chosen recipients"""
+    opened = 0
+    sent = []
+    delivered = []
+    errors = {}
+
+    def open(self):
+        RecordingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            error = self.errors.get(message.to[0])
+            if error is not None:
+                raise error
+            self.sent.append(message.to[0])
+            self.delivered.append(message)
+        return len(messages)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    EMAIL_BACKEND='files.tests.test_notifications.RecordingBackend'
+)
+@patch('files.tasks.extract_file_content.delay')
+class UploadNotificationTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        RecordingBackend.opened = 0
+        RecordingBackend.sent = []
+        RecordingBackend.delivered = []
+        RecordingBackend.errors = {}
+        self.user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        self.file_obj = File.objects.create(
+            file=SimpleUploadedFile('report.docx', b'content'),
+            original_filename='report.docx',
+            file_type=File.FileType.DOCX,
+            uploaded_by=self.user
+        )
+        self.recipients = [f'admin{i}@example.com' for i in range(5)]
+
+    def test_one_connection_for_all_recipients(self, mock_extract):
+        """Test that every recipient gets their own email over a single connection."""
+        send_file_upload_notification.apply(args=(self.file_obj.pk, self.recipients))
+
+        self.assertEqual(RecordingBackend.opened, 1)
+        self.assertEqual(RecordingBackend.sent, self.recipients)
+
+    def test_retry_only_failed_recipients(self, mock_extract):
+        """Test that a retry is addressed only to the recipients that failed."""
+        RecordingBackend.errors = {
+            'admin1@example.com': smtplib.SMTPServerDisconnected('gone'),
+            'admin3@example.com': smtplib.SMTPResponseException(451, b'try later'),
+        }
+
+        with patch.object(send_file_upload_notification, 'retry') as mock_retry:
+            send_file_upload_notification.apply(
+                args=(self.file_obj.pk, self.recipients)
+            )
+
+        self.assertEqual(
+            RecordingBackend.sent,
+            ['admin0@example.com', 'admin2@example.com', 'admin4@example.com']
+        )
+        mock_retry.assert_called_once_with(
+            args=(self.file_obj.pk, ['admin1@example.com', 'admin3@example.com']),
+            countdown=300
+        )
+
+    def test_permanent_rejection_is_not_retried(self, mock_extract):
+        """Test that a recipient the server refuses outright isn't tried again."""
+        RecordingBackend.errors = {
+            'admin2@example.com': smtplib.SMTPRecipientsRefused(
+                {'admin2@example.com': (550, b'no such user')}
+            ),
+        }
+        messages = [
+            upload_notification(self.file_obj, email) for email in self.recipients
+        ]
+
+        self.assertEqual(send_each(messages), [])
+        self.assertEqual(len(RecordingBackend.sent), 4)
+
+    def test_unreachable_server_fails_everyone(self, mock_extract):
+        """Test that no connection means every message is returned for retry."""
+        messages = [
+            upload_notification(self.file_obj, email) for email in self.recipients
+        ]
+
+        with patch.object(RecordingBackend, 'open', side_effect=ConnectionRefusedError):
+            self.assertEqual(send_each(messages), messages)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    EMAIL_BACKEND='files.tests.test_notifications.RecordingBackend',
+    FILE_UPLOAD_DIGEST_WINDOW=60
+)
+@patch('files.tasks.extract_file_content.delay')
+class UploadDigestTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        RecordingBackend.opened = 0
+        RecordingBackend.sent = []
+        RecordingBackend.delivered = []
+        RecordingBackend.errors = {}
+        self.redis = fakeredis.FakeRedis()
+        patcher = patch('files.notifications.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        for email in ('admin1@example.com', 'admin2@example.com'):
+            User.objects.create_user(email=email, password='testpass123', is_staff=True)
+
+    def upload(self, name):
+        return File.objects.create(
+            file=SimpleUploadedFile(name, b'content'),
+            original_filename=name,
+            file_type=File.FileType.DOCX,
+            uploaded_by=self.user
+        )
+
+    @patch('files.tasks.send_file_upload_notification.delay')
+    @patch('files.tasks.send_upload_digest.apply_async')
+    def test_bulk_upload_schedules_one_digest(self, mock_digest, mock_notify,
+                                              mock_extract):
+        """Test that a burst of uploads schedules one digest and no single notices."""
+        for i in range(20):
+            notify_admins_of_upload(self.upload(f'report{i}.docx'))
+
+        mock_digest.assert_called_once_with(countdown=60)
+        mock_notify.assert_not_called()
+        self.assertEqual(self.redis.llen(DIGEST_KEY), 20)
+
+    @patch('files.tasks.send_upload_digest.apply_async')
+    def test_one_email_per_recipient_per_window(self, mock_digest, mock_extract):
+        """Test that each staff user gets one email listing every file of the window."""
+        files = [self.upload(f'report{i}.docx') for i in range(3)]
+        for file_obj in files:
+            add_to_digest(file_obj.pk)
+
+        send_upload_digest.apply()
+
+        self.assertEqual(
+            sorted(RecordingBackend.sent), ['admin1@example.com', 'admin2@example.com']
+        )
+        for message in RecordingBackend.delivered:
+            for file_obj in files:
+                self.assertIn(file_obj.original_filename, message.body)
+        self.assertEqual(self.redis.llen(DIGEST_KEY), 0)
+
+        # The next upload opens a new window
+        add_to_digest(self.upload('later.docx').pk)
+        self.assertEqual(mock_digest.call_count, 2)
+
+    def test_retry_keeps_files_and_failed_recipients(self, mock_extract):
+        """Test that a retried digest lists the same files for the failed recipients."""
+        file_obj = self.upload('report.docx')
+        with patch('files.tasks.send_upload_digest.apply_async'):
+            add_to_digest(file_obj.pk)
+        RecordingBackend.errors = {
+            'admin2@example.com': smtplib.SMTPServerDisconnected('gone')
+        }
+
+        with patch.object(send_upload_digest, 'retry') as mock_retry:
+            send_upload_digest.apply()
+
+        mock_retry.assert_called_once_with(
+            args=([str(file_obj.pk)], ['admin2@example.com']), countdown=300
+        )
+
+    @patch('files.tasks.send_file_upload_notification.delay')
+    def test_unreachable_redis_notifies_immediately(self, mock_notify, mock_extract):
+        """Test that uploads are still announced when the digest can't be kept."""
+        file_obj = self.upload('report.docx')
+
+        with patch.object(self.redis, 'pipeline', side_effect=redis.ConnectionError):
+            notify_admins_of_upload(file_obj)
+
+        mock_notify.assert_called_once()
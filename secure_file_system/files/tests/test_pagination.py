@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import User
+from files.models import File
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.ops_user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        access = RefreshToken.for_user(self.ops_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.now = timezone.now()
+        files = File.objects.bulk_create([
+            File(
+                file=f'files/{index}.docx',
+                original_filename=f'{index}.docx',
+                file_type='DOCX',
+                file_size=1,
+                uploaded_by=self.ops_user
+            )
+            for index in range(25)
+        ])
+        # Pairs of files share a timestamp, so the id has to break ties
+        for index, file_obj in enumerate(files):
+            File.objects.filter(pk=file_obj.pk).update(
+                created_at=self.now - timedelta(minutes=index // 2)
+            )
+        self.url = reverse('files:file_list')
+
+    def expected_ids(self):
+        ordered = File.objects.order_by('-created_at', '-id')
+        return [str(pk) for pk in ordered.values_list('id', flat=True)]
+
+    def walk(self, url, direction='next'):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            page = [item['id'] for item in response.data['results']]
+            seen = seen + page if direction == 'next' else page + seen
+            url = response.data[direction]
+        return seen, response
+
+    def test_cursor_walk_is_complete_and_ordered(self):
+        """Test that following next links visits every file once, newest first."""
+        seen, response = self.walk(f'{self.url}?cursor=&page_size=4')
+
+        self.assertEqual(seen, self.expected_ids())
+        self.assertNotIn('count', response.data)
+
+        # And previous links lead all the way back from the last page
+        last_page = [item['id'] for item in response.data['results']]
+        earlier, _ = self.walk(response.data['previous'], direction='previous')
+        self.assertEqual(earlier + last_page, self.expected_ids())
+
+    def test_new_uploads_do_not_shift_pages(self):
+        """Test that files created mid-walk don't cause repeats on later pages."""
+        response = self.client.get(f'{self.url}?cursor=&page_size=5')
+        first_page = [item['id'] for item in response.data['results']]
+
+        File.objects.bulk_create([File(
+            file='files/new.docx',
+            original_filename='new.docx',
+            file_type='DOCX',
+            file_size=1,
+            uploaded_by=self.ops_user
+        )])
+        rest, _ = self.walk(response.data['next'])
+
+        self.assertEqual(first_page + rest, self.expected_ids()[1:])
+
+    def test_count_is_optional(self):
+        """Test that cursor mode only counts when asked and page mode still counts."""
+        response = self.client.get(f'{self.url}?cursor=&count=exact')
+        self.assertEqual(response.data['count'], 25)
+
+        # PostgreSQL estimates from table statistics, so bring them up to date
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {File._meta.db_table}')
+        response = self.client.get(f'{self.url}?cursor=&count=estimate')
+        self.assertAlmostEqual(response.data['count'], 25, delta=5)
+
+        response = self.client.get(f'{self.url}?page=2')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_cursor(self):
+        """Test that a garbled cursor is rejected."""
+        response = self.client.get(f'{self.url}?cursor=not-a-cursor')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
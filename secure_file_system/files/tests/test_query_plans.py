@@ -0,0 +1,120 @@
+import unittest
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from authentication.models import User
+from files.models import File, FileShareLink
+
+ROWS = 1_000_000
+USERS = 500
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql', 'Query plans are checked against PostgreSQL'
+)
+class QueryPlanTests(TestCase):
+    """
+    Check that the hot list and lookup queries use the indexes added for them
+    once the tables are big enough for the planner to care.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([
+            User(email=f'user{index}@example.com', user_type=User.UserType.OPERATIONS)
+            for index in range(USERS)
+        ])
+        cls.user = users[0]
+        user_ids = [str(user.id) for user in users]
+
+        with connection.cursor() as cursor:
+            # Spread a million files over the users and the last ~11 days,
+            # with 1% of them PowerPoint, then add a million share links, a
+            # hundred for each of the first 10,000 files. 10% of links are
+            # active and a few of those have just expired, as they would
+            # between cleanup runs
+            cursor.execute(
+                f"""
+                INSERT INTO {File._meta.db_table} (
+                    id, file, original_filename, file_type, file_size, content_hash,
+                    uploaded_by_id, created_at, updated_at, description, is_public
+                )
+                SELECT md5('file' || i)::uuid, 'files/' || i || '.docx',
+                       'file-' || i || '.docx',
+                       CASE WHEN i %% 100 = 0 THEN 'PPTX'
+                            WHEN i %% 2 = 0 THEN 'DOCX'
+                            ELSE 'XLSX' END,
+                       1024, '',
+                       (%s::uuid[])[1 + i %% %s], now() - i * interval '1 second',
+                       now(), '', false
+                FROM generate_series(1, %s) AS i
+                """,
+                [user_ids, USERS, ROWS]
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {FileShareLink._meta.db_table} (
+                    id, file_id, token, created_by_id, created_at, expires_at,
+                    is_active, download_count
+                )
+                SELECT md5('link' || i)::uuid, md5('file' || (1 + i %% 10000))::uuid,
+                       md5('token' || i)::uuid,
+                       (%s::uuid[])[1 + i %% %s], now(),
+                       CASE WHEN i %% 1000 = 0 THEN now() - interval '1 day'
+                            ELSE now() + (1 + i %% 30) * interval '1 day' END,
+                       i %% 10 = 0, 0
+                FROM generate_series(1, %s) AS i
+                """,
+                [user_ids, USERS, ROWS]
+            )
+            cursor.execute(
+                f'ANALYZE {File._meta.db_table}, {FileShareLink._meta.db_table}'
+            )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=plan)
+
+    def test_own_files_newest_first(self):
+        """Test that a user's file list is read from the uploader/created index."""
+        queryset = File.objects.filter(
+            uploaded_by=self.user,
+            created_at__gte=timezone.now() - timedelta(days=3)
+        ).order_by('-created_at')[:10]
+
+        self.assertUsesIndex(queryset, 'file_uploader_created_idx')
+
+    def test_files_by_type_newest_first(self):
+        """Test that filtering on a rare file type reads the type/created index."""
+        queryset = File.objects.filter(file_type='PPTX').order_by('-created_at')[:10]
+
+        self.assertUsesIndex(queryset, 'file_type_created_idx')
+
+    def test_all_files_newest_first(self):
+        """Test that the unfiltered list is read from the created index."""
+        queryset = File.objects.order_by('-created_at')[:10]
+
+        self.assertUsesIndex(queryset, 'file_created_idx')
+
+    def test_expired_active_links(self):
+        """Test that finding active links past their expiry uses the partial index."""
+        queryset = FileShareLink.objects.filter(
+            is_active=True, expires_at__lt=timezone.now()
+        )
+
+        self.assertUsesIndex(queryset.values('id'), 'sharelink_active_expiry_idx')
+
+    def test_download_token_lookup(self):
+        """Test that the download view's link lookup uses the unique token index."""
+        link = FileShareLink.objects.filter(is_active=True).first()
+        queryset = FileShareLink.objects.filter(
+            token=link.token,
+            file_id=link.file_id,
+            is_active=True,
+            expires_at__gt=timezone.now()
+        )
+
+        self.assertUsesIndex(queryset, 'token_key')
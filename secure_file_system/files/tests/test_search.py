@@ -0,0 +1,123 @@
+import unittest
+
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import User
+from files.models import File
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql',
+    'Search uses PostgreSQL full-text and trigram matching'
+)
+class FileSearchTests(APITestCase):
+    def setUp(self):
+        self.ops_user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        access = RefreshToken.for_user(self.ops_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def make_file(self, original_filename, description=''):
+        # bulk_create skips File.save(), which needs the file on disk; the
+        # search vector comes from the database trigger either way
+        return File.objects.bulk_create([File(
+            file=f'files/{original_filename}',
+            original_filename=original_filename,
+            file_type='DOCX',
+            file_size=1,
+            description=description,
+            uploaded_by=self.ops_user
+        )])[0]
+
+    def search(self, query):
+        response = self.client.get(reverse('files:file_search'), {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_filename_matches_rank_above_description_matches(self):
+        """Test that a match in the filename outranks one in the description."""
+        self.make_file('minutes.docx', 'Budget discussed at length')
+        self.make_file('Q3_budget-final.xlsx', 'Spreadsheet')
+        self.make_file('holiday.docx', 'Nothing relevant')
+
+        results = self.search('budget')
+
+        self.assertEqual(
+            [item['file_name'] for item in results],
+            ['Q3_budget-final.xlsx', 'minutes.docx']
+        )
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+    def test_pages_follow_rank(self):
+        """Test that paging through matches continues in relevance order."""
+        self.make_file('budget.docx')
+        self.make_file('budget-draft.docx')
+        self.make_file('minutes.docx', 'Budget discussed at length')
+        url = reverse('files:file_search')
+
+        expected = [item['file_name'] for item in self.search('budget')]
+        first = self.client.get(url, {'q': 'budget', 'page_size': 2})
+        second = self.client.get(first.data['next'])
+
+        results = first.data['results'] + second.data['results']
+        self.assertEqual([item['file_name'] for item in results], expected)
+        self.assertEqual(expected[-1], 'minutes.docx')
+
+        # Asking for a cursor doesn't trade relevance for date order
+        response = self.client.get(url, {'q': 'budget', 'cursor': ''})
+        results = response.data['results']
+        self.assertEqual([item['file_name'] for item in results], expected)
+
+    def test_words_are_stemmed(self):
+        """Test that different forms of a word find each other."""
+        self.make_file('notes.docx', 'Reviewing the quarterly reports')
+
+        self.assertEqual(len(self.search('report')), 1)
+
+    def test_filename_substring_match(self):
+        """Test that part of a filename still matches, as before."""
+        self.make_file('ACME-contract.docx')
+
+        results = self.search('cme-con')
+        self.assertEqual(
+            [item['file_name'] for item in results], ['ACME-contract.docx']
+        )
+
+    def test_headline_highlights_matches_and_escapes_html(self):
+        """Test that snippets mark matched words and escape the rest."""
+        self.make_file('notes.docx', 'Invoice sent to the R&D client')
+
+        headline = self.search('invoice')[0]['headline']
+
+        self.assertIn('<mark>Invoice</mark>', headline)
+        self.assertIn('R&amp;D', headline)
+
+    def test_vector_follows_updates(self):
+        """Test that the trigger refreshes the vector when the description changes."""
+        file_obj = self.make_file('notes.docx', 'Old words')
+        File.objects.filter(pk=file_obj.pk).update(description='Fresh content')
+
+        self.assertEqual(len(self.search('fresh')), 1)
+        self.assertEqual(len(self.search('old')), 0)
+
+    def test_non_operations_users_only_find_their_own_files(self):
+        """Test that search is limited to the user's own files."""
+        self.make_file('budget.xlsx')
+        client_user = User.objects.create_user(
+            email='client@example.com',
+            password='testpass123',
+            user_type=User.UserType.CLIENT,
+            is_verified=True
+        )
+        access = RefreshToken.for_user(client_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        self.assertEqual(self.search('budget'), [])
@@ -0,0 +1,182 @@
+import hashlib
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+import fakeredis
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import User
+from files.models import File, FileShareLink
+from files.share_link_cache import cache_key, get_share_link
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ShareLinkCacheTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        # Download log entries are buffered in Redis rather than written
+        patcher = patch(
+            'files.download_log.get_redis', return_value=fakeredis.FakeRedis()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(caches['hot'].clear)
+        self.ops_user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        self.content = b'This is a test file content'
+        self.file_obj = File.objects.create(
+            file=SimpleUploadedFile('report.docx', self.content),
+            original_filename='report.docx',
+            file_type='DOCX',
+            file_size=len(self.content),
+            content_hash=hashlib.sha256(self.content).hexdigest(),
+            uploaded_by=self.ops_user
+        )
+        self.share_link = FileShareLink.objects.create(
+            file=self.file_obj,
+            created_by=self.ops_user,
+            expires_at=timezone.now() + timedelta(days=1)
+        )
+        self.addCleanup(caches['hot'].delete, cache_key(self.share_link.token))
+        self.url = reverse(
+            'files:secure_file_download', kwargs={'id': str(self.file_obj.id)}
+        )
+
+    def download(self):
+        response = self.client.get(self.url, {'token': str(self.share_link.token)})
+        if response.status_code == status.HTTP_200_OK:
+            self.assertEqual(b''.join(response.streaming_content), self.content)
+        return response
+
+    def test_repeat_download_only_counts(self):
+        """Test that a repeat download runs the counter update and no SELECTs."""
+        self.download()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.download()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE'))
+        self.share_link.refresh_from_db()
+        self.assertEqual(self.share_link.download_count, 2)
+
+    def test_cached_link_has_what_a_download_needs(self):
+        """Test that the cached link and file carry the path, size and validators."""
+        get_share_link(str(self.share_link.token))
+
+        with self.assertNumQueries(0):
+            share_link = get_share_link(str(self.share_link.token))
+            file_obj = share_link.file
+            self.assertEqual(file_obj.file.path, self.file_obj.file.path)
+            self.assertEqual(file_obj.file_size, len(self.content))
+            self.assertEqual(file_obj.content_hash, self.file_obj.content_hash)
+            self.assertEqual(share_link.expires_at, self.share_link.expires_at)
+            self.assertEqual(share_link.file_id, self.file_obj.id)
+
+    def test_deactivated_link_is_refused(self):
+        """Test that deactivating a link takes effect despite the cached entry."""
+        self.download()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.share_link.is_active = False
+            self.share_link.save()
+
+        self.assertEqual(self.download().status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stale_entry_cannot_count_a_download(self):
+        """Test that a link deactivated behind the cache's back is refused."""
+        self.download()
+        FileShareLink.objects.filter(pk=self.share_link.pk).update(is_active=False)
+
+        self.assertEqual(self.download().status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIsNone(caches['hot'].get(cache_key(self.share_link.token)))
+
+    def test_extended_link_is_reread(self):
+        """Test that extending a link replaces its cached expiry."""
+        get_share_link(str(self.share_link.token))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.share_link.expires_at += timedelta(days=7)
+            self.share_link.save()
+
+        cached = get_share_link(str(self.share_link.token))
+        self.assertEqual(cached.expires_at, self.share_link.expires_at)
+
+    def test_deleted_link_is_forgotten(self):
+        """Test that a deleted link's entry is dropped."""
+        get_share_link(str(self.share_link.token))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.file_obj.delete()
+
+        with self.assertRaises(FileShareLink.DoesNotExist):
+            get_share_link(str(self.share_link.token))
+
+    def test_exhausted_link_is_forgotten(self):
+        """Test that a link is dropped from the cache once it refuses a download."""
+        self.share_link.max_downloads = 2
+        self.share_link.save()
+
+        self.assertEqual(self.download().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.download().status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(caches['hot'].get(cache_key(self.share_link.token)))
+        self.assertEqual(self.download().status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIsNone(caches['hot'].get(cache_key(self.share_link.token)))
+
+    def test_token_for_another_file_is_refused(self):
+        """Test that a cached link can't be used to download a different file."""
+        other = File.objects.create(
+            file=SimpleUploadedFile('other.docx', b'other'),
+            original_filename='other.docx',
+            file_type='DOCX',
+            uploaded_by=self.ops_user
+        )
+        self.download()
+
+        response = self.client.get(
+            reverse('files:secure_file_download', kwargs={'id': str(other.id)}),
+            {'token': str(self.share_link.token)}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_entry_never_outlives_the_link(self):
+        """Test that a link about to expire is cached only until it does."""
+        self.share_link.expires_at = timezone.now() + timedelta(seconds=30)
+        self.share_link.save()
+
+        get_share_link(str(self.share_link.token))
+
+        ttl = caches['default']._cache.get_client().ttl(
+            caches['default'].make_key(cache_key(self.share_link.token))
+        )
+        self.assertLessEqual(ttl, 30)
+
+    def test_public_route_downloads_by_token(self):
+        """Test that the share link route serves and counts the download."""
+        url = reverse('files:public_file_download', args=[self.share_link.token])
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.share_link.refresh_from_db()
+        self.assertEqual(self.share_link.download_count, 1)
@@ -0,0 +1,101 @@
+import hashlib
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+import fakeredis
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from authentication.models import User
+from files.models import File, FileShareLink
+from files.share_link_cleanup import LOCK_KEY, cleanup_share_links
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, SHARE_LINK_RETENTION_DAYS=30)
+@patch('files.tasks.extract_file_content.delay')
+class ShareLinkCleanupTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = patch('files.share_link_cleanup.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.now = timezone.now()
+        self.user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        self.file_obj = File.objects.create(
+            file=SimpleUploadedFile('report.docx', b'content'),
+            original_filename='report.docx',
+            file_type=File.FileType.DOCX,
+            content_hash=hashlib.sha256(b'content').hexdigest(),
+            uploaded_by=self.user
+        )
+
+    def link(self, expires_in_days, **fields):
+        return FileShareLink.objects.create(
+            file=self.file_obj,
+            created_by=self.user,
+            expires_at=self.now + timedelta(days=expires_in_days),
+            **fields
+        )
+
+    def test_deactivates_expired_and_exhausted_links(self, mock_extract):
+        """Test that links that can't be used any more are deactivated, in batches."""
+        expired = [self.link(-1) for _ in range(5)]
+        exhausted = [self.link(1, max_downloads=2, download_count=2) for _ in range(3)]
+        usable = [self.link(1), self.link(1, max_downloads=2, download_count=1)]
+
+        result = cleanup_share_links(now=self.now, batch_size=2)
+
+        self.assertEqual(result['deactivated'], 8)
+        self.assertEqual(result['deleted'], 0)
+        self.assertGreaterEqual(result['seconds'], 0)
+        inactive = set(
+            FileShareLink.objects.filter(is_active=False).values_list('pk', flat=True)
+        )
+        self.assertEqual(inactive, {link.pk for link in expired + exhausted})
+        self.assertFalse(inactive & {link.pk for link in usable})
+
+    def test_deletes_links_past_retention(self, mock_extract):
+        """Test that links expired for longer than retention are deleted."""
+        old = [self.link(-31, is_active=False) for _ in range(3)]
+        # Never deactivated, but just as far past retention
+        old.append(self.link(-40))
+        recent = self.link(-29, is_active=False)
+
+        result = cleanup_share_links(now=self.now, batch_size=2)
+
+        self.assertEqual(result['deleted'], 4)
+        old_pks = [link.pk for link in old]
+        self.assertFalse(FileShareLink.objects.filter(pk__in=old_pks).exists())
+        self.assertTrue(FileShareLink.objects.filter(pk=recent.pk).exists())
+
+    def test_skips_while_another_run_holds_the_lock(self, mock_extract):
+        """Test that a second scheduler doesn't clean up at the same time."""
+        expired = self.link(-1)
+        self.redis.set(LOCK_KEY, 'another-run')
+
+        self.assertIsNone(cleanup_share_links(now=self.now))
+
+        expired.refresh_from_db()
+        self.assertTrue(expired.is_active)
+
+    def test_releases_lock(self, mock_extract):
+        """Test that the lock is released after a run."""
+        cleanup_share_links(now=self.now)
+
+        self.assertFalse(self.redis.exists(LOCK_KEY))
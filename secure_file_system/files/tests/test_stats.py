@@ -0,0 +1,158 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+import fakeredis
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from authentication.models import User
+from files.download_log import buffer_entry, flush
+from files.models import DailyStats, DownloadLog, File, SiteStats
+from files.stats import get_stats, reconcile
+from files.tests.test_download_log import log_entry
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@patch('files.tasks.extract_file_content.delay')
+class SiteStatsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        reconcile()
+
+    def upload(self, size):
+        with self.captureOnCommitCallbacks(execute=True):
+            return File.objects.create(
+                file=SimpleUploadedFile('report.docx', b'x' * size),
+                original_filename='report.docx',
+                file_type=File.FileType.DOCX,
+                uploaded_by=self.user
+            )
+
+    def test_counts_follow_uploads_and_deletes(self, mock_extract):
+        """Test that the totals move with each upload and delete without recounting."""
+        first = self.upload(100)
+        self.upload(50)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        stats = get_stats()
+        self.assertEqual(stats.file_count, 1)
+        self.assertEqual(stats.storage_bytes, 50)
+
+    def test_counts_follow_users(self, mock_extract):
+        """Test that new and deleted users are counted, including this week's."""
+        with self.captureOnCommitCallbacks(execute=True):
+            client = User.objects.create_user(
+                email='client@example.com', password='testpass123'
+            )
+
+        stats = get_stats()
+        self.assertEqual((stats.user_count, stats.new_users_this_week), (2, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.delete()
+        stats = get_stats()
+        self.assertEqual((stats.user_count, stats.new_users_this_week), (1, 1))
+
+    def test_rolled_back_upload_is_not_counted(self, mock_extract):
+        """Test that counters only move when the change commits."""
+        with self.captureOnCommitCallbacks(execute=False):
+            File.objects.create(
+                file=SimpleUploadedFile('report.docx', b'x'),
+                original_filename='report.docx',
+                file_type=File.FileType.DOCX,
+                uploaded_by=self.user
+            )
+
+        self.assertEqual(get_stats().file_count, 0)
+
+    def test_flushed_downloads_are_counted(self, mock_extract):
+        """Test that each flushed batch adds its downloads."""
+        redis_client = fakeredis.FakeRedis()
+        with patch('files.download_log.get_redis', return_value=redis_client):
+            for _ in range(3):
+                buffer_entry(log_entry())
+            with self.captureOnCommitCallbacks(execute=True):
+                flush()
+
+        stats = get_stats()
+        self.assertEqual((stats.download_count, stats.downloads_this_week), (3, 3))
+
+    def test_reconcile_corrects_drift(self, mock_extract):
+        """Test that reconciliation recounts the tables and ages out last week."""
+        self.upload(100)
+        today = timezone.localdate()
+        DailyStats.objects.create(day=today - timedelta(days=7), downloads=5)
+        DailyStats.objects.create(day=today - timedelta(days=6), downloads=2)
+        DailyStats.objects.filter(day=today).update(downloads=1)
+        SiteStats.objects.update(file_count=42, user_count=0, download_count=0)
+
+        stats = reconcile()
+
+        self.assertEqual(stats.file_count, 1)
+        self.assertEqual(stats.storage_bytes, 100)
+        self.assertEqual(stats.user_count, 1)
+        self.assertEqual((stats.download_count, stats.downloads_this_week), (8, 3))
+
+    def test_reconcile_leaves_the_download_log_alone(self, mock_extract):
+        """Test that reconciliation doesn't count the partitioned download log."""
+        DownloadLog.objects.create(**log_entry())
+
+        stats = reconcile()
+
+        self.assertEqual(stats.download_count, 0)
+
+    @patch('files.tasks.reconcile_site_stats.delay')
+    def test_first_read_queues_a_count(self, mock_reconcile, mock_extract):
+        """Test that unreconciled statistics are queued, not counted inline."""
+        SiteStats.objects.all().delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = get_stats()
+
+        self.assertEqual((stats.user_count, stats.reconciled_at), (0, None))
+        self.assertFalse(SiteStats.objects.exists())
+        mock_reconcile.assert_called_once_with()
+
+    def test_reading_is_one_query(self, mock_extract):
+        """Test that the dashboard reads a single row however much data there is."""
+        self.upload(10)
+
+        with self.assertNumQueries(1):
+            get_stats()
+
+    def test_daily_totals(self, mock_extract):
+        """Test that uploads, sign-ups and downloads land on the day they happened."""
+        self.upload(100)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(email='client@example.com', password='testpass123')
+        yesterday = timezone.now() - timedelta(days=1)
+        with patch('files.download_log.get_redis', return_value=fakeredis.FakeRedis()):
+            buffer_entry(log_entry(bytes_sent=10))
+            buffer_entry(log_entry(bytes_sent=20))
+            buffer_entry(log_entry(bytes_sent=40, downloaded_at=yesterday.isoformat()))
+            with self.captureOnCommitCallbacks(execute=True):
+                flush()
+
+        today = DailyStats.objects.get(day=timezone.localdate())
+        self.assertEqual(
+            (today.uploads, today.bytes_uploaded, today.new_users), (1, 100, 1)
+        )
+        self.assertEqual((today.downloads, today.bytes_served), (2, 30))
+        earlier = DailyStats.objects.get(day=timezone.localdate(yesterday))
+        self.assertEqual((earlier.downloads, earlier.bytes_served), (1, 40))
@@ -0,0 +1,98 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import MemoryFileUploadHandler
+from django.test import RequestFactory, TestCase, override_settings
+
+from authentication.models import User
+from files.upload_handlers import (
+    OOXMLSniffer,
+    StoredUploadedFile,
+    StreamingFileUploadHandler,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_ooxml(part_dir, size=0):
+    # Build a minimal OOXML-shaped zip, optionally padded with incompressible data
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('_rels/.rels', '<Relationships/>')
+        archive.writestr(f'{part_dir}/document.xml', os.urandom(size))
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class StreamingFileUploadHandlerTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+
+    def parse(self, filename, content, max_size=None):
+        request = RequestFactory().post(
+            '/upload/',
+            {'file': SimpleUploadedFile(filename, content), 'description': 'Test file'}
+        )
+        request.user = self.user
+        handler = StreamingFileUploadHandler(request, max_size=max_size)
+        request.upload_handlers = [handler, MemoryFileUploadHandler(request)]
+        return request.FILES.get('file'), handler
+
+    def test_streams_file_to_final_location(self):
+        """Test that the file is written to storage with size, hash and type."""
+        content = make_ooxml('xl', size=300 * 1024)
+        uploaded, handler = self.parse('report.xlsx', content)
+
+        self.assertIsInstance(uploaded, StoredUploadedFile)
+        self.assertTrue(uploaded.storage_name.startswith(f'user_{self.user.id}/'))
+        self.assertEqual(uploaded.size, len(content))
+        self.assertEqual(uploaded.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(uploaded.ooxml_type, 'XLSX')
+        with open(os.path.join(MEDIA_ROOT, uploaded.storage_name), 'rb') as stored:
+            self.assertEqual(stored.read(), content)
+        uploaded.discard()
+
+    def test_oversized_upload_is_removed(self):
+        """Test that an upload over the size limit is skipped and cleaned up."""
+        uploaded, handler = self.parse(
+            'big.docx', make_ooxml('word', size=256 * 1024), max_size=128 * 1024
+        )
+
+        self.assertIsNone(uploaded)
+        self.assertTrue(handler.size_exceeded)
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, handler.storage_name)))
+
+    def test_other_extensions_fall_through(self):
+        """Test that files the handler doesn't stream go to the next handler."""
+        uploaded, handler = self.parse('notes.txt', b'plain text')
+
+        self.assertNotIsInstance(uploaded, StoredUploadedFile)
+        self.assertEqual(uploaded.read(), b'plain text')
+
+
+class OOXMLSnifferTests(TestCase):
+    def test_detects_type_across_chunk_boundaries(self):
+        """Test that a part name split between two chunks is still detected."""
+        content = make_ooxml('ppt')
+        offset = content.index(b'ppt/') - 3
+        sniffer = OOXMLSniffer()
+        sniffer.feed(content[:offset])
+        self.assertIsNone(sniffer.file_type)
+        sniffer.feed(content[offset:])
+        self.assertEqual(sniffer.file_type, 'PPTX')
@@ -0,0 +1,239 @@
+import fcntl
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from unittest.mock import patch
+
+import fakeredis
+from django.db import DatabaseError
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import User
+from files.models import Blob, File
+from files.upload_sessions import (
+    UploadSession,
+    UploadSessionConflict,
+    cleanup_expired_sessions,
+    staging_name
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CHUNK_SIZE = 1024
+
+
+def make_docx(size):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('word/document.xml', os.urandom(size))
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, UPLOAD_SESSION_CHUNK_SIZE=CHUNK_SIZE)
+class UploadSessionTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = patch('files.upload_sessions.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.ops_user = User.objects.create_user(
+            email='ops@example.com',
+            password='testpass123',
+            user_type=User.UserType.OPERATIONS,
+            is_verified=True
+        )
+        access = RefreshToken.for_user(self.ops_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.content = make_docx(5 * CHUNK_SIZE)
+
+    def open_session(self, **extra):
+        response = self.client.post(
+            reverse('files:upload_session_list'),
+            {'file_name': 'report.docx', 'file_size': len(self.content), **extra},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def put_chunk(self, session_id, index):
+        body = self.content[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+        return self.client.generic(
+            'PUT',
+            reverse(
+                'files:upload_session_chunk',
+                kwargs={'session_id': session_id, 'index': index}
+            ),
+            body,
+            content_type='application/octet-stream'
+        )
+
+    @patch('files.tasks.send_file_upload_notification.delay')
+    def test_chunks_in_any_order_then_commit(self, mock_notification):
+        """Test that chunks can arrive out of order and commit creates the file."""
+        session = self.open_session()
+        indexes = list(reversed(range(session['total_chunks'])))
+
+        for index in indexes[:-1]:
+            response = self.put_chunk(session['id'], index)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Only the chunk that wasn't sent needs resending
+        response = self.client.get(reverse(
+            'files:upload_session_detail', kwargs={'session_id': session['id']}
+        ))
+        self.assertEqual(response.data['missing_chunks'], [indexes[-1]])
+
+        commit_url = reverse(
+            'files:upload_session_commit', kwargs={'session_id': session['id']}
+        )
+        response = self.client.post(commit_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.put_chunk(session['id'], indexes[-1])
+        response = self.client.post(
+            commit_url,
+            {'sha256': hashlib.sha256(self.content).hexdigest()},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        file_obj = File.objects.get()
+        self.assertEqual(file_obj.file_size, len(self.content))
+        self.assertEqual(
+            file_obj.content_hash, hashlib.sha256(self.content).hexdigest()
+        )
+        with file_obj.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertEqual(self.redis.keys('upload_session:*'), [])
+
+    @patch('files.tasks.send_file_upload_notification.delay')
+    def test_commit_can_be_retried_after_a_rollback(self, mock_notification):
+        """Test that a commit failing after the blob is stored can be retried."""
+        session = self.open_session()
+        for index in range(session['total_chunks']):
+            self.put_chunk(session['id'], index)
+        commit_url = reverse(
+            'files:upload_session_commit', kwargs={'session_id': session['id']}
+        )
+
+        lost = DatabaseError('connection lost')
+        with patch.object(File.objects, 'create', side_effect=lost):
+            with self.assertRaises(DatabaseError):
+                self.client.post(commit_url, format='json')
+
+        self.assertFalse(Blob.objects.exists())
+        staging_path = os.path.join(MEDIA_ROOT, staging_name(session['id']))
+        self.assertTrue(os.path.exists(staging_path))
+
+        response = self.client.post(commit_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with File.objects.get().file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+
+    def test_chunks_are_refused_while_committing(self):
+        """Test that no chunk is taken once a commit has started."""
+        session = self.open_session()
+        self.redis.hset(f"upload_session:{session['id']}", 'committing', '1')
+
+        response = self.put_chunk(session['id'], 0)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.redis.scard(f"upload_session:{session['id']}:chunks"), 0)
+
+    @patch('files.tasks.send_file_upload_notification.delay')
+    def test_chunk_racing_a_commit_leaves_the_blob_alone(self, mock_notification):
+        """Test that a chunk opened before a commit can't write into the blob."""
+        session = self.open_session()
+        session_id = session['id']
+        for index in range(session['total_chunks']):
+            self.put_chunk(session_id, index)
+        writer = UploadSession.load(session_id, self.ops_user)
+        flock = fcntl.flock
+
+        def commit_first(fd, operation):
+            # The commit wins the race between the writer's open and its lock
+            if operation == fcntl.LOCK_SH and not File.objects.exists():
+                UploadSession.load(session_id, self.ops_user).commit(self.ops_user)
+            flock(fd, operation)
+
+        with patch('files.upload_sessions.fcntl.flock', side_effect=commit_first):
+            with self.assertRaises(UploadSessionConflict):
+                writer.write_chunk(0, io.BytesIO(b'x' * CHUNK_SIZE), CHUNK_SIZE)
+
+        with File.objects.get().file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+
+    def test_chunk_with_wrong_length_is_rejected(self):
+        """Test that a truncated chunk is not marked as received."""
+        session = self.open_session()
+        response = self.client.generic(
+            'PUT',
+            reverse(
+                'files:upload_session_chunk',
+                kwargs={'session_id': session['id'], 'index': 0}
+            ),
+            b'short',
+            content_type='application/octet-stream'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.redis.scard(f"upload_session:{session['id']}:chunks"), 0)
+
+    def test_size_limit_matches_single_shot_uploads(self):
+        """Test that sessions are held to MAX_UPLOAD_SIZE like single-shot uploads."""
+        with override_settings(MAX_UPLOAD_SIZE=len(self.content) - 1):
+            response = self.client.post(
+                reverse('files:upload_session_list'),
+                {'file_name': 'report.docx', 'file_size': len(self.content)},
+                format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file_size', response.data)
+
+    def test_cleanup_removes_abandoned_sessions(self):
+        """Test that expired sessions lose their state and staging file."""
+        session = self.open_session()
+        self.put_chunk(session['id'], 0)
+        staging_path = os.path.join(MEDIA_ROOT, staging_name(session['id']))
+        self.assertTrue(os.path.exists(staging_path))
+
+        self.assertEqual(cleanup_expired_sessions(), 0)
+        two_days_later = time.time() + 2 * 24 * 60 * 60
+        self.assertEqual(cleanup_expired_sessions(now=two_days_later), 1)
+        self.assertFalse(os.path.exists(staging_path))
+        self.assertEqual(self.redis.zcard('upload_sessions:expiry'), 0)
+
+    @patch('files.tasks.send_file_upload_notification.delay')
+    def test_known_content_still_has_to_be_uploaded(self, mock_notification):
+        """Test that a claimed hash creates no file; only uploaded bytes are matched."""
+        for name in ('report.docx', 'copy.docx'):
+            session = self.open_session(
+                file_name=name, sha256=hashlib.sha256(self.content).hexdigest()
+            )
+            self.assertNotIn('deduplicated', session)
+            for index in range(session['total_chunks']):
+                self.put_chunk(session['id'], index)
+            commit_url = reverse(
+                'files:upload_session_commit', kwargs={'session_id': session['id']}
+            )
+            response = self.client.post(commit_url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertNotIn('file', response.data)
+
+        self.assertEqual(File.objects.count(), 2)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
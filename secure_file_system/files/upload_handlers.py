@@ -0,0 +1,194 @@
+"""
+Upload handlers for the files app.
+
+``StreamingFileUploadHandler`` writes multipart file chunks straight to their
+final storage location as they arrive, so an upload never sits in worker memory
+or gets spooled to a temporary file and copied a second time. Size, SHA-256 and
+the OOXML document type are computed in the same pass.
+"""
+import hashlib
+import logging
+import os
+import re
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    SkipFile,
+    StopFutureHandlers,
+)
+
+logger = logging.getLogger(__name__)
+
+# A zip local file header is 30 bytes followed by the entry name. The first
+# entry under word/, xl/ or ppt/ tells us which OOXML document we have.
+OOXML_PART_RE = re.compile(rb'PK\x03\x04.{26}(word|xl|ppt)/', re.DOTALL)
+OOXML_PART_TYPES = {
+    b'word': 'DOCX',
+    b'xl': 'XLSX',
+    b'ppt': 'PPTX',
+}
+EXTENSION_TYPES = {
+    '.docx': 'DOCX',
+    '.xlsx': 'XLSX',
+    '.pptx': 'PPTX',
+}
+
+
+def max_upload_size() -> int:
+    """Largest file accepted, in bytes, by single-shot and resumable uploads alike."""
+    return getattr(settings, 'MAX_UPLOAD_SIZE', 50 * 1024 * 1024)  # 50MB default
+
+
+def sha256_of(file_obj: Any) -> str:
+    """Return the hex SHA-256 digest of a Django ``File``, read chunk by chunk."""
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OOXMLSniffer:
+    """Incrementally detect the OOXML type from a stream of zip bytes."""
+    # Enough to hold a local file header plus the longest prefix we look for.
+    carry_size = 36
+
+    def __init__(self) -> None:
+        self.file_type: Optional[str] = None
+        self._tail = b''
+
+    def feed(self, data: bytes) -> None:
+        if self.file_type:
+            return
+        window = self._tail + data
+        match = OOXML_PART_RE.search(window)
+        if match:
+            self.file_type = OOXML_PART_TYPES[match.group(1)]
+        self._tail = window[-self.carry_size:]
+
+
+class StoredUploadedFile(UploadedFile):
+    """
+    An uploaded file whose content has already been written to storage.
+
+    ``storage_name`` is the name of the file within ``storage``; pass it to a
+    ``FileField`` instead of the file object to avoid copying it again.
+    """
+
+    def __init__(self, file: Any, storage: Any, storage_name: str, name: str,
+                 content_type: str, size: int, charset: Optional[str],
+                 content_type_extra: Optional[Dict[str, Any]], sha256: str,
+                 ooxml_type: Optional[str]) -> None:
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.storage = storage
+        self.storage_name = storage_name
+        self.sha256 = sha256
+        self.ooxml_type = ooxml_type
+
+    def discard(self) -> None:
+        """Close the file and remove it from storage."""
+        self.close()
+        self.storage.delete(self.storage_name)
+
+
+class StreamingFileUploadHandler(FileUploadHandler):
+    """
+    Stream the ``file`` field of a multipart upload to its final location.
+
+    Files that can't be streamed (other fields, disallowed extensions, storages
+    without a local path) are left to the handlers that follow this one.
+    """
+    chunk_size = 64 * 1024
+    field_name = 'file'
+
+    def __init__(self, request: Any = None, max_size: Optional[int] = None,
+                 storage: Any = None) -> None:
+        super().__init__(request)
+        self.max_size = max_size
+        self.storage = storage or default_storage
+        self.size_exceeded = False
+        # Not named ``file``: MultiPartParser closes ``handler.file`` blindly.
+        self.destination: Any = None
+        self.storage_name: Optional[str] = None
+
+    def new_file(self, field_name: str, file_name: str,
+                 *args: Any, **kwargs: Any) -> None:
+        super().new_file(field_name, file_name, *args, **kwargs)
+        self.destination = None
+        user = getattr(self.request, 'user', None)
+        ext = os.path.splitext(file_name)[1].lower()
+        if field_name != self.field_name or ext not in EXTENSION_TYPES:
+            return
+        if not (user and user.is_authenticated):
+            return
+
+        from .models import File
+
+        name = File._meta.get_field('file').generate_filename(
+            File(uploaded_by=user), file_name
+        )
+        name = self.storage.get_available_name(name)
+        try:
+            path = self.storage.path(name)
+        except NotImplementedError:
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.destination = open(path, 'x+b')
+        self.storage_name = name
+        self.digest = hashlib.sha256()
+        self.sniffer = OOXMLSniffer()
+        self.size = 0
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data: bytes, start: int) -> Optional[bytes]:
+        if self.destination is None:
+            return raw_data
+
+        self.size += len(raw_data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.size_exceeded = True
+            self._remove_partial_file()
+            raise SkipFile()
+
+        self.destination.write(raw_data)
+        self.digest.update(raw_data)
+        self.sniffer.feed(raw_data)
+        return None
+
+    def file_complete(self, file_size: int) -> Optional[StoredUploadedFile]:
+        if self.destination is None:
+            return None
+
+        self.destination.flush()
+        self.destination.seek(0)
+        stored = StoredUploadedFile(
+            file=self.destination,
+            storage=self.storage,
+            storage_name=self.storage_name,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+            sha256=self.digest.hexdigest(),
+            ooxml_type=self.sniffer.file_type,
+        )
+        self.destination = None
+        return stored
+
+    def upload_interrupted(self) -> None:
+        self._remove_partial_file()
+
+    def _remove_partial_file(self) -> None:
+        if self.destination is None:
+            return
+        self.destination.close()
+        self.destination = None
+        try:
+            self.storage.delete(self.storage_name)
+        except OSError:
+            logger.warning(f"Could not remove partial upload {self.storage_name}")
@@ -0,0 +1,333 @@
+"""
+Resumable, chunked upload sessions.
+
+A client opens a session for a file of known size, PUTs fixed-size chunks in
+any order (or in parallel) and commits the session once every chunk is in.
+Chunks are written straight into a preallocated staging file at their final
+offset, so a dropped connection only costs the chunks that didn't arrive and
+committing is a rename into the blob store, not a reassembly copy. Content
+is only matched to a stored blob by the hash taken of the staged bytes, never
+by a hash the client claims, so a file can't be had by knowing its hash.
+
+A commit first moves the staging file aside, then takes an exclusive
+``flock`` on it before hashing, and chunk writers hold a shared lock while
+they write. A chunk that was already being written finishes before the hash
+is taken. A writer that gets its lock afterwards finds the staging path gone
+and is refused, so nothing can write into the file once it is hashed and
+linked into the blob store.
+
+Session state lives in Redis. Every session is also indexed in a sorted set
+by expiry time so ``cleanup_expired_sessions`` can find abandoned ones even
+after their keys have expired.
+"""
+import fcntl
+import hashlib
+import logging
+import math
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+
+from config.redis_client import get_redis
+
+from .models import Blob, File
+from .upload_handlers import EXTENSION_TYPES, OOXMLSniffer
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'upload_session'
+EXPIRY_INDEX_KEY = 'upload_sessions:expiry'
+READ_SIZE = 64 * 1024
+
+
+class UploadSessionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('This upload session is already being committed.')
+    default_code = 'conflict'
+
+
+def session_key(session_id: str) -> str:
+    return f'{KEY_PREFIX}:{session_id}'
+
+
+def chunks_key(session_id: str) -> str:
+    return f'{KEY_PREFIX}:{session_id}:chunks'
+
+
+def staging_name(session_id: str) -> str:
+    """Name of the staging file within storage, derivable from the id alone."""
+    return f'upload_sessions/{session_id}.part'
+
+
+def sealed_name(session_id: str) -> str:
+    """Where the staging file is moved while the session is committed."""
+    return f'upload_sessions/{session_id}.commit'
+
+
+def _is_file_at(fd: int, path: str) -> bool:
+    """Whether ``path`` still names the file open as ``fd``."""
+    try:
+        at_path = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(fd)
+    return (at_path.st_dev, at_path.st_ino) == (opened.st_dev, opened.st_ino)
+
+
+class UploadSession:
+    """A resumable upload whose state is kept in Redis."""
+
+    def __init__(self, session_id: str, data: Dict[str, str],
+                 received: Optional[set] = None) -> None:
+        self.id = session_id
+        self.user_id = data['user_id']
+        self.file_name = data['file_name']
+        self.file_size = int(data['file_size'])
+        self.chunk_size = int(data['chunk_size'])
+        self.description = data.get('description', '')
+        self.expires_at = float(data['expires_at'])
+        self.committing = 'committing' in data
+        self.received = received or set()
+
+    @property
+    def total_chunks(self) -> int:
+        return math.ceil(self.file_size / self.chunk_size)
+
+    @property
+    def missing_chunks(self) -> List[int]:
+        return [
+            index for index in range(self.total_chunks)
+            if index not in self.received
+        ]
+
+    @property
+    def staging_path(self) -> str:
+        return default_storage.path(staging_name(self.id))
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.file_size - index * self.chunk_size)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'file_name': self.file_name,
+            'file_size': self.file_size,
+            'chunk_size': self.chunk_size,
+            'total_chunks': self.total_chunks,
+            'received_chunks': sorted(self.received),
+            'missing_chunks': self.missing_chunks,
+            'expires_at': int(self.expires_at),
+        }
+
+    @classmethod
+    def open(cls, user: Any, file_name: str, file_size: int,
+             description: str = '') -> 'UploadSession':
+        """Start a new session and preallocate its staging file."""
+        session_id = str(uuid.uuid4())
+        data = {
+            'user_id': str(user.id),
+            'file_name': file_name,
+            'file_size': str(file_size),
+            'chunk_size': str(settings.UPLOAD_SESSION_CHUNK_SIZE),
+            'description': description,
+            'expires_at': str(time.time() + settings.UPLOAD_SESSION_TTL),
+        }
+        session = cls(session_id, data)
+
+        path = session.staging_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'xb') as staging:
+            staging.truncate(file_size)
+
+        pipe = get_redis().pipeline()
+        pipe.hset(session_key(session_id), mapping=data)
+        session._touch(pipe)
+        pipe.execute()
+        return session
+
+    @classmethod
+    def load(cls, session_id: str, user: Any) -> 'UploadSession':
+        """Load a session owned by ``user`` or raise ``NotFound``."""
+        pipe = get_redis().pipeline()
+        pipe.hgetall(session_key(session_id))
+        pipe.smembers(chunks_key(session_id))
+        raw_data, raw_chunks = pipe.execute()
+
+        data = {key.decode(): value.decode() for key, value in raw_data.items()}
+        if not data or data['user_id'] != str(user.id):
+            raise NotFound(_('Upload session not found.'))
+        return cls(session_id, data, {int(index) for index in raw_chunks})
+
+    def _touch(self, pipe: Any) -> None:
+        """Queue commands that push the session expiry forward."""
+        self.expires_at = time.time() + settings.UPLOAD_SESSION_TTL
+        pipe.hset(session_key(self.id), 'expires_at', str(self.expires_at))
+        pipe.expire(session_key(self.id), settings.UPLOAD_SESSION_TTL)
+        pipe.expire(chunks_key(self.id), settings.UPLOAD_SESSION_TTL)
+        pipe.zadd(EXPIRY_INDEX_KEY, {self.id: self.expires_at})
+
+    def write_chunk(self, index: int, stream: Any,
+                    content_length: Optional[int]) -> None:
+        """Copy chunk ``index`` from ``stream`` into place in the staging file."""
+        if self.committing:
+            raise UploadSessionConflict()
+        if not 0 <= index < self.total_chunks:
+            raise ValidationError({'index': _('Chunk index out of range.')})
+
+        expected = self.chunk_length(index)
+        if content_length != expected:
+            raise ValidationError({
+                'chunk': _('Chunk %(index)s must be exactly %(size)s bytes.') %
+                {'index': index, 'size': expected}
+            })
+
+        try:
+            fd = os.open(self.staging_path, os.O_WRONLY)
+        except FileNotFoundError:
+            raise NotFound(_('Upload session not found.'))
+
+        offset = index * self.chunk_size
+        written = 0
+        try:
+            # A commit that moved the file aside before we got the lock has
+            # hashed it, or is about to; writing now would change the blob
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            if not _is_file_at(fd, self.staging_path):
+                raise UploadSessionConflict()
+            while written < expected:
+                data = stream.read(min(READ_SIZE, expected - written))
+                if not data:
+                    break
+                os.pwrite(fd, data, offset + written)
+                written += len(data)
+        finally:
+            os.close(fd)
+
+        if written != expected:
+            raise ValidationError({'chunk': _('Chunk body was incomplete.')})
+
+        self.received.add(index)
+        pipe = get_redis().pipeline()
+        pipe.sadd(chunks_key(self.id), index)
+        self._touch(pipe)
+        pipe.execute()
+
+    def commit(self, user: Any, sha256: Optional[str] = None) -> File:
+        """Verify the staged file, move it into place and create its ``File``."""
+        redis = get_redis()
+        if not redis.hsetnx(session_key(self.id), 'committing', '1'):
+            raise UploadSessionConflict()
+
+        try:
+            missing = self.missing_chunks
+            if missing:
+                raise ValidationError({'missing_chunks': missing})
+
+            sealed_path = default_storage.path(sealed_name(self.id))
+            try:
+                os.replace(self.staging_path, sealed_path)
+            except FileNotFoundError:
+                # Left aside by a commit that was cut short
+                if not os.path.exists(sealed_path):
+                    raise NotFound(_('Upload session not found.'))
+
+            try:
+                with open(sealed_path, 'rb') as sealed:
+                    # Waits for chunks still being written to the file
+                    fcntl.flock(sealed, fcntl.LOCK_EX)
+                    file_instance = self._create_file(user, sealed, sha256)
+            except Exception:
+                os.replace(sealed_path, self.staging_path)
+                raise
+        except Exception:
+            redis.hdel(session_key(self.id), 'committing')
+            raise
+
+        self._delete_state()
+        return file_instance
+
+    def _create_file(self, user: Any, sealed: Any, sha256: Optional[str]) -> File:
+        """Hash the sealed staging file and store it as ``user``'s file."""
+        digest = hashlib.sha256()
+        sniffer = OOXMLSniffer()
+        for data in iter(lambda: sealed.read(READ_SIZE), b''):
+            digest.update(data)
+            sniffer.feed(data)
+        content_hash = digest.hexdigest()
+
+        if sha256 and sha256.lower() != content_hash:
+            raise ValidationError({
+                'sha256': _('Checksum does not match the uploaded content.')
+            })
+
+        file_type = EXTENSION_TYPES[os.path.splitext(self.file_name)[1].lower()]
+        if sniffer.file_type and sniffer.file_type != file_type:
+            raise ValidationError({
+                'file': _('File content does not match its extension.')
+            })
+
+        with transaction.atomic():
+            # Moves the staged file into the blob store, or drops it if the
+            # same content is already stored
+            blob = Blob.objects.acquire(
+                content_hash, self.file_size, name=sealed_name(self.id)
+            )
+            return File.objects.create(
+                file=blob.file.name,
+                blob=blob,
+                original_filename=self.file_name,
+                file_type=file_type,
+                file_size=self.file_size,
+                content_hash=content_hash,
+                description=self.description,
+                uploaded_by=user
+            )
+
+    def abort(self) -> None:
+        """Drop the session and its staged chunks."""
+        if self.committing:
+            raise UploadSessionConflict()
+        default_storage.delete(staging_name(self.id))
+        self._delete_state()
+
+    def _delete_state(self) -> None:
+        pipe = get_redis().pipeline()
+        pipe.delete(session_key(self.id), chunks_key(self.id))
+        pipe.zrem(EXPIRY_INDEX_KEY, self.id)
+        pipe.execute()
+
+
+def cleanup_expired_sessions(now: Optional[float] = None) -> int:
+    """Remove sessions past their expiry along with their staging files."""
+    redis = get_redis()
+    now = time.time() if now is None else now
+    removed = 0
+
+    for raw_id in redis.zrangebyscore(EXPIRY_INDEX_KEY, '-inf', now):
+        session_id = raw_id.decode()
+        if redis.hexists(session_key(session_id), 'committing'):
+            continue
+        try:
+            default_storage.delete(staging_name(session_id))
+            default_storage.delete(sealed_name(session_id))
+        except OSError:
+            logger.warning(
+                f"Could not remove staging file for upload session {session_id}"
+            )
+            continue
+
+        pipe = redis.pipeline()
+        pipe.delete(session_key(session_id), chunks_key(session_id))
+        pipe.zrem(EXPIRY_INDEX_KEY, session_id)
+        pipe.execute()
+        removed += 1
+
+    return removed
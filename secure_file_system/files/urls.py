@@ -13,6 +13,18 @@ urlpatterns = [
     # File operations
     path('', views.FileListView.as_view(), name='file_list'),
     path('upload/', views.FileUploadView.as_view(), name='file_upload'),
+    path('upload/sessions/',
+         views.UploadSessionViewSet.as_view({'post': 'create'}),
+         name='upload_session_list'),
+    path('upload/sessions/<uuid:session_id>/',
+         views.UploadSessionViewSet.as_view({'get': 'retrieve', 'delete': 'destroy'}),
+         name='upload_session_detail'),
+    path('upload/sessions/<uuid:session_id>/chunks/<int:index>/',
+         views.UploadSessionViewSet.as_view({'put': 'upload_chunk'}),
+         name='upload_session_chunk'),
+    path('upload/sessions/<uuid:session_id>/commit/',
+         views.UploadSessionViewSet.as_view({'post': 'commit'}),
+         name='upload_session_commit'),
     path('<uuid:id>/', views.FileDetailView.as_view(), name='file_detail'),
     path('<uuid:id>/get-download-link/', views.FileDownloadView.as_view(), name='get_download_link'),
     path('<uuid:id>/download/', views.SecureFileDownloadView.as_view(), name='secure_file_download'),
@@ -25,7 +37,7 @@ urlpatterns = [
     path('', include(router.urls)),
     
     # Public download link (no authentication required)
-    path('share/<uuid:pk>/download/', 
-         views.FileShareLinkViewSet.as_view({'get': 'download'}), 
+    path('share/<uuid:token>/download/',
+         views.ShareLinkDownloadView.as_view(),
          name='public_file_download'),
 ]
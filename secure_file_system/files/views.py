@@ -1,28 +1,56 @@
 import logging
 import os
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 from urllib.parse import quote
 
 from django.conf import settings
 from django.utils import timezone
-from django.http import FileResponse, Http404
+from django.utils.dateparse import parse_date
 from django.utils.translation import gettext_lazy as _
-from django.core.exceptions import PermissionDenied, ValidationError
-from django.db.models import Q
+from django.core.exceptions import (
+    PermissionDenied,
+    ValidationError as DjangoValidationError,
+)
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework import status, generics, permissions, viewsets, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from rest_framework.pagination import PageNumberPagination
+
+from config.ratelimit import TokenBucketThrottle
 
 from .tasks import send_file_upload_notification
 
-from .models import File, FileShareLink
+from .download_tokens import (
+    InvalidDownloadToken,
+    is_signed_token,
+    signed_download_url,
+    verify_download_token,
+)
+from .download_log import log_download
+from .downloads import DownloadRequest
+from .models import Blob, File, FileShareLink
+from .notifications import add_to_digest
+from .pagination import KeysetPagination, StandardResultsSetPagination
+from .search import search_files
+from .share_link_cache import get_share_link, invalidate as invalidate_share_link
+from .upload_handlers import (
+    EXTENSION_TYPES,
+    StoredUploadedFile,
+    StreamingFileUploadHandler,
+    max_upload_size,
+    sha256_of
+)
+from .upload_sessions import UploadSession
 from .serializers import (
     FileSerializer, 
+    FileSearchResultSerializer,
     FileShareLinkSerializer,
-    FileShareLinkCreateSerializer
+    FileShareLinkCreateSerializer,
+    UploadSessionCommitSerializer,
+    UploadSessionCreateSerializer
 )
 from authentication.models import User
 from authentication.permissions import IsOperationsUser
@@ -30,21 +58,101 @@ from authentication.permissions import IsOperationsUser
 logger = logging.getLogger(__name__)
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    """Custom pagination class for consistent pagination across API endpoints."""
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+def filter_created_between(queryset, start_date, end_date):
+    """
+    Limit ``queryset`` to files created on or between the given days.
+
+    The days become a half-open ``created_at`` range rather than
+    ``created_at__date`` lookups, whose date cast can't use the indexes on
+    ``created_at``.
+    """
+    for param, value in (('start_date', start_date), ('end_date', end_date)):
+        if not value:
+            continue
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({
+                param: _('Enter a valid date in YYYY-MM-DD format.')
+            })
+        if param == 'start_date':
+            start = timezone.make_aware(datetime.combine(day, time.min))
+            queryset = queryset.filter(created_at__gte=start)
+        else:
+            next_day = day + timedelta(days=1)
+            end = timezone.make_aware(datetime.combine(next_day, time.min))
+            queryset = queryset.filter(created_at__lt=end)
+    return queryset
+
+
+def notify_admins_of_upload(file_instance):
+    """
+    Queue an upload notification to all admin users, or add the upload to
+    the current digest when ``FILE_UPLOAD_DIGEST_WINDOW`` is set.
+    """
+    if settings.FILE_UPLOAD_DIGEST_WINDOW and add_to_digest(file_instance.id):
+        return
+
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+    admin_emails = User.objects.filter(
+        is_staff=True
+    ).values_list('email', flat=True)
+
+    if admin_emails:
+        send_file_upload_notification.delay(
+            file_instance.id,
+            list(admin_emails)
+        )
 
 
 class FileUploadView(generics.CreateAPIView):
     """
     API endpoint for uploading files.
     Only authenticated users with OPERATIONS role can upload files.
+
+    With ``FILE_UPLOAD_STREAMING`` enabled the file is written straight to its
+    final storage location while the request body is parsed.
     """
     parser_classes = (MultiPartParser, FormParser, JSONParser)
     permission_classes = [permissions.IsAuthenticated, IsOperationsUser]
     serializer_class = FileSerializer
+    streaming_handler = None
+
+    def get_max_upload_size(self):
+        return max_upload_size()
+
+    def size_exceeded_error(self):
+        return ValidationError({
+            'file': _('File size exceeds the maximum allowed size of %(max_size)sMB') %
+            {'max_size': self.get_max_upload_size() // (1024 * 1024)}
+        })
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        # Upload handlers must be in place before the body is parsed
+        if getattr(settings, 'FILE_UPLOAD_STREAMING', False):
+            self.streaming_handler = StreamingFileUploadHandler(
+                request._request,
+                max_size=self.get_max_upload_size()
+            )
+            request.upload_handlers.insert(0, self.streaming_handler)
+
+    def create(self, request, *args, **kwargs):
+        try:
+            request.data
+            if self.streaming_handler and self.streaming_handler.size_exceeded:
+                raise self.size_exceeded_error()
+            return super().create(request, *args, **kwargs)
+        except Exception:
+            # Don't leave streamed files behind for uploads that didn't make it
+            for file_obj in request.FILES.values():
+                if isinstance(file_obj, StoredUploadedFile):
+                    file_obj.discard()
+            raise
 
     def perform_create(self, serializer):
         # Add the uploader to the file
@@ -54,37 +162,99 @@ class FileUploadView(generics.CreateAPIView):
             raise ValidationError({'file': _('No file was provided.')})
         
         # Validate file size
-        max_size = getattr(settings, 'MAX_UPLOAD_SIZE', 50 * 1024 * 1024)  # 50MB default
-        if file_obj.size > max_size:
-            raise ValidationError({
-                'file': _('File size exceeds the maximum allowed size of %(max_size)sMB') % 
-                {'max_size': max_size // (1024 * 1024)}
-            })
-        
-        # Save the file with the uploader
-        file_instance = serializer.save(
-            uploader=self.request.user,
-            file_size=file_obj.size,
-            original_filename=file_obj.name,
-            file_type=os.path.splitext(file_obj.name)[1][1:].upper() or 'UNKNOWN'
-        )
-        
-        # Send notification to all admin users
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        admin_emails = User.objects.filter(
-            is_staff=True
-        ).values_list('email', flat=True)
-        
-        if admin_emails:
-            send_file_upload_notification.delay(
-                file_instance.id,
-                list(admin_emails)
+        if file_obj.size > self.get_max_upload_size():
+            raise self.size_exceeded_error()
+
+        if isinstance(file_obj, StoredUploadedFile):
+            # Already written to storage: move it into place, don't copy it
+            ext_type = EXTENSION_TYPES.get(os.path.splitext(file_obj.name)[1].lower())
+            if file_obj.ooxml_type and file_obj.ooxml_type != ext_type:
+                raise ValidationError({
+                    'file': _('File content does not match its extension.')
+                })
+            content_hash = file_obj.sha256
+            source = {'name': file_obj.storage_name}
+        else:
+            content_hash = sha256_of(file_obj)
+            source = {'content': file_obj}
+        
+        with transaction.atomic():
+            # Identical content is stored once; a duplicate only adds a reference
+            blob = Blob.objects.acquire(content_hash, file_obj.size, **source)
+            
+            # Save the file with the uploader
+            file_instance = serializer.save(
+                uploaded_by=self.request.user,
+                file=blob.file.name,
+                blob=blob,
+                content_hash=content_hash,
+                file_size=file_obj.size,
+                original_filename=file_obj.name,
+                file_type=os.path.splitext(file_obj.name)[1][1:].upper() or 'UNKNOWN'
             )
         
+        notify_admins_of_upload(file_instance)
         logger.info(f"File '{file_obj.name}' uploaded by {self.request.user.email}")
 
 
+class UploadSessionViewSet(viewsets.ViewSet):
+    """
+    API endpoint for resumable, chunked uploads.
+
+    Open a session with the file name and size, PUT each chunk as the raw
+    request body to ``chunks/<index>/`` (in any order, retrying only the ones
+    that failed), then commit the session to create the file.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsOperationsUser]
+
+    def create(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        session = UploadSession.open(request.user, **serializer.validated_data)
+        return Response(session.as_dict(), status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, session_id=None):
+        session = UploadSession.load(str(session_id), request.user)
+        return Response(session.as_dict())
+
+    def destroy(self, request, session_id=None):
+        session = UploadSession.load(str(session_id), request.user)
+        session.abort()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def upload_chunk(self, request, session_id=None, index=None):
+        session = UploadSession.load(str(session_id), request.user)
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = None
+
+        # Read the raw body in pieces; never load the chunk through request.data
+        session.write_chunk(int(index), request.stream, content_length)
+        return Response({
+            'index': int(index),
+            'missing_chunks': session.missing_chunks
+        })
+
+    def commit(self, request, session_id=None):
+        session = UploadSession.load(str(session_id), request.user)
+        serializer = UploadSessionCommitSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        file_instance = session.commit(
+            request.user, serializer.validated_data.get('sha256')
+        )
+        notify_admins_of_upload(file_instance)
+        logger.info(
+            f"File '{file_instance.original_filename}' uploaded by "
+            f"{request.user.email} in {session.total_chunks} chunks"
+        )
+
+        serializer = FileSerializer(file_instance, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
 class FileDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     API endpoint to view, update or delete a file.
@@ -99,16 +269,17 @@ class FileDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         # Regular users can only see their own files
         if self.request.user.user_type != 'OPERATIONS':
-            return File.objects.filter(uploader=self.request.user)
+            return File.objects.filter(uploaded_by=self.request.user)
         return File.objects.all()
     
     def perform_destroy(self, instance):
         # Only allow deletion by uploader or admin
-        if instance.uploader != self.request.user and not self.request.user.is_staff:
+        if instance.uploaded_by != self.request.user and not self.request.user.is_staff:
             raise PermissionDenied(_("You don't have permission to delete this file."))
         
-        # Delete the actual file from storage
-        if instance.file:
+        # Files stored before deduplication own their storage outright; shared
+        # blobs are released (and unlinked with the last reference) on delete
+        if instance.blob_id is None and instance.file:
             if os.path.isfile(instance.file.path):
                 os.remove(instance.file.path)
         
@@ -124,7 +295,7 @@ class FileListView(generics.ListAPIView):
     """
     serializer_class = FileSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetPagination
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
     ordering_fields = ['created_at', 'file_size', 'original_filename']
     search_fields = ['original_filename', 'description', 'file_type']
@@ -134,21 +305,18 @@ class FileListView(generics.ListAPIView):
         
         # Filter by uploader if not an operations user
         if self.request.user.user_type != 'OPERATIONS':
-            queryset = queryset.filter(uploader=self.request.user)
+            queryset = queryset.filter(uploaded_by=self.request.user)
         
         # Filter by file type if provided
         file_type = self.request.query_params.get('file_type')
         if file_type:
-            queryset = queryset.filter(file_type__iexact=file_type.upper())
+            queryset = queryset.filter(file_type=file_type.upper())
         
         # Filter by date range if provided
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
         
-        if start_date:
-            queryset = queryset.filter(created_at__date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(created_at__date__lte=end_date)
+        queryset = filter_created_between(queryset, start_date, end_date)
             
         return queryset.order_by('-created_at')
 
@@ -167,7 +335,7 @@ class FileDownloadView(generics.RetrieveAPIView):
         file_obj = get_object_or_404(File, id=file_id)
         
         # Check if user has permission to access the file
-        if not (self.request.user.is_staff or file_obj.uploader == self.request.user):
+        if not file_obj.can_download(self.request.user):
             raise PermissionDenied(_('You do not have permission to access this file'))
             
         return file_obj
@@ -175,15 +343,8 @@ class FileDownloadView(generics.RetrieveAPIView):
     def get(self, request, *args, **kwargs):
         file_obj = self.get_object()
         
-        # Create a secure download token
-        share_link = FileShareLink.objects.create(
-            file=file_obj,
-            created_by=request.user,
-            expires_at=timezone.now() + timedelta(hours=24)  # Link expires in 24 hours
-        )
-        
-        # Build the download URL
-        download_url = f"{settings.BASE_URL}/api/files/{file_obj.id}/download/?token={share_link.token}"
+        # Signed, expiring link; nothing is stored until it's used
+        download_url = signed_download_url(file_obj, request.user, request)
         
         # Return the response in the required format
         return Response({
@@ -192,12 +353,32 @@ class FileDownloadView(generics.RetrieveAPIView):
         }, status=status.HTTP_200_OK)
 
 
+def active_share_link(token, file_id=None):
+    """
+    The unexpired, active share link for ``token``, for ``file_id`` if
+    given, or ``PermissionDenied``.
+    """
+    try:
+        share_link = get_share_link(token)
+    except (FileShareLink.DoesNotExist, DjangoValidationError):
+        share_link = None
+    if (share_link is None
+            or (file_id is not None and share_link.file_id != file_id)
+            or share_link.expires_at is None
+            or share_link.expires_at <= timezone.now()):
+        raise PermissionDenied(_('Invalid or expired download link'))
+    return share_link
+
+
 class SecureFileDownloadView(generics.RetrieveAPIView):
     """
     Secure endpoint to download a file using a token.
     This is the actual download endpoint that gets called with the secure token.
     """
     permission_classes = [permissions.AllowAny]  # Will handle permissions manually
+    # Anyone holding a share link token can call this
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'share_download'
     
     def get(self, request, *args, **kwargs):
         file_id = self.kwargs.get('id')
@@ -206,64 +387,59 @@ class SecureFileDownloadView(generics.RetrieveAPIView):
         if not token:
             raise PermissionDenied(_('Download token is required'))
         
-        # Get the file and verify the token
+        # Get the file and verify the token. Signed tokens are checked
+        # without touching the database; share links and their files are
+        # looked up once and then cached.
         try:
-            file_obj = File.objects.get(id=file_id)
-            share_link = FileShareLink.objects.get(
-                token=token,
-                file=file_obj,
-                is_active=True,
-                expires_at__gt=timezone.now()
-            )
-            
-            # Check download limit if set
-            if share_link.max_downloads and share_link.download_count >= share_link.max_downloads:
+            if is_signed_token(token):
+                user_id = verify_download_token(token, file_id).user_id
+                file_obj = File.objects.get(id=file_id)
+                share_link = None
+                # The token's user must still be allowed the file; the
+                # uploader is known from the row, staff need a lookup
+                staff = User.objects.filter(pk=user_id, is_staff=True)
+                if str(file_obj.uploaded_by_id) != user_id and not staff.exists():
+                    raise InvalidDownloadToken()
+            else:
+                user_id = None
+                share_link = active_share_link(token, file_id)
+                file_obj = share_link.file
+        except (InvalidDownloadToken, File.DoesNotExist, DjangoValidationError):
+            raise PermissionDenied(_('Invalid or expired download link'))
+
+        return self.serve(request, file_obj, share_link, user_id)
+
+    def serve(self, request, file_obj, share_link=None, user_id=None):
+        """Send ``file_obj``, counting the download against ``share_link``."""
+        download = DownloadRequest(request, file_obj)
+        not_modified = download.not_modified_response()
+        if not_modified is not None:
+            return not_modified
+
+        # Only share links are counted, a range past the end gets no bytes,
+        # and picking up an interrupted download isn't a new download
+        if (share_link is not None and download.satisfiable
+                and not download.is_resumption(str(share_link.token))):
+            # Counted only while under the limit, atomically
+            if not share_link.record_download():
+                invalidate_share_link(share_link.token)
                 raise PermissionDenied(_('Download limit reached for this link'))
-            
-            # Increment download count
-            share_link.download_count += 1
-            share_link.save()
-            
-            # Get the file path
-            file_path = file_obj.file.path
-            
-            # Check if file exists
-            if not os.path.exists(file_path):
-                logger.error(f"File not found at path: {file_path}")
-                raise Http404(_('File not found'))
-            
-            # Open the file for reading in binary mode
-            try:
-                file = open(file_path, 'rb')
-                response = FileResponse(file)
-                
-                # Set content type based on file extension
-                filename = file_obj.original_filename
-                content_type = 'application/octet-stream'
-                
-                if filename.endswith('.docx'):
-                    content_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                elif filename.endswith('.xlsx'):
-                    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                elif filename.endswith('.pptx'):
-                    content_type = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
-                
-                # Set response headers
-                response['Content-Type'] = content_type
-                response['Content-Disposition'] = f'attachment; filename=\"{filename}\"'
-                response['Content-Length'] = file_obj.file_size
-                
-                return response
-                
-            except Exception as e:
-                logger.error(f"Error serving file {file_path}: {str(e)}")
-                raise Http404(_('Error serving file'))
-                
-        except (File.DoesNotExist, FileShareLink.DoesNotExist):
-            raise PermissionDenied(_('Invalid or expired download link'))(
-                {'error': _('Error downloading file.')},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+            download.remember(str(share_link.token))
+
+        # Serve the file, or hand it to the front proxy when offloading, and
+        # log it once it has gone out
+        return log_download(download, download.response(), share_link, user_id)
+
+
+class ShareLinkDownloadView(SecureFileDownloadView):
+    """
+    Public download through a share link, with the link's token in the URL
+    instead of a query parameter.
+    """
+
+    def get(self, request, *args, **kwargs):
+        share_link = active_share_link(self.kwargs.get('token'))
+        return self.serve(request, share_link.file, share_link)
 
 
 class FileShareLinkViewSet(viewsets.ModelViewSet):
@@ -271,6 +447,7 @@ class FileShareLinkViewSet(viewsets.ModelViewSet):
     API endpoint for managing file share links.
     """
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -331,9 +508,12 @@ class FileShareLinkViewSet(viewsets.ModelViewSet):
 class FileSearchView(generics.ListAPIView):
     """
     API endpoint to search for files by name or description.
+    Results are ranked by relevance and include a highlighted snippet.
     """
-    serializer_class = FileSerializer
+    serializer_class = FileSearchResultSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Keyset pages would be ordered by date, not rank. Matches are capped at
+    # FILE_SEARCH_MAX_CANDIDATES, so page numbers never mean deep OFFSETs
     pagination_class = StandardResultsSetPagination
     
     def get_queryset(self):
@@ -341,40 +521,26 @@ class FileSearchView(generics.ListAPIView):
         
         # Apply user-based filtering
         if self.request.user.user_type != 'OPERATIONS':
-            queryset = queryset.filter(uploader=self.request.user)
+            queryset = queryset.filter(uploaded_by=self.request.user)
         
         # Get search query
         query = self.request.query_params.get('q', '').strip()
         if not query:
             return queryset.none()
         
-        # Search in filename and description
-        queryset = queryset.filter(
-            Q(original_filename__icontains=query) |
-            Q(description__icontains=query)
-        )
-        
         # Filter by file type if provided
         file_type = self.request.query_params.get('type')
         if file_type:
-            queryset = queryset.filter(file_type__iexact=file_type.upper())
+            queryset = queryset.filter(file_type=file_type.upper())
         
         # Filter by date range if provided
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
         
-        if start_date:
-            queryset = queryset.filter(created_at__date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(created_at__date__lte=end_date)
-        
-        # Order by relevance (exact matches first, then partial matches)
-        queryset = queryset.order_by(
-            '-created_at',
-            'original_filename'
-        )
+        queryset = filter_created_between(queryset, start_date, end_date)
         
-        return queryset
+        # Full-text and filename matches, best match first
+        return search_files(queryset, query)
     
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
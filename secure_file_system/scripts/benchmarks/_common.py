@@ -0,0 +1,88 @@
+"""
+Shared set-up for the benchmark scripts in this directory.
+
+Each script reproduces the measurement behind one performance change. Run
+them from the project directory with the app's environment, for example::
+
+    python scripts/benchmarks/search.py --rows 200000
+
+They create Django's test database (``test_<NAME>``, so the database user
+needs CREATEDB), fill it with generated rows, measure, and drop it again;
+real data is never read or written. Redis is whatever ``REDIS_URL`` and
+``CACHES`` point at, so use a scratch instance. Timings go to stdout.
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+
+
+def setup_django() -> None:
+    """Make the project importable and configure Django."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+
+    django.setup()
+
+
+def argument_parser(description: Optional[str]) -> argparse.ArgumentParser:
+    """An argument parser that also takes ``--keepdb``."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        '--keepdb', action='store_true',
+        help='Reuse the test database if it exists, and leave it in place'
+    )
+    return parser
+
+
+@contextmanager
+def test_database(keepdb: bool = False) -> Iterator[None]:
+    """Run the block against a freshly created and migrated test database."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def measure(run: Callable[[], object], repeat: int) -> List[float]:
+    """Call ``run`` ``repeat`` times and return each call's duration in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def percentile(timings: List[float], fraction: float) -> float:
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(label: str, timings: List[float], elapsed: Optional[float] = None) -> None:
+    """
+    Print the p50, p95, p99 and worst of ``timings``, and the rate over
+    ``elapsed`` seconds (their sum if not given).
+    """
+    elapsed = sum(timings) if elapsed is None else elapsed
+    print(
+        f'{label}: n={len(timings)} '
+        f'p50={percentile(timings, 0.50) * 1000:.1f} ms '
+        f'p95={percentile(timings, 0.95) * 1000:.1f} ms '
+        f'p99={percentile(timings, 0.99) * 1000:.1f} ms '
+        f'max={max(timings) * 1000:.1f} ms '
+        f'rate={len(timings) / elapsed:.1f}/s'
+    )
@@ -0,0 +1,103 @@
+"""
+Cost of the admin dashboard totals: live aggregates against the rollup.
+
+Fills users, files and the download log, then times the counts and sums the
+admin index used to run on every page load, reading the precomputed
+``SiteStats`` row with ``get_stats``, and the hourly ``reconcile``.
+Needs PostgreSQL (the download log is partitioned).
+"""
+from datetime import timedelta
+
+from _common import argument_parser, measure, report, setup_django, test_database
+
+
+def fill(users: int, files: int, downloads: int) -> None:
+    from django.db import connection
+
+    from authentication.models import User
+    from files.models import DailyStats, DownloadLog, File
+
+    User.objects.bulk_create(
+        [User(email=f'user{index}@example.com') for index in range(users)],
+        batch_size=5000
+    )
+    user_ids = [str(pk) for pk in User.objects.values_list('pk', flat=True)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {File._meta.db_table} (
+                id, file, original_filename, file_type, file_size, content_hash,
+                uploaded_by_id, created_at, updated_at, description, is_public
+            )
+            SELECT md5('file' || i)::uuid, 'files/' || i || '.docx',
+                   'file-' || i || '.docx', 'DOCX', 1024 + i %% 4096, '',
+                   (%s::uuid[])[1 + i %% %s], now() - i * interval '1 second',
+                   now(), '', false
+            FROM generate_series(1, %s) AS i
+            """,
+            [user_ids, len(user_ids), files]
+        )
+        # Spread over the last 60 days; months without a partition land in
+        # the default one
+        cursor.execute(
+            f"""
+            INSERT INTO {DownloadLog._meta.db_table} (
+                downloaded_at, file_id, file_name, ip_address, status_code,
+                bytes_sent, duration_ms
+            )
+            SELECT now() - (i %% 5184000) * interval '1 second',
+                   md5('file' || (1 + i %% %s))::uuid, 'file.docx',
+                   '203.0.113.7', 200, 1024, 10
+            FROM generate_series(1, %s) AS i
+            """,
+            [files, downloads]
+        )
+        # The daily rollup the download totals are summed from
+        cursor.execute(
+            f"""
+            INSERT INTO {DailyStats._meta.db_table} (
+                day, uploads, bytes_uploaded, downloads, bytes_served, new_users
+            )
+            SELECT downloaded_at::date, 0, 0, count(*), sum(bytes_sent), 0
+            FROM {DownloadLog._meta.db_table}
+            GROUP BY 1
+            """
+        )
+        cursor.execute('ANALYZE')
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--files', type=int, default=1_000_000)
+    parser.add_argument('--downloads', type=int, default=2_000_000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db.models import Sum
+    from django.utils import timezone
+
+    from authentication.models import User
+    from files.models import DownloadLog, File
+    from files.stats import get_stats, reconcile
+
+    with test_database(args.keepdb):
+        fill(args.users, args.files, args.downloads)
+
+        def live() -> None:
+            week_ago = timezone.now() - timedelta(days=7)
+            User.objects.count()
+            User.objects.filter(date_joined__gte=week_ago).count()
+            File.objects.count()
+            File.objects.aggregate(total_size=Sum('file_size'))
+            DownloadLog.objects.count()
+            DownloadLog.objects.filter(downloaded_at__gte=week_ago).count()
+
+        report('live aggregates (before)', measure(live, args.repeat))
+        report('reconcile', measure(reconcile, args.repeat))
+        report('get_stats', measure(get_stats, args.repeat * 100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+What logging a download costs the request, and how fast batches drain.
+
+Times the per-request INSERT a download would wait on if it were logged
+directly, against the Redis RPUSH it now makes, then times ``flush`` moving
+the buffered entries into the partitioned table with ``bulk_create``.
+Needs PostgreSQL (the table is partitioned) and the configured Redis; the
+buffer list there is emptied first.
+"""
+import time
+
+from _common import argument_parser, measure, report, setup_django, test_database
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from django.utils import timezone
+
+    from authentication.models import User
+    from config.redis_client import get_redis
+    from files.download_log import (
+        BUFFER_KEY,
+        PROCESSING_KEY,
+        _fields,
+        buffer_entry,
+        flush,
+    )
+    from files.models import DownloadLog, File
+
+    with test_database(args.keepdb):
+        user = User.objects.create_user(
+            email='bench@example.com', password='bench-password'
+        )
+        [file_obj] = File.objects.bulk_create([File(
+            file='files/report.docx',
+            original_filename='report.docx',
+            file_type='DOCX',
+            file_size=1024,
+            uploaded_by=user
+        )])
+        entry = {
+            'downloaded_at': timezone.now().isoformat(),
+            'share_link_id': None,
+            'file_id': str(file_obj.id),
+            'file_name': file_obj.original_filename,
+            'user_id': str(user.id),
+            'ip_address': '203.0.113.7',
+            'status_code': 200,
+            'bytes_sent': 1024,
+            'duration_ms': 12,
+        }
+
+        def insert() -> None:
+            DownloadLog.objects.create(**_fields(entry))
+
+        report('INSERT per download (direct)', measure(insert, args.entries))
+
+        get_redis().delete(BUFFER_KEY, PROCESSING_KEY)
+        # Nothing queues a flush task while the buffer fills; it's run below
+        with override_settings(DOWNLOAD_LOG_BATCH_SIZE=args.entries + 1):
+            report('RPUSH per download (buffered)', measure(
+                lambda: buffer_entry(entry), args.entries
+            ))
+
+        started = time.perf_counter()
+        written = flush(batch_size=args.batch_size, max_batches=args.entries)
+        elapsed = time.perf_counter() - started
+        print(
+            f'flush: {written} rows in batches of {args.batch_size}, '
+            f'{elapsed * 1000:.0f} ms, {written / elapsed:.0f} rows/s'
+        )
+
+
+if __name__ == '__main__':
+    main()
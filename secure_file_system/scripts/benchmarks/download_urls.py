@@ -0,0 +1,70 @@
+"""
+Cost of building the download URLs in a page of serialized files.
+
+FileSerializer signs a download URL for every row it may show. Signing is
+a local HMAC, so a page costs no queries or cache round trips; before, each
+row wrote a random token to the cache. This times serializing a page, counts
+its queries, and times the per-row cache writes the old tokens needed, for
+comparison.
+"""
+import uuid
+
+from _common import argument_parser, measure, report, setup_django, test_database
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+
+    from authentication.models import User
+    from files.models import File
+    from files.serializers import FileSerializer
+
+    with test_database(args.keepdb):
+        user = User.objects.create_user(
+            email='bench-ops@example.com',
+            password='bench-password',
+            user_type=User.UserType.OPERATIONS
+        )
+        File.objects.bulk_create([
+            File(
+                file=f'files/report-{index}.docx',
+                original_filename=f'report-{index}.docx',
+                file_type='DOCX',
+                file_size=1024,
+                uploaded_by=user
+            )
+            for index in range(args.page_size)
+        ])
+        page = list(File.objects.all())
+        request = RequestFactory().get('/api/files/')
+        request.user = user
+
+        def serialize() -> object:
+            return FileSerializer(page, many=True, context={'request': request}).data
+
+        with CaptureQueriesContext(connection) as queries:
+            serialize()
+        print(f'queries per page: {len(queries)}')
+        report(f'serialize {args.page_size} files', measure(serialize, args.repeat))
+
+        def write_tokens() -> None:
+            for file_obj in page:
+                cache.set(f'download_token:{uuid.uuid4().hex}', str(file_obj.id), 3600)
+
+        report(
+            f'{args.page_size} cache token writes (before)',
+            measure(write_tokens, args.repeat)
+        )
+
+
+if __name__ == '__main__':
+    main()
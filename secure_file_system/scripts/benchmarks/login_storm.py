@@ -0,0 +1,115 @@
+"""
+Logins per second against p99 latency during a login storm.
+
+``--threads`` threads each log in ``--logins`` times in a row through the
+login view, all in one process, as the threads of one worker would. This
+runs three times: PBKDF2 at Django's default cost with no cap on concurrent
+hashing, Argon2 at the configured costs with no cap, and Argon2 with the
+configured ``PASSWORD_HASH_CONCURRENCY`` and ``PASSWORD_HASH_WAIT``.
+Logins refused with a 503 are counted separately. Rate limiting is
+switched off for the run.
+"""
+import threading
+import time
+from typing import Dict, List
+
+from _common import argument_parser, percentile, setup_django, test_database
+
+PBKDF2 = 'authentication.hashers.BoundedPBKDF2PasswordHasher'
+ARGON2 = 'authentication.hashers.BoundedArgon2PasswordHasher'
+PASSWORD = 'bench-password-123'
+
+
+def storm(threads: int, logins: int) -> Dict[str, List[float]]:
+    """Run the logins and return their durations by outcome."""
+    from django.db import connection
+    from rest_framework.test import APIRequestFactory
+
+    from authentication.views import CustomTokenObtainPairView
+
+    view = CustomTokenObtainPairView.as_view()
+    factory = APIRequestFactory()
+    outcomes: Dict[str, List[float]] = {'ok': [], 'refused': [], 'failed': []}
+    lock = threading.Lock()
+
+    def log_in(index: int) -> None:
+        try:
+            for _ in range(logins):
+                request = factory.post(
+                    '/api/auth/login/',
+                    {'email': f'user{index}@example.com', 'password': PASSWORD},
+                    format='json'
+                )
+                started = time.perf_counter()
+                response = view(request)
+                elapsed = time.perf_counter() - started
+                outcome = {200: 'ok', 503: 'refused'}.get(
+                    response.status_code, 'failed'
+                )
+                with lock:
+                    outcomes[outcome].append(elapsed)
+        finally:
+            connection.close()
+
+    workers = [
+        threading.Thread(target=log_in, args=(index,)) for index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return outcomes
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--logins', type=int, default=10, help='per thread')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test import override_settings
+
+    from authentication.models import User
+
+    runs = [
+        ('PBKDF2, uncapped', [PBKDF2], args.threads, 60.0),
+        ('Argon2, uncapped', [ARGON2], args.threads, 60.0),
+        (
+            f'Argon2, cap {settings.PASSWORD_HASH_CONCURRENCY} '
+            f'/ wait {settings.PASSWORD_HASH_WAIT} s',
+            [ARGON2], settings.PASSWORD_HASH_CONCURRENCY, settings.PASSWORD_HASH_WAIT
+        ),
+    ]
+    with test_database(args.keepdb):
+        for label, hashers, concurrency, wait in runs:
+            with override_settings(
+                PASSWORD_HASHERS=hashers,
+                PASSWORD_HASH_CONCURRENCY=concurrency,
+                PASSWORD_HASH_WAIT=wait,
+                RATE_LIMITS={},
+            ):
+                User.objects.all().delete()
+                for index in range(args.threads):
+                    User.objects.create_user(
+                        email=f'user{index}@example.com',
+                        password=PASSWORD,
+                        is_verified=True
+                    )
+
+                started = time.perf_counter()
+                outcomes = storm(args.threads, args.logins)
+                elapsed = time.perf_counter() - started
+
+            every = outcomes['ok'] + outcomes['refused'] + outcomes['failed']
+            print(
+                f'{label}: {len(outcomes["ok"]) / elapsed:.1f} logins/s, '
+                f'p99 {percentile(every, 0.99) * 1000:.0f} ms, '
+                f'{len(outcomes["refused"])} refused with 503, '
+                f'{len(outcomes["failed"])} failed'
+            )
+
+
+if __name__ == '__main__':
+    main()
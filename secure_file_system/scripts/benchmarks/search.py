@@ -0,0 +1,111 @@
+"""
+Latency of file search over a large table (PostgreSQL only).
+
+Fills the files table with generated rows whose names and descriptions mix
+common words, words that never occur together, rare words and hash-like
+fragments, then times FileSearchView answering representative queries for
+an operations user, who searches every file. Pass ``--rows 2000000`` for
+the table size the search change was measured on; building it takes a few
+minutes.
+"""
+from _common import (
+    argument_parser,
+    measure,
+    percentile,
+    report,
+    setup_django,
+    test_database,
+)
+
+COMMON = ['report', 'budget', 'invoice', 'contract', 'minutes', 'forecast']
+QUERIES = [
+    'report',
+    'budget forecast',
+    'quarterly',
+    'invoice minutes',
+    'approved contract',
+    'rare4242',
+    'nothingmatchesthis',
+    'q3_report',
+    'd3d94468',
+    'final draft',
+]
+
+
+def fill(rows: int, user_id: str) -> None:
+    from django.db import connection
+
+    from files.models import File
+
+    common = '(ARRAY[' + ', '.join(f"'{word}'" for word in COMMON) + '])'
+    with connection.cursor() as cursor:
+        # The search_vector trigger fills in each row's vector as it goes in
+        cursor.execute(
+            f"""
+            INSERT INTO {File._meta.db_table} (
+                id, file, original_filename, file_type, file_size, content_hash,
+                uploaded_by_id, created_at, updated_at, description, is_public
+            )
+            SELECT md5('file' || i)::uuid, 'files/' || i || '.docx',
+                   CASE WHEN i %% 10 = 0 THEN 'scan-' || md5(i::text) || '.pptx'
+                        ELSE 'Q' || (1 + i %% 4) || '_report-' || i || '.docx' END,
+                   CASE WHEN i %% 10 = 0 THEN 'PPTX' ELSE 'DOCX' END,
+                   1024, '', %s::uuid, now() - i * interval '1 second', now(),
+                   {common}[1 + i %% 6] || ' ' || {common}[1 + (i / 7) %% 6]
+                       || CASE WHEN i %% 3 = 0 THEN ' quarterly' ELSE '' END
+                       || CASE WHEN i %% 5 = 0 THEN ' final draft' ELSE '' END
+                       || CASE WHEN i %% 11 = 0 THEN ' approved' ELSE '' END
+                       || ' rare' || (i %% 50000),
+                   false
+            FROM generate_series(1, %s) AS i
+            """,
+            [user_id, rows]
+        )
+        cursor.execute(f'ANALYZE {File._meta.db_table}')
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from authentication.models import User
+    from files.views import FileSearchView
+
+    with test_database(args.keepdb):
+        user = User.objects.create_user(
+            email='bench-ops@example.com',
+            password='bench-password',
+            user_type=User.UserType.OPERATIONS
+        )
+        fill(args.rows, str(user.id))
+        view = FileSearchView.as_view()
+        factory = APIRequestFactory()
+
+        everything = []
+        for query in QUERIES:
+            def search(query: str = query) -> None:
+                request = factory.get('/api/files/search/', {'q': query})
+                force_authenticate(request, user=user)
+                response = view(request)
+                response.render()
+                assert response.status_code == 200, response.status_code
+
+            timings = measure(search, args.repeat)
+            everything += timings
+            report(f'{query!r}', timings)
+
+        print(
+            f'all queries over {args.rows} rows: '
+            f'p50={percentile(everything, 0.50) * 1000:.1f} ms '
+            f'p95={percentile(everything, 0.95) * 1000:.1f} ms '
+            f'max={max(everything) * 1000:.1f} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Refreshes per second for one worker.
+
+Runs a chain of sequential refreshes, each with the refresh token the last
+one returned, three ways: the old flow (decode twice, load the user, sign a
+second pair from ``for_user``, blacklist the old token), the single-pass
+``VersionedRefreshToken.rotate``, and the full ``RefreshTokenView`` with
+DRF's request handling. Blacklisting goes to the configured ``tokens``
+cache.
+"""
+import time
+from typing import Callable, List
+
+from _common import argument_parser, report, setup_django, test_database
+
+
+def chain(refresh: str, rotate: Callable[[str], str], count: int) -> List[float]:
+    """Refresh ``count`` times in a row and return each refresh's duration."""
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        refresh = rotate(refresh)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument('--refreshes', type=int, default=3000)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.settings import api_settings
+
+    from authentication.jwt import VersionedRefreshToken
+    from authentication.models import User
+    from authentication.views import RefreshTokenView
+
+    with test_database(args.keepdb):
+        user = User.objects.create_user(
+            email='bench@example.com', password='bench-password'
+        )
+
+        def before(raw: str) -> str:
+            VersionedRefreshToken(raw)  # the serializer's decode
+            token = VersionedRefreshToken(raw)
+            str(token.access_token)
+            owner = User.objects.get(pk=token[api_settings.USER_ID_CLAIM])
+            refresh = str(VersionedRefreshToken.for_user(owner))
+            token.blacklist()
+            return refresh
+
+        def single_pass(raw: str) -> str:
+            token = VersionedRefreshToken(raw).rotate()
+            str(token.access_token)
+            return str(token)
+
+        view = RefreshTokenView.as_view()
+        factory = APIRequestFactory()
+
+        def through_view(raw: str) -> str:
+            request = factory.post('/api/auth/token/refresh/', {'refresh': raw})
+            response = view(request)
+            assert response.status_code == 200, response.data
+            return response.data['refresh']
+
+        for label, rotate in (('old flow (before)', before),
+                              ('rotate()', single_pass),
+                              ('RefreshTokenView', through_view)):
+            first = str(VersionedRefreshToken.for_user(user))
+            report(label, chain(first, rotate, args.refreshes))
+
+
+if __name__ == '__main__':
+    main()
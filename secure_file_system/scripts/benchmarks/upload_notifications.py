@@ -0,0 +1,124 @@
+"""
+Burst of upload notifications against a local SMTP stand-in.
+
+Announces ``--uploads`` uploads to ``--admins`` recipients each, first the
+way the task used to (``send_mail`` per recipient, a connection each), then
+through ``files.notifications.send_each`` (one connection per upload), and
+reports the connections opened and the time taken. The stand-in accepts
+every message and waits ``--latency`` milliseconds before greeting each new
+connection, as a mail server across a network would. No database or Redis
+is used.
+"""
+import socketserver
+import threading
+import time
+
+from _common import argument_parser, setup_django
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to take a message and throw it away."""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        time.sleep(self.server.latency)
+        self.reply('220 stand-in ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b'DATA':
+                self.reply('354 go ahead')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.reply('250 accepted')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency: float) -> None:
+        super().__init__(('127.0.0.1', 0), StandInSMTPHandler)
+        self.latency = latency
+        self.connections = 0
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument('--uploads', type=int, default=50)
+    parser.add_argument('--admins', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=20, help='milliseconds')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.mail import send_mail
+    from django.test import override_settings
+    from django.utils import timezone
+
+    from authentication.models import User
+    from files.models import File
+    from files.notifications import send_each, upload_notification
+
+    server = StandInSMTPServer(args.latency / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    uploader = User(email='ops@example.com')
+    uploads = [
+        File(
+            original_filename=f'report-{index}.docx',
+            file_type='DOCX',
+            file_size=1024,
+            uploaded_by=uploader,
+            created_at=timezone.now()
+        )
+        for index in range(args.uploads)
+    ]
+    admins = [f'admin{index}@example.com' for index in range(args.admins)]
+
+    def per_recipient() -> None:
+        for file_obj in uploads:
+            for admin in admins:
+                message = upload_notification(file_obj, admin)
+                send_mail(message.subject, message.body, message.from_email, [admin])
+
+    def one_connection() -> None:
+        for file_obj in uploads:
+            messages = [upload_notification(file_obj, admin) for admin in admins]
+            retry = send_each(messages)
+            assert not retry, retry
+
+    with override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+        EMAIL_HOST='127.0.0.1',
+        EMAIL_PORT=server.server_address[1],
+        EMAIL_HOST_USER='',
+        EMAIL_HOST_PASSWORD='',
+        EMAIL_USE_TLS=False,
+        EMAIL_USE_SSL=False,
+    ):
+        for label, send in (('send_mail per recipient (before)', per_recipient),
+                            ('send_each per upload', one_connection)):
+            server.connections = 0
+            started = time.perf_counter()
+            send()
+            elapsed = time.perf_counter() - started
+            print(
+                f'{label}: {args.uploads * args.admins} messages, '
+                f'{server.connections} connections, {elapsed:.2f} s'
+            )
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()